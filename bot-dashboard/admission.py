@@ -0,0 +1,116 @@
+# admission.py - Admission control for the analyze endpoints: in-flight limit, client rate limits, deadlines
+import threading
+import time
+from collections import OrderedDict
+
+ADMITTED = 'admitted'
+DEGRADED = 'degraded'
+RATE_LIMITED = 'rate_limited'
+
+
+class TokenBucket:
+    """rate tokens per second, bursting up to capacity; take() never blocks"""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def take(self, count=1):
+        """Spend count tokens if available; returns seconds until they would be, 0 on success.
+
+        More than capacity tokens are taken from a full bucket, leaving it in
+        debt, so a large batch still pays for every message.
+        """
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        needed = min(count, self.capacity)
+        if self.tokens >= needed:
+            self.tokens -= count
+            return 0
+        return (needed - self.tokens) / self.rate
+
+
+class AdmissionController:
+    """Decides, before any model work, how a request will be served.
+
+    - A client over its token-bucket rate (client_rate messages/second,
+      bursting to client_burst) is refused with a retry delay.
+    - If its messages would take the messages already waiting on the
+      model past max_in_flight, or the estimated wait for them behind the
+      ones in flight (from the expected_wait(ahead, count) callback)
+      exceeds the deadline, the request is degraded: it gets pattern-only
+      verdicts straight away instead of joining a queue it would time out
+      in. With nothing in flight, a batch larger than max_in_flight is
+      left to the wait estimate.
+    - Otherwise it is admitted and must call release(cost) when done;
+      callers still wait at most deadline seconds and degrade on a timeout.
+
+    Every limit counts messages, so a batch request costs its size.
+
+    Buckets are kept for the max_clients most recently seen clients.
+    """
+
+    def __init__(self, max_in_flight=64, deadline_ms=250, client_rate=0, client_burst=None,
+                 max_clients=100000, expected_wait=None):
+        self.max_in_flight = max_in_flight
+        self.deadline = deadline_ms / 1000.0
+        self.client_rate = client_rate
+        self.client_burst = client_burst or max(1, client_rate * 2)
+        self.max_clients = max_clients
+        self.expected_wait = expected_wait
+        self.in_flight = 0
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self.counts = {ADMITTED: 0, DEGRADED: 0, RATE_LIMITED: 0, 'timeouts': 0}
+
+    def _check_rate(self, client, cost):
+        if not self.client_rate:
+            return 0
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            bucket = self._buckets[client] = TokenBucket(self.client_rate, self.client_burst)
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client)
+        return bucket.take(cost)
+
+    def admit(self, client, cost=1):
+        """Return (decision, retry_after_seconds) for a request of cost messages"""
+        with self._lock:
+            wait = self._check_rate(client, cost)
+            if wait:
+                self.counts[RATE_LIMITED] += 1
+                return RATE_LIMITED, wait
+            overloaded = (self.in_flight and self.in_flight + cost > self.max_in_flight) or (
+                self.expected_wait is not None and self.expected_wait(self.in_flight, cost) > self.deadline)
+            if overloaded:
+                self.counts[DEGRADED] += 1
+                return DEGRADED, 0
+            self.in_flight += cost
+            self.counts[ADMITTED] += 1
+            return ADMITTED, 0
+
+    def release(self, cost=1, timed_out=False):
+        """Return an admitted request's cost messages; timed_out counts a deadline miss"""
+        with self._lock:
+            self.in_flight -= cost
+            if timed_out:
+                self.counts['timeouts'] += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'in_flight': self.in_flight,
+                'max_in_flight': self.max_in_flight,
+                'deadline_ms': self.deadline * 1000,
+                'client_rate': self.client_rate,
+                'client_burst': self.client_burst,
+                'tracked_clients': len(self._buckets),
+                **self.counts
+            }
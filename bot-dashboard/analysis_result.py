@@ -0,0 +1,73 @@
+# analysis_result.py - Shared finding records and the result type returned by ScamDetector
+import time
+from datetime import datetime
+
+# Static explanatory text left out of compact responses
+COMPACT_OMITS = frozenset(('recommendations', 'summary'))
+
+_clock = [None, None]
+
+
+def timestamp():
+    """Current time as 'YYYY-mm-dd HH:MM:SS', formatted at most once per second"""
+    now = int(time.time())
+    if _clock[0] != now:
+        _clock[1] = datetime.fromtimestamp(now).strftime('%Y-%m-%d %H:%M:%S')
+        _clock[0] = now
+    return _clock[1]
+
+
+class Finding(dict):
+    """One read-only scam indicator, shared by every result that reports it.
+
+    It is a dict (so json and jsonify encode it natively, and
+    finding['severity'] keeps working) that refuses modification. Its
+    compact form, without the explanation, is built once up front. The
+    rule's risk weight is an attribute, not a key, so it is not serialized.
+    """
+
+    __slots__ = ('_compact', 'weight')
+
+    def __init__(self, scam_type, explanation, severity, category, matched_pattern, weight=1.0):
+        dict.__init__(self, type=scam_type, explanation=explanation, severity=severity,
+                      category=category, matched_pattern=matched_pattern)
+        self.weight = weight
+        self._compact = {k: v for k, v in self.items() if k != 'explanation'}
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("Finding is shared between results and cannot be modified")
+
+    __setitem__ = __delitem__ = update = pop = popitem = clear = setdefault = _read_only
+
+    def __reduce__(self):
+        return Finding, (self['type'], self['explanation'], self['severity'],
+                         self['category'], self['matched_pattern'], self.weight)
+
+    def to_dict(self, compact=False):
+        return self._compact if compact else self
+
+
+class AnalysisResult(dict):
+    """The analysis result: a slot-less dict subclass with the same keys as before.
+
+    Encoding stays in the C JSON encoder, and the static parts (findings,
+    recommendations, summary) are shared objects rather than per-call
+    copies. to_dict(compact=True) drops finding explanations,
+    recommendations and the summary.
+    """
+
+    __slots__ = ()
+
+    def copy(self):
+        return AnalysisResult(self)
+
+    def to_dict(self, compact=False):
+        if not compact:
+            return self
+        data = {k: v for k, v in self.items() if k not in COMPACT_OMITS}
+        data['scam_indicators'] = [
+            f.to_dict(compact=True) if isinstance(f, Finding)
+            else {k: v for k, v in f.items() if k != 'explanation'}
+            for f in self.get('scam_indicators', ())
+        ]
+        return data
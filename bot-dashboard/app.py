@@ -1,12 +1,179 @@
 # app.py - Using enhanced ScamDetector
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, g, render_template, request, jsonify
+from admission import ADMITTED, DEGRADED, RATE_LIMITED, AdmissionController
+from analysis_result import AnalysisResult
+from batch_queue import MicroBatcher
 from detect_scam import ScamDetector
+from feedback_updater import FeedbackUpdater
+from history_store import HistoryStore
+from model_registry import ModelRegistry, RegistryWatcher
+from rule_packs import DEFAULT_RULES_DIR, RuleError, RuleWatcher
+from shadow_scorer import ShadowScorer
+from url_reputation import UrlReputation
 from datetime import datetime
+import math
+import os
+import time
 
 app = Flask(__name__)
 
+# Largest number of messages accepted by a single batch request
+MAX_BATCH_SIZE = 10000
+
+# Versioned models; SCAM_MODEL_PATH overrides the registry's current version
+registry = ModelRegistry(os.environ.get('SCAM_MODEL_REGISTRY', 'model_registry'))
+active_version = None if os.environ.get('SCAM_MODEL_PATH') else registry.current()
+if active_version:
+    registry.verify(active_version)
+    model_path = registry.artifact_path(active_version)
+else:
+    model_path = os.environ.get('SCAM_MODEL_PATH', 'scam_detector_model.joblib')
+
 # Initialize the scam detector
-detector = ScamDetector()
+# SCAM_MODEL_LOAD=background lets a worker start serving pattern-only
+# results while the model loads (under serve.py each worker then loads its
+# own copy instead of sharing the master's); 'lazy' loads on first use
+# SCAM_CASCADE=1 lets obvious safe/scam messages skip the model entirely
+# SCAM_URL_BLOCKLIST/ALLOWLIST: domain lists or indexes built by url_reputation.py
+# SCAM_RULES: rule pack file or directory; SCAM_RULE_LOCALES e.g. "en,hi"
+rules_path = os.environ.get('SCAM_RULES', DEFAULT_RULES_DIR)
+rule_cache = os.environ.get('SCAM_RULE_CACHE')
+rule_locales = os.environ.get('SCAM_RULE_LOCALES', '').split(',') if os.environ.get('SCAM_RULE_LOCALES') else None
+detector = ScamDetector(
+    model_path=model_path,
+    load_mode=os.environ.get('SCAM_MODEL_LOAD', 'eager'),
+    cascade=os.environ.get('SCAM_CASCADE', '').lower() in ('1', 'true', 'yes'),
+    url_reputation=UrlReputation.from_paths(
+        os.environ.get('SCAM_URL_BLOCKLIST'), os.environ.get('SCAM_URL_ALLOWLIST')),
+    rules=rules_path,
+    rule_cache=rule_cache,
+    rule_locales=rule_locales,
+    explain_top_k=int(os.environ.get('SCAM_EXPLAIN_TOP_K', 5))
+)
+
+# Edited rule packs go live in every worker without a restart (SCAM_RULES_POLL=0 disables it)
+rule_watcher = RuleWatcher(
+    detector, rules_path, cache_dir=rule_cache, locales=rule_locales,
+    interval=float(os.environ.get('SCAM_RULES_POLL', 5))
+)
+
+# A candidate model scores a sample of live traffic in the background
+shadow = ShadowScorer(detector, sample_rate=float(os.environ.get('SHADOW_SAMPLE_RATE', 1.0)))
+
+# Each worker polls the registry and hot-swaps when 'current' or 'candidate' moves
+# (SCAM_REGISTRY_POLL=0 disables it, e.g. when SCAM_MODEL_PATH pins a file)
+watcher = RegistryWatcher(
+    registry, detector, shadow,
+    interval=float(os.environ.get('SCAM_REGISTRY_POLL', 0 if os.environ.get('SCAM_MODEL_PATH') else 5)),
+    active=active_version
+)
+
+# Concurrent /api/analyze calls are scored together in small batches
+batcher = MicroBatcher(
+    detector.analyze_many,
+    max_batch_size=int(os.environ.get('ANALYZE_MAX_BATCH', 64)),
+    max_wait_ms=float(os.environ.get('ANALYZE_MAX_WAIT_MS', 2))
+)
+
+# Under overload, requests get a fast pattern-only verdict instead of queueing:
+# at most ADMISSION_MAX_IN_FLIGHT messages wait on the model, each request for
+# ADMISSION_DEADLINE_MS.
+# CLIENT_RATE_LIMIT (messages/s per X-Client-Id or IP, 0 = off) refuses floods with 429
+admission = AdmissionController(
+    max_in_flight=int(os.environ.get('ADMISSION_MAX_IN_FLIGHT', 64)),
+    deadline_ms=float(os.environ.get('ADMISSION_DEADLINE_MS', 250)),
+    client_rate=float(os.environ.get('CLIENT_RATE_LIMIT', 0)),
+    client_burst=float(os.environ.get('CLIENT_RATE_BURST', 0)) or None,
+    expected_wait=batcher.expected_wait
+)
+
+# Analyst label corrections are applied to the model in mini-batches: published
+# as a new registry version when serving from the registry, otherwise replayed
+# from the feedback log by every worker
+feedback = FeedbackUpdater(
+    detector,
+    batch_size=int(os.environ.get('FEEDBACK_BATCH_SIZE', 32)),
+    interval=float(os.environ.get('FEEDBACK_INTERVAL', 30)),
+    log_path=os.environ.get('FEEDBACK_LOG', 'feedback.jsonl'),
+    registry=registry if active_version and watcher.interval else None,
+    watcher=watcher
+)
+
+# Every verdict is kept for audits and trends; rows are written in batches
+# by a background thread (HISTORY_DB= with an empty value disables it).
+# Rows keep a message hash and masked preview; HISTORY_STORE_MESSAGES=1 keeps full text
+history_path = os.environ.get('HISTORY_DB', 'analysis_history.db')
+history = HistoryStore(
+    history_path,
+    batch_size=int(os.environ.get('HISTORY_BATCH_SIZE', 500)),
+    store_messages=os.environ.get('HISTORY_STORE_MESSAGES', '').lower() in ('1', 'true', 'yes')
+) if history_path else None
+
+# HTTP-level metrics share the detector's registry so /api/metrics shows both
+http_requests = detector.metrics.counter(
+    'dashboard_http_requests_total', 'HTTP requests by endpoint and status', labels=('endpoint', 'status'))
+http_seconds = detector.metrics.histogram(
+    'dashboard_http_request_seconds', 'HTTP request latency by endpoint', labels=('endpoint',))
+stage_seconds = detector.metrics.histogram(
+    'scam_detector_stage_seconds', 'Time spent in each analysis stage', labels=('stage',))
+
+@app.before_request
+def start_timer():
+    g.start_time = time.perf_counter()
+    detector.ensure_loading()
+    watcher.ensure_started()
+    rule_watcher.ensure_started()
+    feedback.ensure_started()
+
+@app.after_request
+def record_request(response):
+    endpoint = request.endpoint or 'unknown'
+    http_requests.inc(endpoint=endpoint, status=response.status_code)
+    if 'start_time' in g:
+        http_seconds.observe(time.perf_counter() - g.start_time, endpoint=endpoint)
+    return response
+
+def record_history(messages, results, senders=None):
+    if history is not None:
+        history.record(messages, results, senders,
+                       model_version=watcher.active or detector.model_version,
+                       rules_version=detector.rules.version)
+
+def parse_time(value):
+    """Query-string time as epoch seconds: a number or an ISO date/datetime"""
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+def history_filters():
+    args = request.args
+    return {
+        'risk_level': args.get('risk_level'),
+        'category': args.get('category'),
+        'sender': args.get('sender'),
+        'campaign': args.get('campaign'),
+        'message_hash_hex': args.get('message_hash'),
+        'since': parse_time(args.get('since')),
+        'until': parse_time(args.get('until'))
+    }
+
+def client_id():
+    return request.headers.get('X-Client-Id') or request.remote_addr
+
+def rate_limited(retry_after):
+    return jsonify({'error': 'Rate limit exceeded'}), 429, {'Retry-After': str(math.ceil(retry_after))}
+
+def wants_compact(data):
+    """?compact=1 or {"compact": true} drops explanations from the response"""
+    return request.args.get('compact', '').lower() in ('1', 'true', 'yes') or bool(data.get('compact'))
+
+def serialize(result, compact):
+    if compact and isinstance(result, AnalysisResult):
+        return result.to_dict(compact=True)
+    return result
 
 @app.route('/')
 def dashboard():
@@ -22,9 +189,181 @@ def analyze():
     if not message:
         return jsonify({'error': 'No message provided'}), 400
     
-    # Use the detector to analyze
-    results = detector.analyze(message)
-    return jsonify(results)
+    decision, retry_after = admission.admit(client_id())
+    if decision == RATE_LIMITED:
+        return rate_limited(retry_after)
+    
+    if decision == ADMITTED:
+        # Score through the micro-batcher so concurrent requests share one model call
+        timed_out = False
+        try:
+            results = batcher.submit(message, timeout=admission.deadline)
+        except TimeoutError:
+            timed_out = True
+            decision = DEGRADED
+        finally:
+            admission.release(timed_out=timed_out)
+    if decision == DEGRADED:
+        results = detector.analyze_degraded([message])[0]
+    
+    shadow.observe([message], [results])
+    record_history([message], [results], [data.get('sender')])
+    with stage_seconds.time(stage='serialize'):
+        return jsonify(serialize(results, wants_compact(data)))
+
+@app.route('/api/analyze/batch', methods=['POST'])
+def analyze_batch():
+    """API endpoint for analyzing many messages in one request"""
+    data = request.json or {}
+    messages = data.get('messages')
+    
+    if not isinstance(messages, list) or not messages:
+        return jsonify({'error': 'No messages provided'}), 400
+    
+    if len(messages) > MAX_BATCH_SIZE:
+        return jsonify({'error': f'Too many messages (max {MAX_BATCH_SIZE})'}), 413
+    
+    senders = data.get('senders')
+    if senders is not None and (not isinstance(senders, list) or len(senders) != len(messages)):
+        return jsonify({'error': 'senders must be a list with one entry per message'}), 400
+    
+    decision, retry_after = admission.admit(client_id(), cost=len(messages))
+    if decision == RATE_LIMITED:
+        return rate_limited(retry_after)
+    if decision == ADMITTED:
+        # Same queue and deadline as /api/analyze; messages not scored in time degrade
+        results = [None] * len(messages)
+        try:
+            results = batcher.submit_many(messages, timeout=admission.deadline)
+        finally:
+            admission.release(len(messages), timed_out=None in results)
+        late = [i for i, result in enumerate(results) if result is None]
+        for i, result in zip(late, detector.analyze_degraded([messages[i] for i in late])):
+            results[i] = result
+    else:
+        results = detector.analyze_degraded(messages)
+    shadow.observe(messages, results)
+    record_history(messages, results, senders)
+    with stage_seconds.time(stage='serialize'):
+        compact = wants_compact(data)
+        return jsonify({'count': len(results), 'results': [serialize(r, compact) for r in results]})
+
+@app.route('/api/feedback', methods=['POST'])
+def submit_feedback():
+    """Record an analyst's corrected label for a message"""
+    data = request.json or {}
+    message = data.get('message', '')
+    label = data.get('label')
+    
+    if not message or not isinstance(message, str):
+        return jsonify({'error': 'No message provided'}), 400
+    if label not in feedback.classes():
+        return jsonify({'error': f"Label must be one of {feedback.classes()}"}), 400
+    if not feedback.supported():
+        return jsonify({'error': 'The loaded model does not support incremental updates'}), 409
+    
+    pending = feedback.record(message, label, data.get('analyst'))
+    return jsonify({'queued': True, 'pending': pending}), 202
+
+@app.route('/api/feedback/status')
+def feedback_status():
+    """Progress of the background model updater"""
+    return jsonify(feedback.stats())
+
+@app.route('/api/models')
+def models():
+    """Registry versions, the model this worker serves and shadow-scoring results"""
+    return jsonify({
+        'registry': registry.describe(),
+        'worker': watcher.stats(),
+        'model_version': detector.model_version,
+        'shadow': shadow.stats()
+    })
+
+@app.route('/api/models/<version>/promote', methods=['POST'])
+def promote_model(version):
+    """Make a registry version current; every worker swaps to it on its next poll"""
+    try:
+        # Serialized with feedback updates, which publish and promote under the same lock
+        with registry.lock():
+            registry.promote(version)
+    except KeyError:
+        return jsonify({'error': 'Unknown model version'}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 409
+    return jsonify({'current': version})
+
+@app.route('/api/models/<version>/shadow', methods=['POST'])
+def shadow_model(version):
+    """Shadow-score a registry version on live traffic (or stop with {"enabled": false})"""
+    enabled = bool((request.get_json(silent=True) or {}).get('enabled', True))
+    try:
+        with registry.lock():
+            registry.set_pointer('candidate', version if enabled else None)
+    except KeyError:
+        return jsonify({'error': 'Unknown model version'}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 409
+    return jsonify({'candidate': version if enabled else None})
+
+@app.route('/api/rules')
+def rules():
+    """Active rule packs and the state of the reload watcher"""
+    return jsonify({'rules': detector.rules.describe(), 'watcher': rule_watcher.stats()})
+
+@app.route('/api/rules/reload', methods=['POST'])
+def reload_rules():
+    """Reload rule packs now instead of waiting for the next poll"""
+    try:
+        changed = rule_watcher.reload()
+    except RuleError as e:
+        return jsonify({'error': 'Invalid rule packs', 'problems': e.errors}), 422
+    return jsonify({'reloaded': changed, 'version': detector.rules.version})
+
+@app.route('/api/history')
+def history_page():
+    """Stored verdicts, newest first; pass next_before as ?before= for the next page"""
+    if history is None:
+        return jsonify({'error': 'Analysis history is disabled'}), 404
+    try:
+        return jsonify(history.query(
+            limit=request.args.get('limit', 50, type=int),
+            before=request.args.get('before', type=int),
+            **history_filters()
+        ))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/history/aggregate')
+def history_aggregate():
+    """Verdict counts per time bucket and risk level, with category totals"""
+    if history is None:
+        return jsonify({'error': 'Analysis history is disabled'}), 404
+    try:
+        return jsonify(history.aggregate(bucket=request.args.get('bucket', 'hour'), **history_filters()))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/campaigns')
+def campaigns():
+    """List the largest active scam campaigns"""
+    if detector.campaigns is None:
+        return jsonify({'error': 'Campaign clustering is disabled'}), 404
+    limit = request.args.get('limit', 20, type=int)
+    return jsonify({
+        'stats': detector.campaigns.stats(),
+        'campaigns': detector.campaigns.top_clusters(limit)
+    })
+
+@app.route('/api/campaigns/<cluster_id>/confirm', methods=['POST'])
+def confirm_campaign(cluster_id):
+    """Mark a campaign as a confirmed scam (or clear it with {"confirmed": false})"""
+    if detector.campaigns is None:
+        return jsonify({'error': 'Campaign clustering is disabled'}), 404
+    confirmed = bool((request.json or {}).get('confirmed', True))
+    if not detector.campaigns.confirm_scam(cluster_id, confirmed):
+        return jsonify({'error': 'Unknown campaign'}), 404
+    return jsonify({'id': cluster_id, 'confirmed_scam': confirmed})
 
 @app.route('/api/health')
 def health():
@@ -33,10 +372,41 @@ def health():
     return jsonify({
         'status': 'healthy',
         'model_loaded': detector.model is not None,
+        'model_state': detector.model_state,
+        'model_registry_version': watcher.active,
+        'rules_version': detector.rules.version,
         'timestamp': datetime.now().isoformat(),
+        'cache': stats['cache'],
+        'batching': batcher.stats(),
+        'admission': admission.stats(),
+        'history': history.stats() if history is not None else None,
         'stats': stats
     })
 
+@app.route('/api/ready')
+def ready():
+    """Readiness probe - 200 only when this worker can serve model-backed results"""
+    if not detector.ready:
+        return jsonify({'ready': False, 'model_state': detector.model_state, 'pid': os.getpid()}), 503
+    return jsonify({'ready': True, 'pid': os.getpid()})
+
+@app.route('/api/metrics')
+def metrics():
+    """Prometheus text-format metrics for this worker process"""
+    return Response(detector.metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/profile', methods=['GET', 'POST'])
+def profile():
+    """Switch the analysis profiler on/off (POST) or read its report (GET)"""
+    if request.method == 'POST':
+        if (request.json or {}).get('enabled', True):
+            detector.profiler.start()
+        else:
+            detector.profiler.stop()
+        return jsonify({'profiling': detector.profiler.enabled})
+    limit = request.args.get('limit', 30, type=int)
+    return Response(detector.profiler.report(limit), mimetype='text/plain')
+
 @app.route('/api/stats')
 def stats():
     """Get detector statistics"""
@@ -52,6 +422,8 @@ if __name__ == '__main__':
     print(f"   Categories: {', '.join(set(p['category'] for p in detector.scam_patterns.values()))}")
     print("\n🌐 Dashboard URL: http://localhost:5000")
     print("🔗 API Endpoint: http://localhost:5000/api/analyze")
+    print("📦 Batch Endpoint: http://localhost:5000/api/analyze/batch")
+    print("🏭 Production: python serve.py --workers 4 --threads 4")
     print("\n💡 To use:")
     print("   1. Open http://localhost:5000 in your browser")
     print("   2. Enter any suspicious message")
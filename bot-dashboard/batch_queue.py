@@ -0,0 +1,153 @@
+# batch_queue.py - Micro-batching queue between the HTTP layer and ScamDetector
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+
+class MicroBatcher:
+    """Collects concurrent single-message requests into small batches.
+
+    Request threads call submit() and block on a Future. One background
+    thread drains the queue, waiting at most max_wait_ms for a batch to
+    fill up to max_batch_size, then scores the whole batch with a single
+    analyze_many() call (one vectorized predict_proba) and hands each
+    caller its own result.
+    """
+
+    def __init__(self, analyze_many, max_batch_size=64, max_wait_ms=2):
+        self.analyze_many = analyze_many
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._pid = None
+        self.batches = 0
+        self.messages = 0
+        self.largest_batch = 0
+        self.expired = 0
+        # Moving average of scoring time per message, for queue wait estimates
+        self.seconds_per_message = 0.0
+        self._running = (0.0, 0)
+
+    def _ensure_started(self):
+        # Threads don't survive fork, so a preloaded app starts one per worker
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue()
+                thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+                thread.start()
+                self._pid = os.getpid()
+
+    def submit(self, message, timeout=None):
+        """Queue one message and wait for its analysis result.
+
+        If no result arrives within timeout seconds, TimeoutError is raised
+        and the message is withdrawn, so the batch thread doesn't spend
+        model time on a caller that has already given up.
+        """
+        self._ensure_started()
+        future = Future()
+        self._queue.put((message, future))
+        try:
+            return future.result(timeout)
+        except FutureTimeout:
+            future.cancel()
+            raise TimeoutError(f"No analysis result within {timeout}s") from None
+
+    def submit_many(self, messages, timeout=None):
+        """Queue several messages and wait for their results, in order.
+
+        They are scored in batches alongside single submissions. Messages
+        without a result within timeout seconds (for the whole call) are
+        withdrawn as in submit() and come back as None.
+        """
+        self._ensure_started()
+        futures = []
+        for message in messages:
+            future = Future()
+            self._queue.put((message, future))
+            futures.append(future)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        results = []
+        for future in futures:
+            try:
+                remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+                results.append(future.result(remaining))
+            except FutureTimeout:
+                future.cancel()
+                results.append(None)
+        return results
+
+    def expected_wait(self, ahead=None, count=1):
+        """Rough seconds until the results of count new messages, with ahead messages before them.
+
+        ahead counts every unanswered message, queued or being scored
+        (default: only the queued ones). The batch being scored has to
+        finish first, then the remaining ones are scored behind it.
+        """
+        started, running = self._running
+        per_message = self.seconds_per_message
+        remaining = max(0.0, started + running * per_message - time.perf_counter()) if running else 0.0
+        queued = self._queue.qsize() if ahead is None else max(0, ahead - running)
+        return remaining + (queued + count) * per_message + self.max_wait
+
+    def _collect(self):
+        """Block for the first request, then gather more until full or out of time"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            # Claim the futures; ones whose caller already timed out are skipped
+            live = [item for item in batch if item[1].set_running_or_notify_cancel()]
+            self.expired += len(batch) - len(live)
+            batch = live
+            if not batch:
+                continue
+            messages = [message for message, _ in batch]
+            start = time.perf_counter()
+            self._running = (start, len(batch))
+            try:
+                results = self.analyze_many(messages)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            finally:
+                self._running = (0.0, 0)
+
+            per_message = (time.perf_counter() - start) / len(batch)
+            self.seconds_per_message += 0.2 * (per_message - self.seconds_per_message)
+            self.batches += 1
+            self.messages += len(batch)
+            self.largest_batch = max(self.largest_batch, len(batch))
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+    def stats(self):
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000,
+            'batches': self.batches,
+            'messages': self.messages,
+            'avg_batch_size': round(self.messages / self.batches, 2) if self.batches else 0,
+            'largest_batch': self.largest_batch,
+            'expired': self.expired,
+            'us_per_message': round(self.seconds_per_message * 1e6, 1),
+            'queued': self._queue.qsize()
+        }
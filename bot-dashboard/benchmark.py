@@ -0,0 +1,257 @@
+# benchmark.py - Latency/throughput benchmark for the ScamDetector stages
+import argparse
+import ast
+import contextlib
+import csv
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+
+from detect_scam import ScamDetector
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DATA = os.path.join(HERE, 'scam_data.csv')
+BALANCED_SCRIPT = os.path.join(HERE, '..', 'bot', 'create_balanced_data.py')
+
+# Share of short / medium / long messages in the generated corpus
+DEFAULT_MIX = {'short': 0.4, 'medium': 0.4, 'long': 0.2}
+
+FILLER_NAMES = ['Ravi', 'Priya', 'Amit', 'Neha', 'Rahul', 'Sita', 'Karan', 'Anjali']
+
+
+def load_seed_messages(csv_path=DEFAULT_DATA, script_path=BALANCED_SCRIPT):
+    """Collect seed texts from scam_data.csv and the create_balanced_data.py examples"""
+    seeds = []
+    if os.path.exists(csv_path):
+        with open(csv_path, encoding='utf-8', newline='') as f:
+            seeds.extend(row['text'] for row in csv.DictReader(f) if row.get('text'))
+
+    # The script writes files when run, so read its `data` literal instead of importing it
+    if os.path.exists(script_path):
+        with open(script_path, encoding='utf-8') as f:
+            tree = ast.parse(f.read())
+        for node in tree.body:
+            if isinstance(node, ast.Assign) and any(getattr(t, 'id', None) == 'data' for t in node.targets):
+                rows = ast.literal_eval(node.value)
+                seeds.extend(row[0] for row in rows[1:])
+
+    return list(dict.fromkeys(seeds))
+
+
+def parse_mix(spec):
+    """Parse 'short:0.5,medium:0.3,long:0.2' into a weight dict"""
+    mix = {}
+    for part in spec.split(','):
+        name, weight = part.split(':')
+        if name not in DEFAULT_MIX:
+            raise ValueError(f"Unknown length class: {name}")
+        mix[name] = float(weight)
+    return mix
+
+
+def _vary(text, rng):
+    """Change numbers and add a name so generated messages are not exact copies"""
+    words = text.split()
+    for i, word in enumerate(words):
+        if any(ch.isdigit() for ch in word):
+            words[i] = ''.join(str(rng.randint(0, 9)) if ch.isdigit() else ch for ch in word)
+    if rng.random() < 0.5:
+        words.insert(0, f"{rng.choice(FILLER_NAMES)},")
+    return ' '.join(words)
+
+
+def generate_corpus(seeds, size, mix=None, seed=42):
+    """Generate a synthetic message corpus with a controlled length mix"""
+    rng = random.Random(seed)
+    mix = mix or DEFAULT_MIX
+    classes = list(mix)
+    weights = [mix[c] for c in classes]
+    corpus = []
+    for _ in range(size):
+        kind = rng.choices(classes, weights)[0]
+        base = _vary(rng.choice(seeds), rng)
+        if kind == 'short':
+            base = ' '.join(base.split()[:rng.randint(3, 8)])
+        elif kind == 'long':
+            extra = [_vary(rng.choice(seeds), rng) for _ in range(rng.randint(2, 5))]
+            base = ' '.join([base] + extra)
+        corpus.append(base)
+    return corpus
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def time_stage(func, inputs, warmup=50):
+    """Call func on every input and return latency percentiles and throughput"""
+    for item in inputs[:warmup]:
+        func(item)
+
+    latencies = []
+    perf_counter_ns = time.perf_counter_ns
+    start = perf_counter_ns()
+    for item in inputs:
+        t0 = perf_counter_ns()
+        func(item)
+        latencies.append(perf_counter_ns() - t0)
+    total = (perf_counter_ns() - start) / 1e9
+
+    latencies.sort()
+    to_us = 1 / 1000
+    return {
+        'calls': len(inputs),
+        'total_seconds': round(total, 4),
+        'per_second': round(len(inputs) / total, 1) if total else 0.0,
+        'mean_us': round(sum(latencies) / len(latencies) * to_us, 2),
+        'p50_us': round(_percentile(latencies, 50) * to_us, 2),
+        'p95_us': round(_percentile(latencies, 95) * to_us, 2),
+        'p99_us': round(_percentile(latencies, 99) * to_us, 2),
+    }
+
+
+def peak_memory(func, inputs):
+    """Peak traced allocation (KiB) while running func over inputs"""
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    for item in inputs:
+        func(item)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return round(peak / 1024, 1)
+
+
+def run_benchmark(detector, corpus, batch_size=256, memory_sample=500):
+    """Time every analysis stage separately and return a results dict"""
+    findings = [detector.analyze_patterns(m) for m in corpus]
+    scored = [(f, detector.calculate_risk_score(f)[1]) for f in findings]
+    batches = [corpus[i:i + batch_size] for i in range(0, len(corpus), batch_size)]
+
+    stages = {
+        'analyze_patterns': (detector.analyze_patterns, corpus),
+        'calculate_risk_score': (detector.calculate_risk_score, findings),
+        'get_recommendations': (lambda item: detector.get_recommendations(item[1], item[0]), scored),
+        'analyze': (detector.analyze, corpus),
+    }
+    if detector.model is not None:
+        stages['model_predict'] = (lambda m: detector.predict([m]), corpus)
+
+    results = {}
+    for name, (func, inputs) in stages.items():
+        results[name] = time_stage(func, inputs)
+        results[name]['peak_kib'] = peak_memory(func, inputs[:memory_sample])
+
+    # Batched paths report per-message throughput, latency is per batch
+    if detector.model is not None:
+        results['model_predict_batch'] = time_stage(detector.predict, batches, warmup=1)
+    results['analyze_many'] = time_stage(detector.analyze_many, batches, warmup=1)
+    if detector.cascade is not None:
+        decided = Counter(r['decided_by'] for r in detector.analyze_many(corpus))
+        results['analyze_many']['decided_by'] = dict(decided)
+    for name in ('model_predict_batch', 'analyze_many'):
+        if name in results:
+            stage = results[name]
+            stage['batch_size'] = batch_size
+            stage['messages_per_second'] = round(len(corpus) / stage['total_seconds'], 1)
+    return results
+
+
+def compare(current, baseline, threshold):
+    """Print per-stage changes against a baseline and return regressed stage names"""
+    regressions = []
+    print(f"\n📊 Compared with baseline from {baseline['meta'].get('timestamp', '?')}:")
+    for name, stage in current['stages'].items():
+        old = baseline['stages'].get(name)
+        if not old or not old.get('p50_us'):
+            continue
+        change = (stage['p50_us'] - old['p50_us']) / old['p50_us'] * 100
+        flag = '⚠️ ' if change > threshold else '  '
+        print(f"  {flag}{name:<22} p50 {old['p50_us']:>9.1f} -> {stage['p50_us']:>9.1f} us ({change:+.1f}%)")
+        if change > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark ScamDetector stages")
+    parser.add_argument('--size', type=int, default=5000, help="Messages in the synthetic corpus")
+    parser.add_argument('--mix', default=None, help="Length mix, e.g. short:0.5,medium:0.3,long:0.2")
+    parser.add_argument('--seed', type=int, default=42, help="Random seed for corpus generation")
+    parser.add_argument('--batch-size', type=int, default=256, help="Batch size for batched stages")
+    parser.add_argument('--model', default='scam_detector_model.joblib', help="Model file to load")
+    parser.add_argument('--with-cache', action='store_true',
+                        help="Keep the result cache and campaign index enabled")
+    parser.add_argument('--cascade', action='store_true',
+                        help="Put the cheap first-tier prefilter in front of the model")
+    parser.add_argument('-o', '--output', help="Write results as JSON to this file")
+    parser.add_argument('--compare', help="Baseline JSON file to compare against")
+    parser.add_argument('--fail-threshold', type=float, default=10.0,
+                        help="Exit non-zero if any stage p50 regresses by more than this percent")
+    args = parser.parse_args(argv)
+
+    with contextlib.redirect_stdout(sys.stderr):
+        if args.with_cache:
+            detector = ScamDetector(model_path=args.model, cascade=args.cascade)
+        else:
+            detector = ScamDetector(model_path=args.model, cache_size=0, campaigns=False,
+                                    cascade=args.cascade)
+
+    seeds = load_seed_messages()
+    mix = parse_mix(args.mix) if args.mix else DEFAULT_MIX
+    corpus = generate_corpus(seeds, args.size, mix, args.seed)
+
+    print("=" * 60)
+    print("⏱️  SCAM DETECTOR BENCHMARK")
+    print("=" * 60)
+    print(f"   Corpus: {len(corpus)} messages from {len(seeds)} seeds, mix {mix}")
+    print(f"   Model loaded: {'✅' if detector.model is not None else '❌'}")
+
+    stages = run_benchmark(detector, corpus, batch_size=args.batch_size)
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'corpus_size': len(corpus),
+            'mix': mix,
+            'seed': args.seed,
+            'model_path': args.model,
+            'model_loaded': detector.model is not None,
+            'cache_enabled': args.with_cache,
+            'cascade': args.cascade,
+            'total_patterns': len(detector.scam_patterns),
+        },
+        'stages': stages,
+    }
+
+    print(f"\n{'stage':<22}{'p50 us':>10}{'p95 us':>10}{'p99 us':>10}{'calls/s':>12}{'peak KiB':>10}")
+    for name, stage in stages.items():
+        print(f"{name:<22}{stage['p50_us']:>10.1f}{stage['p95_us']:>10.1f}{stage['p99_us']:>10.1f}"
+              f"{stage['per_second']:>12.0f}{stage.get('peak_kib', 0):>10.1f}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Results saved to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.fail_threshold)
+        if regressions:
+            print(f"\n❌ Regressions over {args.fail_threshold}%: {', '.join(regressions)}")
+            sys.exit(1)
+        print("\n✅ No regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+# campaign_index.py - MinHash/LSH clustering of near-duplicate scam campaigns
+import hashlib
+import itertools
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from result_cache import normalize_message
+
+# Largest prime below 2^32; with x, a, b < p the product a*x + b fits in uint64
+_PRIME = 4294967291
+
+
+def shingles(message, size=2):
+    """Return the set of word n-gram shingles of a normalized message"""
+    words = normalize_message(message).split()
+    if len(words) <= size:
+        return {' '.join(words)}
+    return {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+class Campaign:
+    """A cluster of near-identical messages"""
+
+    __slots__ = ('id', 'signature', 'size', 'scam_votes', 'safe_votes', 'confirmed_scam', 'analyst_verdict',
+                 'first_seen', 'last_seen', 'sample', 'verdict', 'band_keys', 'voters')
+
+    def __init__(self, cluster_id, signature, sample):
+        self.id = cluster_id
+        self.signature = signature
+        self.size = 0
+        self.scam_votes = 0
+        self.safe_votes = 0
+        self.confirmed_scam = False
+        self.analyst_verdict = None
+        self.first_seen = self.last_seen = time.time()
+        self.sample = sample
+        self.verdict = None
+        self.band_keys = []
+        self.voters = set()
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'size': self.size,
+            'scam_votes': self.scam_votes,
+            'safe_votes': self.safe_votes,
+            'confirmed_scam': self.confirmed_scam,
+            'first_seen': self.first_seen,
+            'last_seen': self.last_seen,
+            'sample': self.sample
+        }
+
+
+class CampaignIndex:
+    """Assigns messages to campaign clusters with MinHash locality-sensitive hashing.
+
+    Each message is reduced to a fixed-size MinHash signature that is split
+    into bands; messages sharing any band bucket become candidates, so
+    assignment costs a handful of dict lookups instead of comparing against
+    every earlier message. Buckets point at clusters rather than messages
+    and the number of clusters is LRU-bounded, so memory stays flat no
+    matter how many messages flow through.
+    """
+
+    def __init__(self, num_perm=64, bands=32, threshold=0.5, max_clusters=50000,
+                 max_keys_per_cluster=64, auto_confirm_after=5, seed=1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.max_clusters = max_clusters
+        self.max_keys_per_cluster = max_keys_per_cluster
+        self.auto_confirm_after = auto_confirm_after
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _PRIME, size=num_perm, dtype=np.uint64)
+        self._prime = np.uint64(_PRIME)
+
+        self._buckets = [{} for _ in range(bands)]
+        self._clusters = OrderedDict()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.messages_indexed = 0
+
+    def signature(self, message):
+        """Compute the MinHash signature of a message"""
+        hashed = np.fromiter(
+            (int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=8).digest(), 'little') % _PRIME
+             for s in shingles(message)),
+            dtype=np.uint64
+        )
+        permuted = (hashed[:, None] * self._a + self._b) % self._prime
+        return permuted.min(axis=0)
+
+    def _band_keys(self, signature):
+        rows = self.rows
+        return [signature[b * rows:(b + 1) * rows].tobytes() for b in range(self.bands)]
+
+    def assign(self, message):
+        """Place a message in its campaign cluster, creating one if needed.
+
+        Returns the Campaign the message now belongs to.
+        """
+        signature = self.signature(message)
+        keys = self._band_keys(signature)
+
+        with self._lock:
+            best = None
+            best_score = self.threshold
+            seen = set()
+            for band, key in enumerate(keys):
+                cluster_id = self._buckets[band].get(key)
+                if cluster_id is None or cluster_id in seen:
+                    continue
+                seen.add(cluster_id)
+                cluster = self._clusters.get(cluster_id)
+                if cluster is None:
+                    continue
+                # Verify the LSH candidate against the cluster representative
+                score = float(np.mean(cluster.signature == signature))
+                if score >= best_score:
+                    best, best_score = cluster, score
+
+            if best is None:
+                best = Campaign(f"c{next(self._ids):x}", signature, message[:200])
+                self._clusters[best.id] = best
+                self._evict()
+
+            if len(best.band_keys) < self.max_keys_per_cluster:
+                for band, key in enumerate(keys):
+                    if key not in self._buckets[band]:
+                        self._buckets[band][key] = best.id
+                        best.band_keys.append((band, key))
+
+            best.size += 1
+            best.last_seen = time.time()
+            self._clusters.move_to_end(best.id)
+            self.messages_indexed += 1
+            return best
+
+    def _evict(self):
+        """Drop the least recently seen clusters and their buckets"""
+        while len(self._clusters) > self.max_clusters:
+            _, cluster = self._clusters.popitem(last=False)
+            for band, key in cluster.band_keys:
+                if self._buckets[band].get(key) == cluster.id:
+                    del self._buckets[band][key]
+
+    def record_verdict(self, cluster, result, voter=None):
+        """Feed a full analysis result back into its cluster.
+
+        A cluster is confirmed as a scam while at least auto_confirm_after
+        members have been judged high or critical risk and none were judged
+        safe, so a later safe vote withdraws it, unless an analyst decided
+        with confirm_scam(). voter identifies the message (e.g. its unmasked
+        message_key) so the same text sent again doesn't vote twice; once
+        max_keys_per_cluster voters are remembered, repeats can no longer be
+        told apart and further votes are ignored.
+        """
+        prediction = result.get('ai_prediction')
+        risky = result.get('risk_level') in ('critical', 'high')
+        with self._lock:
+            if voter is not None:
+                if voter in cluster.voters or len(cluster.voters) >= self.max_keys_per_cluster:
+                    return
+                cluster.voters.add(voter)
+            if risky and prediction in (None, 'scam'):
+                cluster.scam_votes += 1
+                cluster.verdict = result.copy()
+            elif prediction == 'not_scam' or result.get('risk_level') == 'low':
+                cluster.safe_votes += 1
+            if cluster.analyst_verdict is not None:
+                cluster.confirmed_scam = cluster.analyst_verdict
+            else:
+                cluster.confirmed_scam = bool(self.auto_confirm_after and not cluster.safe_votes
+                                              and cluster.scam_votes >= self.auto_confirm_after)
+
+    def confirm_scam(self, cluster_id, confirmed=True):
+        """Mark a cluster as (not) a confirmed scam, e.g. from an analyst; votes no longer change it"""
+        with self._lock:
+            cluster = self._clusters.get(cluster_id)
+            if cluster is None:
+                return False
+            cluster.analyst_verdict = cluster.confirmed_scam = confirmed
+            return True
+
+    def get(self, cluster_id):
+        with self._lock:
+            return self._clusters.get(cluster_id)
+
+    def top_clusters(self, limit=20):
+        """Return the largest live clusters"""
+        with self._lock:
+            clusters = sorted(self._clusters.values(), key=lambda c: c.size, reverse=True)
+            return [c.to_dict() for c in clusters[:limit]]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'clusters': len(self._clusters),
+                'max_clusters': self.max_clusters,
+                'messages_indexed': self.messages_indexed,
+                'confirmed_scam_clusters': sum(1 for c in self._clusters.values() if c.confirmed_scam)
+            }
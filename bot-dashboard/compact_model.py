@@ -0,0 +1,73 @@
+# compact_model.py - Read the compact (NumPy) export of the TF-IDF + Naive Bayes model
+import json
+import os
+
+import numpy as np
+
+# Must match bot/export_compact.py (checked by tests/test_model_parity.py)
+FORMAT_NAME = 'scam-detector-compact'
+FORMAT_VERSION = 2
+
+# Version 1 stored the vocabulary as UCS-4 strings and float64 weights only
+SUPPORTED_VERSIONS = (1, 2)
+
+ARRAY_NAMES = ('vocabulary', 'idf', 'feature_log_prob', 'class_log_prior')
+
+
+def is_compact_model(path):
+    """True if path is a directory written by bot/export_compact.py"""
+    return os.path.isfile(os.path.join(path, 'meta.json'))
+
+
+class QuantizedArray:
+    """uint8 weight codes with a per-row scale and offset, dequantized as they are read.
+
+    Indexing with a row (or an array of rows) first, as in
+    weights[k, cols], returns float64 values, so the engine can use it in
+    place of the float array while the codes stay memory-mapped.
+    """
+
+    def __init__(self, codes, scale, offset):
+        self.codes = np.asarray(codes)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.offset = np.asarray(offset, dtype=np.float64)
+        self.shape = self.codes.shape
+
+    def __getitem__(self, key):
+        rows = key[0] if isinstance(key, tuple) else key
+        return self.codes[key] * self.scale[rows] + self.offset[rows]
+
+    def __len__(self):
+        return len(self.codes)
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes
+
+
+def load_compact_model(path, mmap=True):
+    """Read meta.json and the model arrays from a compact export directory.
+
+    The arrays are memory-mapped by default, so loading needs neither
+    sklearn nor unpickling and workers mapping the same files share their
+    pages. The vocabulary is a sorted string array and every weight column
+    is stored in that same order. Version 2 stores the vocabulary as UTF-8
+    bytes, and its weights may be float32, float16 or uint8 codes, which
+    come back wrapped in a QuantizedArray.
+
+    Returns (meta, arrays) where arrays maps ARRAY_NAMES to ndarrays.
+    """
+    with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get('format') != FORMAT_NAME or meta.get('version') not in SUPPORTED_VERSIONS:
+        raise ValueError(f"Unsupported compact model format in {path}")
+
+    mode = 'r' if mmap else None
+    arrays = {
+        name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mode)
+        for name in ARRAY_NAMES
+    }
+    weights = meta.get('weights') or {}
+    if weights.get('dtype') == 'uint8':
+        arrays['feature_log_prob'] = QuantizedArray(arrays['feature_log_prob'], weights['scale'], weights['offset'])
+    return meta, arrays
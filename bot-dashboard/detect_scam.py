@@ -1,153 +1,576 @@
 # detect_scam.py - Enhanced for Dashboard
 import joblib
+import logging
+import math
+import numpy as np
+import os
 import re
-from datetime import datetime
+import threading
+import time
+from analysis_result import AnalysisResult, Finding, timestamp
+from campaign_index import CampaignIndex
+from compact_model import QuantizedArray, is_compact_model, load_compact_model
+from metrics import MetricsRegistry, Profiler
+from result_cache import ResultCache, message_key
+from rule_packs import DEFAULT_RULES_DIR, SEVERITY_WEIGHTS, RuleSet, load_rules
+from url_reputation import UrlReputation
+
+logger = logging.getLogger(__name__)
+
+LINK_PATTERN = re.compile(r'http|bit\.ly|tinyurl')
+
+LOAD_MODES = ('eager', 'lazy', 'background')
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096, 10000)
+
+# Batches up to this size are scored in plain Python, where NumPy call overhead
+# would cost more than the arithmetic itself
+SMALL_BATCH = 8
+
+# Largest allowed gap between engine and sklearn probabilities on warmup
+ENGINE_TOLERANCE = 1e-6
+
+# Cascade first tier: messages it can decide confidently never reach the model
+CASCADE_DEFAULTS = {
+    'safe_max_length': 320,        # two SMS segments
+    'safe_max_upper_ratio': 0.6,   # mostly-capitals text is treated as shouting
+    'scam_min_critical': 2,        # a link plus this many critical indicators is a scam
+    'scam_min_findings': 3,        # ... or a link plus this many indicators
+    'scam_min_risk_score': 75,     #     at this risk score or above
+}
+
+# Cues that keep a message without pattern hits away from the 'safe' shortcut:
+# money symbols and calls to action that scams share with many legitimate texts
+CASCADE_CUES = re.compile(
+    r'[₹$€£%]|\brs\.?\s?\d|\b(?:click|apply|claim|loan|eligible|selected|offer|free|reward'
+    r'|cashback|refund|compensation|salary|job|payment|pending|dear customer)')
+
+RISK_LEVELS = ('critical', 'high', 'medium', 'low')
+
+# Finding type added by url_findings() for links to blocklisted domains
+BLOCKLIST_FINDING = 'Blocklisted Link'
+
+# Categories with their own recommendation; other categories don't change the list
+RECOMMENDATION_CATEGORIES = ('financial', 'identity', 'phishing', 'security')
+
+SUMMARIES = {
+    'critical': "⚠️ This message shows strong scam indicators! Do not engage.",
+    'high': "⚠️ This message shows strong scam indicators! Do not engage.",
+    'medium': "⚠️ This message has some suspicious elements. Be very careful.",
+    'low': "✅ This message appears to be legitimate.",
+}
+
+ENGINE_CHECK_MESSAGES = [
+    "warmup message",
+    "Congratulations! You won a lottery. Click here http://bit.ly/claim to get your prize",
+    "URGENT: your bank account is blocked, share OTP to verify your KYC",
+    "Hi, are we still meeting for lunch tomorrow at 3 PM?",
+]
+
+
+def top_terms(rows, cols, weights, scores, feature_log_prob, terms, top_k=5):
+    """The top_k terms pushing each message towards its predicted class.
+    
+    rows, cols and weights are the sparse TF-IDF entries used for the
+    prediction, scores any per-class matrix ordered like the joint log
+    likelihood (or the probabilities) and terms an array of the vocabulary
+    by column. A term's contribution is its weight times the gap between
+    its log-probability under the predicted class and under the runner-up;
+    together with the prior gap the contributions add up exactly to the
+    log-odds between the two classes. Returns one list per message of
+    {'term', 'contribution'} dicts, largest first, positive ones only.
+    """
+    explanations = [[] for _ in range(len(scores))]
+    if not len(rows) or top_k <= 0 or scores.shape[1] < 2:
+        return explanations
+    
+    # A stable sort breaks ties towards the lower class, like argmax
+    ranked = np.argsort(-scores, axis=1, kind='stable')[:, :2]
+    best, runner = feature_log_prob[ranked[rows].T, cols]
+    contributions = weights * best - weights * runner
+    
+    # Group by message, largest contribution first; keep the first top_k positive ones of each
+    order = np.lexsort((cols, -contributions, rows))
+    grouped = rows[order]
+    rank = np.arange(len(order)) - np.searchsorted(grouped, grouped)
+    order = order[(rank < top_k) & (contributions[order] > 0)]
+    names = terms[cols[order]].tolist()
+    if terms.dtype.kind == 'S':
+        names = [name.decode('utf-8') for name in names]
+    for row, term, contribution in zip(rows[order].tolist(), names, contributions[order].tolist()):
+        explanations[row].append({'term': term, 'contribution': round(contribution, 3)})
+    return explanations
+
+
+class NaiveBayesEngine:
+    """Inference engine for TF-IDF + MultinomialNB pipelines.
+    
+    At inference time the pipeline reduces to tokenizing, looking terms up
+    in the vocabulary, applying IDF weights and normalization, and a sparse
+    dot product with feature_log_prob_. This engine does exactly that with
+    a precompiled tokenizer and NumPy, skipping sklearn's per-call input
+    validation and sparse-matrix construction, which dominate the cost for
+    single messages.
+    
+    The vocabulary is either a dict (term -> column, as in the fitted
+    vectorizer) or a sorted string array searched with np.searchsorted
+    (the compact export, as UTF-8 bytes since format version 2), and
+    feature_log_prob may be float64, float32, float16 or a QuantizedArray.
+    Exposes predict_proba() and classes_ like the sklearn Pipeline;
+    predict_proba_explained() also returns the terms behind each
+    prediction from the same TF-IDF rows.
+    """
+    
+    def __init__(self, classes, vocabulary, idf, feature_log_prob, class_log_prior,
+                 lowercase=True, token_pattern=r"(?u)\b\w\w+\b", ngram_range=(1, 1),
+                 stop_words=None, norm='l2', use_idf=True, sublinear_tf=False, binary=False):
+        if norm not in (None, 'l1', 'l2'):
+            raise ValueError(f"Unsupported norm: {norm}")
+        self.classes_ = np.asarray(classes)
+        self.vocabulary = vocabulary
+        # np.asarray keeps a memory-mapped export mapped (and float32/float16 arrays
+        # narrow) but skips np.memmap's indexing overhead
+        idf = np.asarray(idf) if use_idf else None
+        self.idf = idf if idf is None or idf.dtype.kind == 'f' else idf.astype(np.float64)
+        if not isinstance(feature_log_prob, QuantizedArray):
+            feature_log_prob = np.asarray(feature_log_prob)
+        self.feature_log_prob = feature_log_prob
+        self.class_log_prior = np.asarray(class_log_prior, dtype=np.float64)
+        self.lowercase = lowercase
+        self.ngram_range = tuple(ngram_range)
+        self.stop_words = frozenset(stop_words or ())
+        self.norm = norm
+        self.sublinear_tf = sublinear_tf
+        self.binary = binary
+        self._tokenize = re.compile(token_pattern).findall
+        
+        # Plain-list copies of the weights for the small-batch path
+        self._small = isinstance(vocabulary, dict)
+        if self._small:
+            self._idf_list = self.idf.tolist() if self.idf is not None else None
+            self._flp_lists = [np.asarray(row, dtype=np.float64).tolist() for row in feature_log_prob]
+            self._prior_list = self.class_log_prior.tolist()
+        self._terms = None
+    
+    @classmethod
+    def from_pipeline(cls, pipeline):
+        """Extract the engine arrays from a fitted TfidfVectorizer + MultinomialNB pipeline"""
+        steps = [step for _, step in getattr(pipeline, 'steps', [])]
+        if len(steps) != 2:
+            raise ValueError("Expected a two-step vectorizer + classifier pipeline")
+        vectorizer, classifier = steps
+        if not hasattr(vectorizer, 'vocabulary_') or (
+                getattr(vectorizer, 'use_idf', False) and not hasattr(vectorizer, 'idf_')):
+            raise ValueError("Vectorizer is not a fitted TfidfVectorizer")
+        if not hasattr(classifier, 'feature_log_prob_'):
+            raise ValueError("Classifier is not a fitted MultinomialNB")
+        if vectorizer.analyzer != 'word' or vectorizer.tokenizer or vectorizer.preprocessor \
+                or vectorizer.strip_accents:
+            raise ValueError("Only the default word analyzer is supported")
+        
+        return cls(
+            classifier.classes_, vectorizer.vocabulary_,
+            vectorizer.idf_ if vectorizer.use_idf else None,
+            classifier.feature_log_prob_, classifier.class_log_prior_,
+            lowercase=vectorizer.lowercase, token_pattern=vectorizer.token_pattern,
+            ngram_range=vectorizer.ngram_range, stop_words=vectorizer.get_stop_words(),
+            norm=vectorizer.norm, use_idf=vectorizer.use_idf,
+            sublinear_tf=vectorizer.sublinear_tf, binary=vectorizer.binary
+        )
+    
+    @classmethod
+    def from_compact(cls, path, mmap=True):
+        """Load the engine from a compact export directory (no sklearn needed)"""
+        meta, arrays = load_compact_model(path, mmap=mmap)
+        return cls(
+            meta['classes'], arrays['vocabulary'], arrays['idf'],
+            arrays['feature_log_prob'], arrays['class_log_prior'],
+            lowercase=meta['lowercase'], token_pattern=meta['token_pattern'],
+            ngram_range=meta['ngram_range'], stop_words=meta['stop_words'],
+            norm=meta['norm'], use_idf=meta['use_idf'],
+            sublinear_tf=meta['sublinear_tf'], binary=meta['binary']
+        )
+    
+    def analyze(self, message):
+        """Split a message into the same terms as sklearn's word analyzer"""
+        if self.lowercase:
+            message = message.lower()
+        tokens = self._tokenize(message)
+        if self.stop_words:
+            stop_words = self.stop_words
+            tokens = [t for t in tokens if t not in stop_words]
+        
+        min_n, max_n = self.ngram_range
+        if max_n == 1:
+            return tokens
+        terms = list(tokens) if min_n == 1 else []
+        for n in range(max(min_n, 2), max_n + 1):
+            terms.extend(' '.join(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+        return terms
+    
+    def _columns(self, terms):
+        """Map terms to vocabulary columns; returns (found mask, columns)"""
+        vocabulary = self.vocabulary
+        if isinstance(vocabulary, dict):
+            get = vocabulary.get
+            cols = np.fromiter((get(t, -1) for t in terms), dtype=np.int64, count=len(terms))
+            return cols >= 0, cols
+        if vocabulary.dtype.kind == 'S':
+            terms = np.array([t.encode('utf-8') for t in terms])
+        else:
+            terms = np.array(terms)
+        cols = np.searchsorted(vocabulary, terms)
+        cols[cols == len(vocabulary)] = 0
+        return vocabulary[cols] == terms, cols
+    
+    def transform(self, messages):
+        """Sparse TF-IDF rows as (rows, cols, weights) arrays, one entry per distinct term"""
+        rows = []
+        terms = []
+        for row, message in enumerate(messages):
+            message_terms = self.analyze(message)
+            rows.extend([row] * len(message_terms))
+            terms.extend(message_terms)
+        
+        if not terms:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, np.zeros(0)
+        
+        found, cols = self._columns(terms)
+        rows = np.array(rows)[found]
+        cols = cols[found]
+        
+        # Term counts per (message, feature) pair
+        n_features = len(self.vocabulary)
+        keys, counts = np.unique(rows * n_features + cols, return_counts=True)
+        rows, cols = keys // n_features, keys % n_features
+        
+        weights = counts.astype(np.float64)
+        if self.binary:
+            weights[:] = 1.0
+        elif self.sublinear_tf:
+            weights = 1.0 + np.log(weights)
+        if self.idf is not None:
+            weights *= self.idf[cols]
+        if self.norm == 'l2':
+            weights /= np.sqrt(np.bincount(rows, weights * weights))[rows]
+        elif self.norm == 'l1':
+            weights /= np.bincount(rows, np.abs(weights))[rows]
+        return rows, cols, weights
+    
+    @property
+    def terms(self):
+        """Vocabulary terms as an array indexed by column"""
+        terms = self._terms
+        if terms is None:
+            if isinstance(self.vocabulary, dict):
+                # Reverse lookup for dict vocabularies, built on first use
+                terms = np.empty(len(self.vocabulary), dtype=object)
+                terms[list(self.vocabulary.values())] = list(self.vocabulary)
+            else:
+                # A plain view, so indexing skips np.memmap's per-call overhead
+                terms = np.asarray(self.vocabulary)
+            self._terms = terms
+        return terms
+    
+    def _weights_small(self, message):
+        """TF-IDF weights of one message as a {column: weight} dict"""
+        get = self.vocabulary.get
+        counts = {}
+        for term in self.analyze(message):
+            col = get(term)
+            if col is not None:
+                counts[col] = counts.get(col, 0) + 1
+        
+        idf = self._idf_list
+        weights = {}
+        for col, count in counts.items():
+            if self.binary:
+                weight = 1.0
+            elif self.sublinear_tf:
+                weight = 1.0 + math.log(count)
+            else:
+                weight = float(count)
+            weights[col] = weight * idf[col] if idf is not None else weight
+        
+        if weights and self.norm == 'l2':
+            scale = math.sqrt(sum(w * w for w in weights.values()))
+            weights = {col: w / scale for col, w in weights.items()}
+        elif weights and self.norm == 'l1':
+            scale = sum(abs(w) for w in weights.values())
+            weights = {col: w / scale for col, w in weights.items()}
+        return weights
+    
+    def _joint_log_likelihood_small(self, vectors):
+        return np.array([
+            [prior + sum(w * flp[col] for col, w in weights.items())
+             for prior, flp in zip(self._prior_list, self._flp_lists)]
+            for weights in vectors
+        ])
+    
+    def _joint_log_likelihood_sparse(self, n_messages, rows, cols, weights):
+        jll = np.tile(self.class_log_prior, (n_messages, 1))
+        if len(rows):
+            for k in range(len(self.classes_)):
+                jll[:, k] += np.bincount(rows, weights * self.feature_log_prob[k, cols],
+                                         minlength=n_messages)
+        return jll
+    
+    def joint_log_likelihood(self, messages):
+        if self._small and len(messages) <= SMALL_BATCH:
+            return self._joint_log_likelihood_small([self._weights_small(m) for m in messages])
+        return self._joint_log_likelihood_sparse(len(messages), *self.transform(messages))
+    
+    @staticmethod
+    def _proba(jll):
+        jll -= jll.max(axis=1, keepdims=True)
+        proba = np.exp(jll)
+        proba /= proba.sum(axis=1, keepdims=True)
+        return proba
+    
+    def predict_proba(self, messages):
+        """Class probabilities for each message, matching Pipeline.predict_proba"""
+        return self._proba(self.joint_log_likelihood(messages))
+    
+    def predict_proba_explained(self, messages, top_k=5):
+        """predict_proba() plus top_terms() for each message, from one vectorization"""
+        if self._small and len(messages) <= SMALL_BATCH:
+            jll, explanations = zip(*(self._explain_small(self._weights_small(m), top_k) for m in messages))
+            jll, explanations = np.array(jll), list(explanations)
+        else:
+            rows, cols, weights = self.transform(messages)
+            jll = self._joint_log_likelihood_sparse(len(messages), rows, cols, weights)
+            explanations = top_terms(rows, cols, weights, jll, self.feature_log_prob, self.terms, top_k)
+        return self._proba(jll), explanations
+    
+    def _explain_small(self, weights, top_k):
+        """Joint log likelihood and top_terms() of one {column: weight} vector, in plain Python.
+        
+        The per-term products summed into the likelihood are kept, so each
+        contribution is just the difference of two of them.
+        """
+        products = [[w * flp[col] for col, w in weights.items()] for flp in self._flp_lists]
+        scores = [prior + sum(p) for prior, p in zip(self._prior_list, products)]
+        if not weights or top_k <= 0 or len(scores) < 2:
+            return scores, []
+        if len(scores) == 2:
+            best = 0 if scores[0] >= scores[1] else 1
+            runner = 1 - best
+        else:
+            # A stable sort keeps argmax's tie-breaking towards the lower class
+            best, runner = sorted(range(len(scores)), key=lambda k: -scores[k])[:2]
+        # Same order as top_terms(): largest contribution first, then lowest column
+        top = sorted([(r - b, col) for b, r, col in zip(products[best], products[runner], weights)])
+        terms = self.terms
+        return scores, [{'term': terms[col], 'contribution': round(-negated, 3)}
+                        for negated, col in top[:top_k] if negated < 0]
+    
+    def predict(self, messages):
+        return self.classes_[self.joint_log_likelihood(messages).argmax(axis=1)]
+
 
 class ScamDetector:
-    def __init__(self, model_path='scam_detector_model.joblib'):
-        """Initialize the scam detector"""
+    def __init__(self, model_path='scam_detector_model.joblib', cache_size=10000, cache_ttl=300,
+                 campaigns=True, load_mode='eager', cascade=False, url_reputation=None,
+                 rules=None, rule_cache=None, rule_locales=None, explain_top_k=5):
+        """Initialize the scam detector
+        
+        cache_size bounds the repeated-message result cache (0 disables it)
+        and cache_ttl is how many seconds a cached result stays valid.
+        campaigns enables near-duplicate campaign clustering.
+        load_mode is 'eager' (load now), 'lazy' (load on first prediction)
+        or 'background' (load in a thread from the first ensure_loading() or
+        prediction on; patterns serve in the meantime).
+        model_path may be a joblib pipeline or a compact export directory.
+        cascade enables the cheap first tier in front of the model: True
+        for CASCADE_DEFAULTS, or a dict overriding some of them.
+        url_reputation is a UrlReputation with block/allow lists; without
+        one, links are still extracted and reported as 'unknown'.
+        rules is a rule pack file or directory (default: the bundled
+        rules/) or an already-compiled RuleSet; rule_cache is where compiled
+        rules are cached and rule_locales limits locale-tagged rules.
+        explain_top_k is how many of the terms behind a model verdict are
+        reported in ai_top_terms (0 disables them).
+        """
+        if load_mode not in LOAD_MODES:
+            raise ValueError(f"load_mode must be one of {LOAD_MODES}")
         self.model_path = model_path
         self.model = None
-        self.load_model()
-        
-        # Enhanced scam patterns with explanations
-        self.scam_patterns = {
-            'lottery_winning': {
-                'patterns': [r'won', r'winner', r'lottery', r'prize', r'congratulation'],
-                'explanation': 'Claims you won something - common lottery scam',
-                'severity': 'high',
-                'category': 'financial'
-            },
-            'kyc_update': {
-                'patterns': [r'kyc', r'update.*account', r'verify.*account', r'aadhaar', r'pan'],
-                'explanation': 'Asking for KYC/personal documents - bank impersonation scam',
-                'severity': 'critical',
-                'category': 'identity'
-            },
-            'account_suspension': {
-                'patterns': [r'suspended', r'blocked', r'deactivated', r'closed'],
-                'explanation': 'Threatening to suspend account to create panic',
-                'severity': 'high',
-                'category': 'threat'
-            },
-            'otp_request': {
-                'patterns': [r'otp', r'one time password', r'share.*otp', r'verify.*otp'],
-                'explanation': 'Requesting OTP - legitimate companies NEVER ask for OTP',
-                'severity': 'critical',
-                'category': 'security'
-            },
-            'suspicious_link': {
-                'patterns': [r'click here', r'bit\.ly', r'tinyurl', r'http', r'www', r'\.com'],
-                'explanation': 'Contains suspicious link that could be phishing',
-                'severity': 'high',
-                'category': 'phishing'
-            },
-            'urgency': {
-                'patterns': [r'urgent', r'immediate', r'action required', r'warning'],
-                'explanation': 'Creates false urgency to pressure you',
-                'severity': 'medium',
-                'category': 'tactic'
-            },
-            'job_offer': {
-                'patterns': [r'work from home', r'earn money', r'part time', r'data entry', r'online job'],
-                'explanation': 'Too-good-to-be-true job offer - common employment scam',
-                'severity': 'medium',
-                'category': 'employment'
-            },
-            'free_offer': {
-                'patterns': [r'free', r'gift', r'offer', r'discount', r'limited time'],
-                'explanation': 'Offers something free to lure you in',
-                'severity': 'medium',
-                'category': 'enticement'
-            },
-            'parcel_courier': {
-                'patterns': [r'parcel', r'courier', r'fedex', r'dhl', r'package', r'customs'],
-                'explanation': 'Fake parcel/courier scam - common in India',
-                'severity': 'high',
-                'category': 'delivery'
-            },
-            'payment_request': {
-                'patterns': [r'payment pending', r'transaction failed', r'refund', r'money back', r'send money'],
-                'explanation': 'Fake payment issues or money requests',
-                'severity': 'high',
-                'category': 'financial'
-            },
-            'banking_alert': {
-                'patterns': [r'bank account', r'debit card', r'credit card', r'atm', r'net banking'],
-                'explanation': 'Banking-related scam - impersonating bank officials',
-                'severity': 'critical',
-                'category': 'financial'
-            },
-            'govt_impersonation': {
-                'patterns': [r'income tax', r'itr', r'government', r'sarkari', r'official'],
-                'explanation': 'Impersonating government officials - serious scam',
-                'severity': 'critical',
-                'category': 'authority'
-            },
-            'investment': {
-                'patterns': [r'investment', r'returns', r'profit', r'double.*money', r'quick money'],
-                'explanation': 'Fake investment scheme promising high returns',
-                'severity': 'high',
-                'category': 'financial'
-            },
-            'lottery_overseas': {
-                'patterns': [r'uk lottery', r'canada', r'usa', r'international', r'foreign'],
-                'explanation': 'Claims of winning foreign lottery - common scam',
-                'severity': 'high',
-                'category': 'financial'
-            },
-            'friendship_trap': {
-                'patterns': [r'dear friend', r'help me', r'need money', r'emergency', r'please help'],
-                'explanation': 'Emotional manipulation to extract money',
-                'severity': 'medium',
-                'category': 'social'
-            }
-        }
+        self.engine = None
+        self.explain_top_k = explain_top_k
+        self._feature_names = None
+        self.model_version = 0
+        self.model_state = 'not_loaded'
+        self.load_mode = load_mode
+        self._load_lock = threading.Lock()
+        self._loader_lock = threading.Lock()
+        self._loader_pid = None
+        self.cache = ResultCache(max_size=cache_size, ttl=cache_ttl)
+        self.campaigns = CampaignIndex() if campaigns else None
+        self.urls = url_reputation or UrlReputation()
+        self.cascade = None
+        if cascade:
+            self.cascade = dict(CASCADE_DEFAULTS, **(cascade if isinstance(cascade, dict) else {}))
+        
+        # Per-stage timings and counters, rendered by /api/metrics
+        self.metrics = MetricsRegistry()
+        self.profiler = Profiler()
+        self._stage_seconds = self.metrics.histogram(
+            'scam_detector_stage_seconds', 'Time spent in each analysis stage', labels=('stage',))
+        self._batch_sizes = self.metrics.histogram(
+            'scam_detector_batch_size', 'Messages per analyze_many call', buckets=BATCH_SIZE_BUCKETS)
+        self._messages = self.metrics.counter(
+            'scam_detector_messages_total', 'Messages analyzed, by how the result was produced',
+            labels=('source',))
+        self._model_errors = self.metrics.counter(
+            'scam_detector_model_errors_total', 'Model prediction failures')
+        self._risk_levels = self.metrics.counter(
+            'scam_detector_risk_level_total', 'Results by risk level', labels=('level',))
+        
+        if load_mode == 'eager':
+            self.load_model()
+        elif load_mode == 'background':
+            # The loader thread starts on first use (ensure_loading), in the
+            # process that serves: forking with it running is not safe
+            self.model_state = 'loading'
+        
+        # Scam patterns come from versioned rule packs (rules/*.json), compiled
+        # once and cached on disk; set_rules() swaps in a reloaded set
+        self.rules = rules if isinstance(rules, RuleSet) else load_rules(
+            rules or DEFAULT_RULES_DIR, cache_dir=rule_cache, locales=rule_locales)
+        self.cache.mask_numbers = not self.rules.digit_sensitive
+        
+        # One recommendation tuple per risk level and category combination
+        self._recommendation_sets = {}
+        for level in RISK_LEVELS:
+            for mask in range(1 << len(RECOMMENDATION_CATEGORIES)):
+                categories = frozenset(c for bit, c in enumerate(RECOMMENDATION_CATEGORIES) if mask >> bit & 1)
+                self._recommendation_sets[level, categories] = tuple(
+                    self._build_recommendations(level, categories))
+    
+    def ensure_loading(self):
+        """Start the background model load in this process, once (load_mode='background').
+        
+        Threads don't survive fork, so each worker of a preloaded app
+        starts its own; predict() calls this too.
+        """
+        if self.load_mode != 'background' or self._loader_pid == os.getpid():
+            return
+        with self._loader_lock:
+            if self._loader_pid != os.getpid():
+                threading.Thread(target=self.load_model, name='model-loader', daemon=True).start()
+                self._loader_pid = os.getpid()
     
     def load_model(self):
-        """Load the trained model"""
-        try:
-            self.model = joblib.load(self.model_path)
+        """Load the trained model (joblib pipeline or compact NumPy export)"""
+        with self._load_lock:
+            self.model_state = 'loading'
+            try:
+                if is_compact_model(self.model_path):
+                    model = engine = NaiveBayesEngine.from_compact(self.model_path)
+                else:
+                    model = joblib.load(self.model_path)
+                    engine = self._build_engine(model)
+                # Warm up so the first real request doesn't pay one-off costs
+                (engine or model).predict_proba(["warmup message"])
+            except Exception as e:
+                self.model_state = 'failed'
+                print(f"⚠️ Model not loaded: {e}")
+                return False
+            
+            self._install(model, engine)
             print("✅ Model loaded successfully!")
             return True
+    
+    def swap_model(self, model):
+        """Replace the live model with an already-loaded one, without a restart.
+        
+        The new model is checked and warmed up before the swap; requests in
+        flight finish on the old model and the next ones use the new one.
+        """
+        engine = model if isinstance(model, NaiveBayesEngine) else self._build_engine(model)
+        (engine or model).predict_proba(["warmup message"])
+        with self._load_lock:
+            self._install(model, engine)
+    
+    def build_scorer(self, model):
+        """Warmed-up predict_proba provider for a model, using the fast engine if possible"""
+        scorer = model if isinstance(model, NaiveBayesEngine) else (self._build_engine(model) or model)
+        scorer.predict_proba(["warmup message"])
+        return scorer
+    
+    def _install(self, model, engine):
+        # Caller holds _load_lock
+        self.model = model
+        self.engine = engine
+        self.model_version += 1
+        self.cache.clear()
+        self.model_state = 'ready'
+    
+    def _build_engine(self, pipeline):
+        """Build the fast engine for a pipeline, or None if it isn't supported.
+        
+        The engine is only used if it reproduces the pipeline's probabilities
+        on a few reference messages.
+        """
+        try:
+            engine = NaiveBayesEngine.from_pipeline(pipeline)
+            gap = np.abs(engine.predict_proba(ENGINE_CHECK_MESSAGES)
+                         - pipeline.predict_proba(ENGINE_CHECK_MESSAGES)).max()
         except Exception as e:
-            print(f"⚠️ Model not loaded: {e}")
-            return False
+            logger.info("Fast inference engine not available: %s", e)
+            return None
+        if gap > ENGINE_TOLERANCE:
+            logger.warning("Fast inference engine disagrees with the pipeline (%.2g), not using it", gap)
+            return None
+        return engine
+    
+    @property
+    def ready(self):
+        """True once the model is loaded and warmed up
+        
+        A lazy detector is also ready before its first prediction, which is
+        what loads the model; otherwise it would wait for traffic that a
+        readiness gate never lets through.
+        """
+        return self.model_state == 'ready' or (self.load_mode == 'lazy' and self.model_state == 'not_loaded')
+    
+    @property
+    def scam_patterns(self):
+        return self.rules.rules
+    
+    def set_rules(self, rules):
+        """Switch to a new compiled RuleSet; cached results from the old rules are dropped
+        
+        Cache keys stop masking digits while any rule's patterns look at them,
+        since "pay 500" and "pay 5000" may then get different findings.
+        """
+        self.rules = rules
+        self.cache.mask_numbers = not rules.digit_sensitive
+        self.cache.clear()
     
     def analyze_patterns(self, message):
         """Analyze message against scam patterns"""
-        message_lower = message.lower()
-        findings = []
-        
-        for scam_type, info in self.scam_patterns.items():
-            for pattern in info['patterns']:
-                if re.search(pattern, message_lower):
-                    findings.append({
-                        'type': scam_type.replace('_', ' ').title(),
-                        'explanation': info['explanation'],
-                        'severity': info['severity'],
-                        'category': info['category'],
-                        'matched_pattern': pattern
-                    })
-                    break  # Found one pattern for this type
-        
-        return findings
+        return self.rules.match(message)
+    
+    def url_findings(self, urls):
+        """Extra finding for links to blocklisted domains"""
+        blocked = [u['matched'] for u in urls if u['verdict'] == 'blocked']
+        if not blocked:
+            return []
+        return [Finding(BLOCKLIST_FINDING,
+                        'Links to a known scam domain: ' + ', '.join(dict.fromkeys(blocked)),
+                        'critical', 'phishing', blocked[0])]
     
     def calculate_risk_score(self, findings):
         """Calculate overall risk score based on findings"""
-        severity_weights = {
-            'critical': 4,
-            'high': 3,
-            'medium': 2,
-            'low': 1
-        }
-        
         if not findings:
             return 0, 'low'
         
-        # Calculate weighted score
-        total_weight = sum(severity_weights.get(f['severity'], 1) for f in findings)
-        max_possible = len(findings) * 4  # Critical weight is 4
+        # Calculate weighted score; each rule's weight scales its share
+        weights = [getattr(f, 'weight', 1.0) for f in findings]
+        total_weight = sum(w * SEVERITY_WEIGHTS.get(f['severity'], 1) for w, f in zip(weights, findings))
+        max_possible = sum(weights) * 4  # Critical weight is 4
         risk_percentage = (total_weight / max_possible) * 100 if max_possible > 0 else 0
         
         # Determine risk level
@@ -164,6 +587,17 @@ class ScamDetector:
     
     def get_recommendations(self, risk_level, findings):
         """Get recommendations based on risk level and findings"""
+        return list(self._recommendations_for(risk_level, findings))
+    
+    def _recommendations_for(self, risk_level, findings):
+        """Shared, precomputed recommendation tuple for a result"""
+        categories = frozenset(f['category'] for f in findings).intersection(RECOMMENDATION_CATEGORIES)
+        recommendations = self._recommendation_sets.get((risk_level, categories))
+        if recommendations is None:
+            recommendations = tuple(self._build_recommendations(risk_level, categories))
+        return recommendations
+    
+    def _build_recommendations(self, risk_level, categories):
         recommendations = []
         
         # General recommendations based on risk level
@@ -189,8 +623,6 @@ class ScamDetector:
             ])
         
         # Category-specific recommendations
-        categories = set(f['category'] for f in findings)
-        
         if 'financial' in categories:
             recommendations.append("💰 Never share bank details, OTP, or UPI PIN")
         
@@ -205,69 +637,332 @@ class ScamDetector:
         
         return list(dict.fromkeys(recommendations))  # Remove duplicates
     
-    def analyze(self, message):
-        """Complete message analysis"""
-        if not message or not isinstance(message, str):
-            return {
-                'error': 'Invalid message format',
-                'original_message': message
-            }
-        
-        # Initialize result
-        result = {
-            'original_message': message,
-            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'ai_prediction': None,
-            'ai_confidence': 0,
-            'scam_indicators': [],
-            'risk_score': 0,
-            'risk_level': 'low',
-            'recommendations': [],
-            'message_length': len(message),
-            'has_links': bool(re.search(r'http|bit\.ly|tinyurl', message.lower()))
-        }
+    def prefilter(self, message, findings, urls=()):
+        """Cascade first tier: 'safe', 'scam' or None when the model must decide.
         
-        # Step 1: AI Model Prediction (if available)
-        if self.model:
-            try:
-                prediction = self.model.predict([message])[0]
-                probabilities = self.model.predict_proba([message])[0]
-                confidence = max(probabilities) * 100
-                
-                result['ai_prediction'] = prediction
-                result['ai_confidence'] = round(confidence, 1)
-            except Exception as e:
-                print(f"Model prediction error: {e}")
+        Only uses what is already known without the model: length, letter
+        case, links, a few keyword cues and the pattern findings. Safe means
+        no indicators, cues or link in a short, normally-cased message;
+        scam needs a link plus several critical indicators, or plus many
+        indicators at a high risk score. Without a link, keyword hits alone
+        also match legitimate texts (a bank's own OTP message), so the
+        model decides.
+        """
+        config = self.cascade
+        message_lower = message.lower()
+        has_links = bool(urls) or bool(LINK_PATTERN.search(message_lower))
+        
+        if not findings:
+            if has_links or len(message) > config['safe_max_length'] or CASCADE_CUES.search(message_lower):
+                return None
+            letters = [c for c in message if c.isalpha()]
+            upper = sum(1 for c in letters if c.isupper())
+            if letters and upper / len(letters) > config['safe_max_upper_ratio']:
+                return None
+            return 'safe'
+        
+        if not has_links:
+            return None
+        critical = sum(1 for f in findings if f['severity'] == 'critical')
+        if critical >= config['scam_min_critical']:
+            return 'scam'
+        if len(findings) >= config['scam_min_findings']:
+            risk_score, _ = self.calculate_risk_score(findings)
+            if risk_score >= config['scam_min_risk_score']:
+                return 'scam'
+        return None
+    
+    def predict(self, messages, explain=False):
+        """Run the AI model over a list of messages in one vectorization pass.
+
+        Returns a list of (prediction, confidence) tuples; labels come from
+        the argmax of a single predict_proba matrix instead of a separate
+        predict call. Entries are (None, 0) when no model is available.
+        With explain=True each tuple also carries the top terms behind the
+        prediction as [{'term', 'contribution'}], computed from the same
+        TF-IDF rows (see top_terms()).
+        """
+        if self.model is None and self.model_state == 'not_loaded' and messages:
+            self.load_model()  # lazy mode
+        self.ensure_loading()
+        
+        if not self.model or not messages:
+            return [(None, 0, []) if explain else (None, 0)] * len(messages)
+        
+        # Prefer the NumPy engine; fall back to the sklearn pipeline
+        scorer = self.engine or self.model
+        top_k = self.explain_top_k if explain else 0
+        start = time.perf_counter()
+        try:
+            if not top_k:
+                probabilities, explanations = scorer.predict_proba(messages), None
+            elif isinstance(scorer, NaiveBayesEngine):
+                probabilities, explanations = scorer.predict_proba_explained(messages, top_k)
+            else:
+                probabilities, explanations = self._pipeline_proba_explained(scorer, messages, top_k)
+        except Exception as e:
+            self._model_errors.inc()
+            logger.warning("Model prediction error: %s", e)
+            return [(None, 0, []) if explain else (None, 0)] * len(messages)
+        self._stage_seconds.observe(time.perf_counter() - start, stage='model_predict')
+        
+        classes = scorer.classes_
+        best = probabilities.argmax(axis=1)
+        predictions = [
+            (classes[idx], round(probabilities[row, idx] * 100, 1))
+            for row, idx in enumerate(best)
+        ]
+        if not explain:
+            return predictions
+        return [(prediction, confidence, terms) for (prediction, confidence), terms
+                in zip(predictions, explanations or [[]] * len(predictions))]
+    
+    def _pipeline_proba_explained(self, pipeline, messages, top_k):
+        """predict_proba_explained() for a sklearn pipeline the engine doesn't cover"""
+        steps = [step for _, step in getattr(pipeline, 'steps', [])]
+        if len(steps) != 2 or not hasattr(steps[1], 'feature_log_prob_'):
+            return pipeline.predict_proba(messages), None
+        vectorizer, classifier = steps
+        if self._feature_names is None or self._feature_names[0] is not pipeline:
+            self._feature_names = (pipeline, vectorizer.get_feature_names_out())
+        
+        X = vectorizer.transform(messages).tocsr()
+        probabilities = classifier.predict_proba(X)
+        rows = np.repeat(np.arange(X.shape[0]), np.diff(X.indptr))
+        return probabilities, top_terms(rows, X.indices, X.data, probabilities,
+                                        classifier.feature_log_prob_, self._feature_names[1], top_k)
+    
+    def _build_result(self, message, prediction, confidence, findings=None, decided_by=None, urls=None,
+                      model_terms=None):
+        """Run pattern analysis and scoring around an existing model prediction
+        
+        findings and urls can be passed in when the cascade already computed them;
+        model_terms are the model's explanation from predict(explain=True).
+        """
+        observe = self._stage_seconds.observe
         
         # Step 2: Pattern-based analysis
-        findings = self.analyze_patterns(message)
-        result['scam_indicators'] = findings
+        t0 = time.perf_counter()
+        if findings is None:
+            urls = self.urls.check(message)
+            findings = self.analyze_patterns(message) + self.url_findings(urls)
         
         # Step 3: Calculate risk score
+        t1 = time.perf_counter()
         risk_score, risk_level = self.calculate_risk_score(findings)
-        result['risk_score'] = risk_score
-        result['risk_level'] = risk_level
         
         # Step 4: Get recommendations
-        result['recommendations'] = self.get_recommendations(risk_level, findings)
+        t2 = time.perf_counter()
+        recommendations = self._recommendations_for(risk_level, findings)
         
-        # Step 5: Add summary
-        if risk_level in ['critical', 'high']:
-            result['summary'] = "⚠️ This message shows strong scam indicators! Do not engage."
-        elif risk_level == 'medium':
-            result['summary'] = "⚠️ This message has some suspicious elements. Be very careful."
-        else:
-            result['summary'] = "✅ This message appears to be legitimate."
+        # Step 5: Assemble the result (summary text is shared per risk level)
+        t3 = time.perf_counter()
+        result = AnalysisResult(
+            original_message=message,
+            timestamp=timestamp(),
+            ai_prediction=prediction,
+            ai_confidence=confidence,
+            ai_top_terms=model_terms or [],
+            scam_indicators=findings,
+            risk_score=risk_score,
+            risk_level=risk_level,
+            recommendations=recommendations,
+            message_length=len(message),
+            has_links=bool(LINK_PATTERN.search(message.lower())),
+            urls=urls or [],
+            decided_by=decided_by or ('model' if prediction is not None else 'patterns'),
+            summary=SUMMARIES[risk_level]
+        )
+        t4 = time.perf_counter()
+        
+        observe(t1 - t0, stage='patterns')
+        observe(t2 - t1, stage='risk_score')
+        observe(t3 - t2, stage='recommendations')
+        observe(t4 - t3, stage='summary')
+        return result
+    
+    def analyze(self, message):
+        """Complete message analysis"""
+        return self.analyze_many([message])[0]
+    
+    def analyze_many(self, messages):
+        """Analyze a batch of messages, vectorizing them all at once.
+
+        Results are returned in input order. Invalid entries get the same
+        error dict as analyze() and are left out of the model batch.
+        Messages already in the result cache skip the model and pattern
+        path; messages in a campaign confirmed as a scam reuse its verdict
+        instead of running the model.
+        """
+        start = time.perf_counter()
+        results = self.profiler.run(self._analyze_many, messages)
+        self._stage_seconds.observe(time.perf_counter() - start, stage='total')
+        self._batch_sizes.observe(len(messages))
+        
+        for result in results:
+            level = result.get('risk_level')
+            if level is not None:
+                self._risk_levels.inc(level=level)
+        return results
+    
+    def analyze_degraded(self, messages):
+        """Fast pattern-only results for shedding load, flagged degraded=True.
+        
+        Skips the model, the cascade and campaign clustering. Cached full
+        results are still returned, since they cost nothing; everything
+        else is scored from analyze_patterns() and calculate_risk_score()
+        alone and is not cached.
+        """
+        results = []
+        count = self._messages.inc
+        for message in messages:
+            if not message or not isinstance(message, str):
+                results.append({'error': 'Invalid message format', 'original_message': message})
+                count(source='invalid')
+                continue
+            cached = self.cache.get(self.cache.key_for(message)) if self.cache.enabled else None
+            if cached is not None:
+                results.append(self._from_cache(cached, message))
+                count(source='cache')
+                continue
+            result = self._build_result(message, None, 0, decided_by='degraded')
+            result['degraded'] = True
+            self._risk_levels.inc(level=result['risk_level'])
+            results.append(result)
+            count(source='degraded')
+        return results
+    
+    def _analyze_many(self, messages):
+        results = [None] * len(messages)
+        count = self._messages.inc
+        pending = []
+        keys = {}
+        clusters = {}
+        findings = {}
+        urls = {}
+        
+        for i, message in enumerate(messages):
+            if not message or not isinstance(message, str):
+                results[i] = {
+                    'error': 'Invalid message format',
+                    'original_message': message
+                }
+                count(source='invalid')
+                continue
+            
+            campaign = None
+            if self.campaigns is not None:
+                campaign = clusters[i] = self.campaigns.assign(message)
+            
+            if self.cache.enabled:
+                key = self.cache.key_for(message)
+                cached = self.cache.get(key)
+                if cached is not None:
+                    results[i] = self._from_cache(cached, message)
+                    count(source='cache')
+                    continue
+                keys[i] = key
+            
+            if campaign is not None and campaign.confirmed_scam and campaign.verdict is not None:
+                # Only the campaign's verdict is shared; links and patterns are this message's own
+                verdict = campaign.verdict
+                results[i] = self._build_result(message, verdict['ai_prediction'], verdict['ai_confidence'],
+                                                decided_by='campaign')
+                results[i]['campaign'] = self._campaign_info(campaign, shortcut=True)
+                del clusters[i]
+                count(source='campaign')
+                continue
+            
+            if self.cascade is not None:
+                start = time.perf_counter()
+                urls[i] = self.urls.check(message)
+                findings[i] = self.analyze_patterns(message) + self.url_findings(urls[i])
+                decision = self.prefilter(message, findings[i], urls[i])
+                self._stage_seconds.observe(time.perf_counter() - start, stage='prefilter')
+                if decision is not None:
+                    results[i] = self._build_result(message, None, 0, findings.pop(i),
+                                                    decided_by=f'prefilter_{decision}', urls=urls.pop(i))
+                    if i in keys:
+                        self.cache.put(keys[i], results[i].copy())
+                    count(source='prefilter')
+                    continue
+            
+            pending.append(i)
+        
+        # Step 1: AI Model Prediction for the whole batch (if available)
+        predictions = self.predict([messages[i] for i in pending], explain=True)
+        if pending:
+            count(len(pending), source='full')
+        
+        for i, (prediction, confidence, terms) in zip(pending, predictions):
+            result = self._build_result(messages[i], prediction, confidence, findings.get(i),
+                                        urls=urls.get(i), model_terms=terms)
+            # Don't cache pattern-only results, e.g. while the model is still loading
+            if i in keys and prediction is not None:
+                self.cache.put(keys[i], result.copy())
+            results[i] = result
+        
+        # Only fresh model verdicts vote: cached, prefiltered and pattern-only
+        # results would let one message repeated a few times confirm a campaign
+        for i in pending:
+            if i in clusters and results[i]['ai_prediction'] is not None:
+                self.campaigns.record_verdict(clusters[i], results[i],
+                                              voter=message_key(messages[i], mask_numbers=False))
+        for i, campaign in clusters.items():
+            results[i]['campaign'] = self._campaign_info(campaign)
+        
+        return results
+    
+    def _campaign_info(self, campaign, shortcut=False):
+        """Summarize a message's campaign cluster for the result"""
+        return {
+            'id': campaign.id,
+            'size': campaign.size,
+            'confirmed_scam': campaign.confirmed_scam,
+            'shortcut': shortcut
+        }
+    
+    def _from_cache(self, cached, message):
+        """Copy a cached result for a new message with a fresh timestamp
         
+        Cache keys mask digits, so pay-1.com and pay-2.com share an entry:
+        the links are checked again and, if their verdicts differ, the
+        link findings and the risk built on them are redone.
+        """
+        result = cached.copy()
+        result['original_message'] = message
+        result['message_length'] = len(message)
+        result['timestamp'] = timestamp()
+        urls = self.urls.check(message)
+        if urls != cached['urls']:
+            findings = [f for f in cached['scam_indicators'] if f['type'] != BLOCKLIST_FINDING]
+            findings += self.url_findings(urls)
+            risk_score, risk_level = self.calculate_risk_score(findings)
+            result.update(
+                urls=urls,
+                scam_indicators=findings,
+                risk_score=risk_score,
+                risk_level=risk_level,
+                recommendations=self._recommendations_for(risk_level, findings),
+                summary=SUMMARIES[risk_level]
+            )
         return result
     
     def get_statistics(self):
         """Get detector statistics"""
         return {
             'total_patterns': len(self.scam_patterns),
+            'rules_version': self.rules.version,
             'model_loaded': self.model is not None,
+            'model_state': self.model_state,
+            'model_version': self.model_version,
+            'cascade': self.cascade,
+            'url_reputation': self.urls.stats(),
+            'fast_engine': self.engine is not None,
             'categories': list(set(p['category'] for p in self.scam_patterns.values())),
-            'severity_levels': ['critical', 'high', 'medium', 'low']
+            'severity_levels': ['critical', 'high', 'medium', 'low'],
+            'cache': self.cache.stats(),
+            'campaigns': self.campaigns.stats() if self.campaigns is not None else None
         }
 
 # Quick test if run directly
@@ -0,0 +1,232 @@
+# feedback_updater.py - Apply analyst label corrections to the live model in mini-batches
+import contextlib
+import copy
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+import joblib
+
+logger = logging.getLogger(__name__)
+
+
+class FeedbackUpdater:
+    """Collects corrected labels and folds them into the model with partial_fit.
+
+    Feedback is appended to a JSONL log (so it can also feed the next full
+    retrain). A background thread waits until batch_size items are pending
+    or interval seconds have passed and applies them, so every worker ends
+    up serving the same updated model:
+
+    - With a registry (the dashboard serves registry versions), the batch
+      is fit on the current version's pipeline and published as a new
+      version that becomes current; each worker's RegistryWatcher swaps it
+      in, and a restart loads it like any other version. The registry lock
+      keeps concurrent updates and promotions from overwriting each other.
+    - Without one, the log itself is the queue: every worker tails it from
+      the start, fitting a copy of its classifier and swapping it into the
+      detector, so workers converge and a restart replays the feedback.
+      This needs log_path; with neither, labels stay in this process.
+
+    Local swaps hold the watcher's lock, so a registry swap can't land
+    between reading the live model and replacing it.
+    """
+
+    def __init__(self, detector, batch_size=32, interval=30, weight=1.0, log_path='feedback.jsonl',
+                 registry=None, watcher=None):
+        self.detector = detector
+        self.batch_size = batch_size
+        self.interval = interval
+        self.weight = weight
+        self.log_path = log_path
+        self.registry = registry
+        self.watcher = watcher
+        self._pending = []
+        self._offset = 0
+        self._condition = threading.Condition()
+        self._log_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._pid = None
+        self.received = 0
+        self.applied = 0
+        self.updates = 0
+        self.last_update = None
+        self.last_error = None
+
+    @property
+    def mode(self):
+        if self.registry is not None:
+            return 'registry'
+        return 'log' if self.log_path else 'memory'
+
+    def ensure_started(self):
+        """Start the updater thread once per process (each worker tails the log)"""
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid != os.getpid():
+                threading.Thread(target=self._run, name='feedback-updater', daemon=True).start()
+                self._pid = os.getpid()
+
+    def classes(self):
+        model = self.detector.model
+        return [str(c) for c in getattr(model, 'classes_', [])]
+
+    def supported(self):
+        """True if updates can be applied: to a registry version, or a live pipeline with partial_fit"""
+        if self.registry is not None:
+            return self.registry.current() is not None
+        steps = getattr(self.detector.model, 'steps', None)
+        return bool(steps) and hasattr(steps[-1][1], 'partial_fit')
+
+    def record(self, message, label, analyst=None):
+        """Queue one corrected label; returns the number of pending items"""
+        entry = {
+            'text': message,
+            'label': label,
+            'analyst': analyst,
+            'timestamp': datetime.now().isoformat()
+        }
+        with self._log_lock:
+            if self.log_path:
+                with open(self.log_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+        self.ensure_started()
+        with self._condition:
+            self.received += 1
+            if self.mode == 'log':
+                self._pending.extend(self._read_log())
+            else:
+                self._pending.append((message, label))
+            pending = len(self._pending)
+            if pending >= self.batch_size:
+                self._condition.notify()
+        return pending
+
+    def _read_log(self):
+        """Feedback appended to the log since the last read, as (text, label) pairs (caller holds _condition)"""
+        try:
+            with open(self.log_path, 'rb') as f:
+                f.seek(self._offset)
+                data = f.read()
+        except FileNotFoundError:
+            return []
+        # Another worker may be halfway through writing the last line
+        data = data[:data.rfind(b'\n') + 1]
+        self._offset += len(data)
+        batch = []
+        for line in data.splitlines():
+            try:
+                entry = json.loads(line)
+                batch.append((entry['text'], entry['label']))
+            except (ValueError, KeyError):
+                logger.warning("Skipping malformed feedback line")
+        return batch
+
+    def _take_batch(self):
+        with self._condition:
+            deadline = time.monotonic() + self.interval
+            if self.mode == 'log':
+                self._pending.extend(self._read_log())
+            while len(self._pending) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+                if self.mode == 'log':
+                    self._pending.extend(self._read_log())
+            batch = self._pending[:self.batch_size]
+            del self._pending[:self.batch_size]
+            return batch
+
+    def _run(self):
+        while True:
+            if not self.supported():
+                # e.g. the model is still loading; leave the log unread until it is
+                time.sleep(self.interval or 1)
+                continue
+            batch = self._take_batch()
+            if not batch:
+                continue
+            try:
+                self.apply(batch)
+            except Exception as e:
+                self.last_error = str(e)
+                logger.warning("Feedback update failed: %s", e)
+
+    def apply(self, batch):
+        """Fold a batch of (text, label) pairs into the model (see the class docstring)"""
+        if self.registry is not None:
+            self._publish(batch)
+        else:
+            self._swap(batch)
+
+        self.applied += len(batch)
+        self.updates += 1
+        self.last_update = datetime.now().isoformat()
+        self.last_error = None
+        logger.info("Applied %d feedback labels (update %d)", len(batch), self.updates)
+
+    def _fit(self, pipeline, batch):
+        """A copy of pipeline whose classifier has also seen batch"""
+        steps = getattr(pipeline, 'steps', None)
+        if not steps or not hasattr(steps[-1][1], 'partial_fit'):
+            raise ValueError("Model does not support incremental updates")
+        texts = [message for message, _ in batch]
+        labels = [label for _, label in batch]
+
+        features = pipeline[:-1].transform(texts)
+        name, classifier = steps[-1]
+        classifier = copy.deepcopy(classifier)
+        classifier.partial_fit(features, labels, sample_weight=[self.weight] * len(batch))
+
+        updated = copy.copy(pipeline)
+        updated.steps = steps[:-1] + [(name, classifier)]
+        return updated
+
+    def _swap(self, batch):
+        with self.watcher.lock if self.watcher is not None else contextlib.nullcontext():
+            self.detector.swap_model(self._fit(self.detector.model, batch))
+
+    def _publish(self, batch):
+        """Fit the current registry version on batch and promote the result; returns its id"""
+        registry = self.registry
+        with registry.lock():
+            base = registry.current()
+            if base is None:
+                raise ValueError("The model registry has no current version")
+            registry.verify(base)
+            # Versions always keep the pipeline, even when they serve a compact export
+            pipeline = joblib.load(os.path.join(registry.version_dir(base), 'model.joblib'))
+            path = os.path.join(registry.root, f'.feedback-{os.getpid()}.joblib')
+            joblib.dump(self._fit(pipeline, batch), path)
+            try:
+                version = registry.publish(path, params={'feedback_base': base, 'feedback_labels': len(batch)},
+                                           notes=f"{len(batch)} feedback labels on top of {base}")
+            finally:
+                os.remove(path)
+            registry.promote(version)
+        if self.watcher is not None:
+            self.watcher.poll()
+        return version
+
+    def stats(self):
+        with self._condition:
+            pending = len(self._pending)
+        return {
+            'supported': self.supported(),
+            'mode': self.mode,
+            'received': self.received,
+            'pending': pending,
+            'applied': self.applied,
+            'updates': self.updates,
+            'last_update': self.last_update,
+            'last_error': self.last_error,
+            'batch_size': self.batch_size,
+            'interval_seconds': self.interval,
+            'model_version': self.detector.model_version
+        }
@@ -0,0 +1,327 @@
+# history_store.py - Persistent analysis history in SQLite, written in batches off the request path
+import json
+import logging
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from result_cache import message_key
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS analyses (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    message_hash BLOB NOT NULL,
+    sender TEXT,
+    campaign_id TEXT,
+    prediction TEXT,
+    confidence REAL,
+    risk_score REAL NOT NULL,
+    risk_level TEXT NOT NULL,
+    decided_by TEXT,
+    model_version TEXT,
+    rules_version TEXT,
+    message TEXT,
+    indicators TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS analysis_categories (
+    analysis_id INTEGER NOT NULL REFERENCES analyses(id) ON DELETE CASCADE,
+    category TEXT NOT NULL,
+    PRIMARY KEY (category, analysis_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS analyses_ts ON analyses(ts);
+CREATE INDEX IF NOT EXISTS analyses_risk_level ON analyses(risk_level);
+CREATE INDEX IF NOT EXISTS analyses_message_hash ON analyses(message_hash);
+CREATE INDEX IF NOT EXISTS analyses_sender ON analyses(sender) WHERE sender IS NOT NULL;
+CREATE INDEX IF NOT EXISTS analyses_campaign ON analyses(campaign_id) WHERE campaign_id IS NOT NULL;
+CREATE INDEX IF NOT EXISTS analysis_categories_id ON analysis_categories(analysis_id);
+'''
+
+INSERT_ANALYSIS = '''
+INSERT INTO analyses (ts, message_hash, sender, campaign_id, prediction, confidence, risk_score,
+                      risk_level, decided_by, model_version, rules_version, message, indicators)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+COLUMNS = ('id', 'ts', 'message_hash', 'sender', 'campaign_id', 'prediction', 'confidence',
+           'risk_score', 'risk_level', 'decided_by', 'model_version', 'rules_version',
+           'message', 'indicators')
+
+BUCKETS = {'minute': 60, 'hour': 3600, 'day': 86400}
+
+MAX_PAGE_SIZE = 1000
+
+PREVIEW_LENGTH = 40
+
+_EMAIL = re.compile(r'\S+@\S+')
+_DIGITS = re.compile(r'\d')
+
+
+def message_hash(message):
+    """Case- and whitespace-insensitive 16-byte digest used to look a message up"""
+    return message_key(message, mask_numbers=False)
+
+
+def message_preview(message, length=PREVIEW_LENGTH):
+    """The start of a message with email addresses and digits (phones, OTPs, accounts) masked"""
+    text = _DIGITS.sub('#', _EMAIL.sub('[email]', message))
+    return text if len(text) <= length else text[:length].rstrip() + '…'
+
+
+def connect(path):
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute('PRAGMA journal_mode=WAL')
+    # With WAL, NORMAL only risks the last commits on power loss, never corruption
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA foreign_keys=ON')
+    return conn
+
+
+class HistoryStore:
+    """Append-mostly store of analysis verdicts with indexed lookups.
+
+    record() only puts rows on a bounded in-memory queue, so requests
+    never wait on disk; when the queue is full the rows are dropped and
+    counted rather than blocking. A background thread (started lazily
+    once per worker process) writes the queue in batches of up to
+    batch_size rows per transaction, or whatever arrived within
+    flush_interval seconds. Several workers can share one database file:
+    SQLite's WAL mode lets readers run alongside the single writer.
+
+    Queries page backwards from the newest row with an id cursor, so
+    deep pages cost the same as the first one. The single-column indexes
+    end in the row id, so a filtered page is read in order without a sort.
+
+    Messages are personal data, so by default only their hash (enough to
+    look a message up) and a short masked preview are kept; store_messages
+    keeps the full text instead.
+    """
+
+    def __init__(self, path='analysis_history.db', batch_size=500, flush_interval=1.0,
+                 max_queue=50000, store_messages=False, preview_length=PREVIEW_LENGTH):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.store_messages = store_messages
+        self.preview_length = preview_length
+        self._queue = queue.Queue(max_queue)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._pid = None
+        self.queued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+        self.last_error = None
+
+        with connect(path) as conn:
+            conn.executescript(SCHEMA)
+        conn.close()
+
+    def _ensure_started(self):
+        # Threads don't survive fork, so a preloaded app starts one per worker
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue(self.max_queue)
+                threading.Thread(target=self._run, name='history-writer', daemon=True).start()
+                self._pid = os.getpid()
+
+    def _reader(self):
+        """One read connection per thread (sqlite3 connections aren't shared)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = connect(self.path)
+            conn.row_factory = sqlite3.Row
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def record(self, messages, results, senders=None, model_version=None, rules_version=None):
+        """Queue analysis results for writing; never blocks"""
+        self._ensure_started()
+        now = time.time()
+        senders = senders or [None] * len(messages)
+        for message, result, sender in zip(messages, results, senders):
+            if 'risk_level' not in result:
+                continue
+            try:
+                self._queue.put_nowait((now, message, result, sender, model_version, rules_version))
+                self.queued += 1
+            except queue.Full:
+                self.dropped += 1
+
+    def _row(self, item):
+        ts, message, result, sender, model_version, rules_version = item
+        findings = result.get('scam_indicators', ())
+        campaign = result.get('campaign')
+        row = (
+            ts, message_hash(message), sender, campaign['id'] if campaign else None,
+            result.get('ai_prediction'), result.get('ai_confidence'), result['risk_score'],
+            result['risk_level'], result.get('decided_by'),
+            None if model_version is None else str(model_version), rules_version,
+            message if self.store_messages else message_preview(message, self.preview_length),
+            json.dumps([[f['type'], f['severity'], f['matched_pattern']] for f in findings],
+                       ensure_ascii=False)
+        )
+        return row, {f['category'] for f in findings}
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        conn = connect(self.path)
+        while True:
+            batch = self._collect()
+            try:
+                self.write(conn, batch)
+            except Exception as e:
+                self.failed += len(batch)
+                self.last_error = str(e)
+                logger.warning("Could not write %d history rows: %s", len(batch), e)
+
+    def write(self, conn, batch):
+        """Insert a batch of queued items in one transaction"""
+        rows = [self._row(item) for item in batch]
+        with conn:
+            cursor = conn.cursor()
+            categories = []
+            for row, row_categories in rows:
+                cursor.execute(INSERT_ANALYSIS, row)
+                analysis_id = cursor.lastrowid
+                categories.extend((analysis_id, category) for category in row_categories)
+            cursor.executemany('INSERT INTO analysis_categories (analysis_id, category) VALUES (?, ?)',
+                               categories)
+        self.written += len(rows)
+        self.batches += 1
+
+    def flush(self, timeout=10):
+        """Wait until everything queued so far is written (for tests and shutdown)"""
+        deadline = time.monotonic() + timeout
+        target = self.queued
+        while self.written + self.failed < target and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return self.written + self.failed >= target
+
+    def _filters(self, risk_level=None, category=None, sender=None, campaign=None,
+                 message=None, message_hash_hex=None, since=None, until=None):
+        # A category filter joins the category table, so pages stream off its
+        # (category, analysis_id) key instead of collecting every matching id
+        join, clauses, params = '', [], []
+        if category:
+            join = 'JOIN analysis_categories fc ON fc.analysis_id = a.id AND fc.category = ?'
+            params.append(category)
+        if risk_level:
+            clauses.append('a.risk_level = ?')
+            params.append(risk_level)
+        if sender:
+            clauses.append('a.sender = ?')
+            params.append(sender)
+        if campaign:
+            clauses.append('a.campaign_id = ?')
+            params.append(campaign)
+        if message is not None or message_hash_hex:
+            clauses.append('a.message_hash = ?')
+            params.append(message_hash(message) if message is not None else bytes.fromhex(message_hash_hex))
+        if since is not None:
+            clauses.append('a.ts >= ?')
+            params.append(since)
+        if until is not None:
+            clauses.append('a.ts < ?')
+            params.append(until)
+        return join, clauses, params
+
+    def query(self, limit=50, before=None, **filters):
+        """One page of matching analyses, newest first.
+
+        Pass the returned next_before back as before to get the next page;
+        it is None on the last page.
+        """
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        join, clauses, params = self._filters(**filters)
+        # Ordering by the joined key lets SQLite walk the category index backwards
+        key = 'fc.analysis_id' if join else 'a.id'
+        if before is not None:
+            clauses.append(f'{key} < ?')
+            params.append(int(before))
+        where = ('WHERE ' + ' AND '.join(clauses)) if clauses else ''
+        sql = (f"SELECT {', '.join('a.' + c for c in COLUMNS)} FROM analyses a {join} {where} "
+               f"ORDER BY {key} DESC LIMIT ?")
+        rows = self._reader().execute(sql, params + [limit + 1]).fetchall()
+
+        items = [self._item(row) for row in rows[:limit]]
+        return {
+            'items': items,
+            'next_before': items[-1]['id'] if len(rows) > limit else None
+        }
+
+    @staticmethod
+    def _item(row):
+        item = dict(row)
+        item['timestamp'] = datetime.fromtimestamp(item.pop('ts')).isoformat(timespec='seconds')
+        item['message_hash'] = item['message_hash'].hex()
+        item['indicators'] = [dict(zip(('type', 'severity', 'matched_pattern'), f))
+                              for f in json.loads(item['indicators'])]
+        return item
+
+    def aggregate(self, bucket='hour', **filters):
+        """Verdict counts per time bucket and risk level, plus category totals"""
+        if bucket not in BUCKETS:
+            raise ValueError(f"bucket must be one of {list(BUCKETS)}")
+        width = BUCKETS[bucket]
+        join, clauses, params = self._filters(**filters)
+        where = ('WHERE ' + ' AND '.join(clauses)) if clauses else ''
+        conn = self._reader()
+
+        series = {}
+        for start, level, count in conn.execute(
+                f"SELECT CAST(a.ts / ? AS INTEGER) * ?, a.risk_level, COUNT(*) FROM analyses a {join} {where} "
+                f"GROUP BY 1, 2 ORDER BY 1", [width, width] + params):
+            key = datetime.fromtimestamp(start).isoformat(timespec='seconds')
+            series.setdefault(key, {})[level] = count
+
+        categories = dict(conn.execute(
+            f"SELECT c.category, COUNT(*) FROM analysis_categories c JOIN analyses a ON a.id = c.analysis_id "
+            f"{join} {where} GROUP BY c.category ORDER BY 2 DESC", params).fetchall())
+        return {
+            'bucket': bucket,
+            'total': sum(sum(levels.values()) for levels in series.values()),
+            'series': [{'start': key, 'risk_levels': levels} for key, levels in series.items()],
+            'categories': categories
+        }
+
+    def prune(self, older_than_days):
+        """Delete analyses older than the given age; returns the number removed"""
+        cutoff = time.time() - older_than_days * 86400
+        with connect(self.path) as conn:
+            removed = conn.execute('DELETE FROM analyses WHERE ts < ?', (cutoff,)).rowcount
+        conn.close()
+        return removed
+
+    def stats(self):
+        return {
+            'path': self.path,
+            'queued': self.queued,
+            'pending': self._queue.qsize(),
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed': self.failed,
+            'batches': self.batches,
+            'last_error': self.last_error,
+        }
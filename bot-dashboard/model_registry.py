@@ -0,0 +1,418 @@
+# model_registry.py - Versioned model artifacts with integrity checks and live hot-swap
+import argparse
+import contextlib
+import csv
+import hashlib
+import json
+import logging
+import os
+import shutil
+import statistics
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+
+import joblib
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from compact_model import is_compact_model
+from detect_scam import ENGINE_CHECK_MESSAGES, NaiveBayesEngine
+
+logger = logging.getLogger(__name__)
+
+POINTERS = ('current', 'candidate')
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def tree_files(path):
+    """Relative paths of every file under path (or just the file itself)"""
+    if os.path.isfile(path):
+        return [os.path.basename(path)]
+    return sorted(
+        os.path.relpath(os.path.join(root, name), path)
+        for root, _, names in os.walk(path) for name in names
+    )
+
+
+def data_fingerprint(paths):
+    """sha256 over the training data files, plus their names and row counts"""
+    digest = hashlib.sha256()
+    files = []
+    for path in sorted(paths):
+        file_hash = file_sha256(path)
+        digest.update(file_hash.encode())
+        with open(path, encoding='utf-8', newline='') as f:
+            rows = sum(1 for _ in csv.reader(f)) - 1 if path.endswith('.csv') else sum(1 for _ in f)
+        files.append({'name': os.path.basename(path), 'sha256': file_hash, 'rows': rows})
+    return {'sha256': digest.hexdigest(), 'files': files}
+
+
+def benchmark_model(model, rounds=50):
+    """Single-message and batch latency of a loaded model's predict_proba"""
+    messages = ENGINE_CHECK_MESSAGES * rounds
+    model.predict_proba(messages[:1])
+
+    timings = []
+    for message in messages:
+        start = time.perf_counter()
+        model.predict_proba([message])
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+
+    start = time.perf_counter()
+    model.predict_proba(messages)
+    batch_seconds = time.perf_counter() - start
+    return {
+        'single_p50_us': round(statistics.median(timings) * 1e6, 1),
+        'single_p95_us': round(timings[int(len(timings) * 0.95)] * 1e6, 1),
+        'batch_messages_per_second': round(len(messages) / batch_seconds),
+    }
+
+
+def load_artifact(path):
+    """Load a model file: a compact export becomes a NaiveBayesEngine"""
+    if is_compact_model(path):
+        return NaiveBayesEngine.from_compact(path)
+    return joblib.load(path)
+
+
+class ModelRegistry:
+    """A directory of immutable, versioned model artifacts.
+
+    Layout:
+        versions/v0001/manifest.json   metadata and a sha256 per file
+        versions/v0001/model.joblib    the sklearn pipeline
+        versions/v0001/model.compact/  optional compact export (served if present)
+        current                        version served by the dashboard
+        candidate                      optional version to shadow-score
+
+    Versions are written to a temporary directory and renamed into place,
+    and pointers are replaced with os.replace, so readers never see a
+    half-written version or pointer.
+    """
+
+    def __init__(self, root='model_registry'):
+        self.root = root
+        self.versions_dir = os.path.join(root, 'versions')
+
+    @contextlib.contextmanager
+    def lock(self):
+        """Exclusive lock, across processes, for read-publish-promote sequences
+        
+        Only those who take it are serialized (the feedback updater and this
+        module's CLI); it is a no-op where fcntl is unavailable.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, '.lock'), 'a') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+    def versions(self):
+        if not os.path.isdir(self.versions_dir):
+            return []
+        return sorted(name for name in os.listdir(self.versions_dir)
+                      if name.startswith('v') and name[1:].isdigit())
+
+    def version_dir(self, version):
+        return os.path.join(self.versions_dir, version)
+
+    def manifest(self, version):
+        if not (version.startswith('v') and version[1:].isdigit()):
+            raise KeyError(f"Unknown model version: {version}")
+        try:
+            with open(os.path.join(self.version_dir(version), 'manifest.json'), encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise KeyError(f"Unknown model version: {version}") from None
+
+    def verify(self, version):
+        """Check every artifact file against its recorded sha256; raises ValueError"""
+        manifest = self.manifest(version)
+        base = self.version_dir(version)
+        bad = []
+        for name, expected in manifest['files'].items():
+            path = os.path.join(base, name)
+            if not os.path.isfile(path) or file_sha256(path) != expected:
+                bad.append(name)
+        if bad:
+            raise ValueError(f"Model {version} failed integrity check: {', '.join(bad)}")
+        return manifest
+
+    def artifact_path(self, version):
+        return os.path.join(self.version_dir(version), self.manifest(version)['serve'])
+
+    def load(self, version):
+        """Verify a version and load the artifact the dashboard should serve"""
+        self.verify(version)
+        return load_artifact(self.artifact_path(version))
+
+    def pointer(self, name):
+        try:
+            with open(os.path.join(self.root, name), encoding='utf-8') as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def current(self):
+        return self.pointer('current')
+
+    def candidate(self):
+        return self.pointer('candidate')
+
+    def set_pointer(self, name, version):
+        """Point current/candidate at a verified version (None clears it)"""
+        if name not in POINTERS:
+            raise ValueError(f"Pointer must be one of {POINTERS}")
+        path = os.path.join(self.root, name)
+        if version is None:
+            if os.path.exists(path):
+                os.remove(path)
+            return
+        self.verify(version)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(version + '\n')
+        os.replace(tmp, path)
+
+    def promote(self, version):
+        self.set_pointer('current', version)
+        if self.candidate() == version:
+            self.set_pointer('candidate', None)
+
+    def publish(self, model_path, compact_path=None, data_paths=(), metrics=None, params=None,
+                benchmark=True, notes=None):
+        """Copy a trained model into a new version and return its id"""
+        os.makedirs(self.versions_dir, exist_ok=True)
+        staging = os.path.join(self.versions_dir, f'.staging-{uuid.uuid4().hex}')
+        os.makedirs(staging)
+        try:
+            shutil.copy2(model_path, os.path.join(staging, 'model.joblib'))
+            serve = 'model.joblib'
+            if compact_path:
+                shutil.copytree(compact_path, os.path.join(staging, 'model.compact'))
+                serve = 'model.compact'
+
+            model = load_artifact(os.path.join(staging, serve))
+            manifest = {
+                'created': datetime.now().isoformat(),
+                'source': os.path.abspath(model_path),
+                'serve': serve,
+                'classes': [str(c) for c in model.classes_],
+                'data': data_fingerprint(data_paths) if data_paths else None,
+                'metrics': metrics or {},
+                'params': params or {},
+                'benchmark': benchmark_model(model) if benchmark else None,
+                'notes': notes,
+                'files': {name: file_sha256(os.path.join(staging, name)) for name in tree_files(staging)},
+            }
+
+            # Claim the next version number; rename fails if another publish got there first
+            while True:
+                existing = self.versions()
+                version = f"v{int(existing[-1][1:]) + 1 if existing else 1:04d}"
+                manifest['version'] = version
+                with open(os.path.join(staging, 'manifest.json'), 'w', encoding='utf-8') as f:
+                    json.dump(manifest, f, indent=2)
+                try:
+                    os.rename(staging, self.version_dir(version))
+                    return version
+                except OSError:
+                    if not os.path.exists(self.version_dir(version)):
+                        raise
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+    def describe(self):
+        current, candidate = self.current(), self.candidate()
+        versions = []
+        for version in self.versions():
+            manifest = self.manifest(version)
+            versions.append({
+                'version': version,
+                'created': manifest['created'],
+                'metrics': manifest['metrics'],
+                'benchmark': manifest['benchmark'],
+                'data_sha256': (manifest['data'] or {}).get('sha256'),
+                'current': version == current,
+                'candidate': version == candidate,
+            })
+        return {'root': self.root, 'current': current, 'candidate': candidate, 'versions': versions}
+
+
+class RegistryWatcher:
+    """Polls the registry pointers and hot-swaps models in this process.
+
+    When 'current' changes, the new version is verified, loaded and handed
+    to detector.swap_model(), which warms it up before an atomic swap; a
+    version that fails to load is logged and skipped until the pointer
+    changes again. When 'candidate' changes, it is loaded into the shadow
+    scorer instead. Like the micro-batcher, the polling thread is started
+    lazily once per worker process.
+    """
+
+    def __init__(self, registry, detector, shadow=None, interval=5, active=None):
+        self.registry = registry
+        self.detector = detector
+        self.shadow = shadow
+        self.interval = interval
+        self.active = active
+        self.candidate = None
+        self.swaps = 0
+        self.last_error = None
+        self._failed = {}
+        self._lock = threading.Lock()
+        self._pid = None
+        # Held while swapping, so other writers of the live model (feedback) don't interleave
+        self.lock = threading.Lock()
+
+    def ensure_started(self):
+        if self._pid == os.getpid() or not self.interval:
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                threading.Thread(target=self._run, name='registry-watcher', daemon=True).start()
+                self._pid = os.getpid()
+
+    def _run(self):
+        while True:
+            try:
+                self.poll()
+            except Exception as e:
+                self.last_error = str(e)
+                logger.warning("Model registry poll failed: %s", e)
+            time.sleep(self.interval)
+
+    def _load(self, name, version):
+        if self._failed.get(name) == version:
+            return None
+        try:
+            return self.registry.load(version)
+        except Exception as e:
+            self._failed[name] = version
+            self.last_error = f"{version}: {e}"
+            logger.warning("Not loading model %s: %s", version, e)
+            return None
+
+    def poll(self):
+        """Apply any pointer changes; returns True if the live model changed"""
+        with self.lock:
+            return self._poll()
+
+    def _poll(self):
+        changed = False
+        current = self.registry.current()
+        if current and current != self.active:
+            model = self._load('current', current)
+            if model is not None:
+                self.detector.swap_model(model)
+                self.active = current
+                self.swaps += 1
+                self.last_error = None
+                changed = True
+                logger.info("Switched to model %s", current)
+
+        if self.shadow is not None:
+            candidate = self.registry.candidate()
+            if candidate != self.candidate:
+                if candidate is None:
+                    self.shadow.clear()
+                    self.candidate = None
+                else:
+                    model = self._load('candidate', candidate)
+                    if model is not None:
+                        self.shadow.set_candidate(candidate, model)
+                        self.candidate = candidate
+        return changed
+
+    def stats(self):
+        return {
+            'active': self.active,
+            'candidate': self.candidate,
+            'swaps': self.swaps,
+            'poll_interval_seconds': self.interval,
+            'last_error': self.last_error,
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the scam model registry")
+    parser.add_argument('--root', default=os.environ.get('SCAM_MODEL_REGISTRY', 'model_registry'))
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    publish = commands.add_parser('publish', help="Add a trained model as a new version")
+    publish.add_argument('model', help="Trained .joblib pipeline")
+    publish.add_argument('--compact', help="Compact export of the same model, served if given")
+    publish.add_argument('--data', nargs='*', default=[], help="Training data files to fingerprint")
+    publish.add_argument('--metric', action='append', default=[], metavar='NAME=VALUE',
+                         help="Evaluation metric to record, e.g. accuracy=0.93")
+    publish.add_argument('--notes')
+    publish.add_argument('--promote', action='store_true', help="Make it the current model")
+    publish.add_argument('--shadow', action='store_true', help="Make it the shadow candidate")
+
+    commands.add_parser('list', help="Show all versions")
+    for name in ('promote', 'shadow', 'verify'):
+        command = commands.add_parser(name)
+        command.add_argument('version', nargs='?' if name == 'shadow' else None)
+
+    args = parser.parse_args(argv)
+    registry = ModelRegistry(args.root)
+
+    if args.command == 'publish':
+        metrics = {}
+        for item in args.metric:
+            name, _, value = item.partition('=')
+            metrics[name] = float(value)
+        version = registry.publish(args.model, args.compact, args.data, metrics, notes=args.notes)
+        bench = registry.manifest(version)['benchmark']
+        print(f"📦 Published {version} ({bench['single_p50_us']}us p50 per message)")
+        if args.promote:
+            with registry.lock():
+                registry.promote(version)
+            print(f"🚀 {version} is now the current model")
+        elif args.shadow:
+            with registry.lock():
+                registry.set_pointer('candidate', version)
+            print(f"👥 {version} is now shadow-scored")
+    elif args.command == 'list':
+        info = registry.describe()
+        for entry in info['versions']:
+            flags = ' '.join(f for f in ('current', 'candidate') if entry[f])
+            print(f"{entry['version']}  {entry['created'][:19]}  {entry['metrics']}  {flags}")
+        if not info['versions']:
+            print("📭 No versions yet")
+    elif args.command == 'promote':
+        with registry.lock():
+            registry.promote(args.version)
+        print(f"🚀 {args.version} is now the current model")
+    elif args.command == 'shadow':
+        with registry.lock():
+            registry.set_pointer('candidate', args.version)
+        print(f"👥 Shadow candidate: {args.version or 'none'}")
+    elif args.command == 'verify':
+        try:
+            registry.verify(args.version)
+        except ValueError as e:
+            print(f"❌ {e}")
+            return False
+        print(f"✅ {args.version} passed the integrity check")
+    return True
+
+
+if __name__ == "__main__":
+    if not main():
+        sys.exit(1)
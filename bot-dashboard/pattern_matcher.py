@@ -0,0 +1,122 @@
+# pattern_matcher.py - Single-pass matcher for the scam pattern table
+import re
+
+# Regex metacharacters that make a pattern more than a plain literal
+_META = re.compile(r'(?<!\\)[.^$*+?{}\[\]|()]|\\[A-Za-z0-9]')
+
+
+def _as_literal(pattern):
+    """Return the literal text of a pattern, or None if it needs the regex engine"""
+    if _META.search(pattern):
+        return None
+    return re.sub(r'\\(.)', r'\1', pattern)
+
+
+def _trie_regex(literals):
+    """Build a regex that matches the longest of the given literals.
+
+    The literals are merged into a prefix trie so the engine only follows
+    one branch per character instead of retrying every alternative.
+    """
+    trie = {}
+    for literal in literals:
+        node = trie
+        for char in literal:
+            node = node.setdefault(char, {})
+        node[''] = True
+
+    def emit(node):
+        terminal = '' in node
+        branches = [re.escape(char) + emit(child)
+                    for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        # Greedy optional child keeps the longest literal when a prefix also ends here
+        if terminal:
+            return '(?:' + body + ')?'
+        return body
+
+    return emit(trie)
+
+
+class PatternMatcher:
+    """Matches every scam category against a message in one pass.
+
+    Literal patterns (the vast majority of the table) are folded into a
+    single prefix-trie regex scanned with a zero-width lookahead, so every
+    start position reports its longest literal hit.
+    Any shorter literal that also matches at that position is necessarily a
+    prefix of the reported one, so those are precomputed as implied hits.
+    This gives the same hit set as an Aho-Corasick automaton while the scan
+    itself runs inside the C regex engine.
+
+    Patterns with real regex syntax (e.g. ``update.*account``) are compiled
+    once and only evaluated for categories that still have no hit.
+    """
+
+    def __init__(self, scam_patterns):
+        self.scam_patterns = scam_patterns
+        self._rules = []
+        literals = {}
+        regex_rules = set()
+
+        for index, (scam_type, info) in enumerate(scam_patterns.items()):
+            checks = []
+            for pattern in info['patterns']:
+                literal = _as_literal(pattern)
+                if literal is not None:
+                    literals.setdefault(literal, set()).add(index)
+                    checks.append((pattern, literal, None))
+                else:
+                    regex_rules.add(index)
+                    checks.append((pattern, None, re.compile(pattern)))
+            self._rules.append((scam_type, info, checks))
+
+        # Categories that must always be checked because they carry regex patterns
+        self._always = frozenset(regex_rules)
+
+        ordered = sorted(literals)
+        self._scanner = None
+        if ordered:
+            self._scanner = re.compile(f'(?=({_trie_regex(ordered)}))')
+
+        # Every literal implies itself plus all literals that are its prefixes
+        known = set(ordered)
+        self._implied = {
+            lit: frozenset(lit[:end] for end in range(1, len(lit) + 1) if lit[:end] in known)
+            for lit in ordered
+        }
+        self._owners = {lit: frozenset(owners) for lit, owners in literals.items()}
+
+    def literal_hits(self, message_lower):
+        """Return the set of literal patterns present in a lowercased message"""
+        hits = set()
+        if self._scanner is None:
+            return hits
+        implied = self._implied
+        for match in self._scanner.finditer(message_lower):
+            hits |= implied[match.group(1)]
+        return hits
+
+    def match(self, message_lower):
+        """Yield (scam_type, info, matched_pattern) for each category hit.
+
+        The matched pattern is the first one in the category's list that
+        occurs anywhere in the message, same as searching them in order.
+        """
+        hits = self.literal_hits(message_lower)
+        candidates = set(self._always)
+        for literal in hits:
+            candidates |= self._owners[literal]
+
+        for index in sorted(candidates):
+            scam_type, info, checks = self._rules[index]
+            for pattern, literal, compiled in checks:
+                if literal is not None:
+                    if literal in hits:
+                        yield scam_type, info, pattern
+                        break
+                elif compiled.search(message_lower):
+                    yield scam_type, info, pattern
+                    break
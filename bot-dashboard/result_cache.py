@@ -0,0 +1,100 @@
+# result_cache.py - Bounded LRU/TTL cache for repeated analysis results
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+
+_WHITESPACE = re.compile(r'\s+')
+_DIGITS = re.compile(r'\d+')
+
+
+def normalize_message(message, mask_numbers=True):
+    """Normalize a message so campaign copies map to the same text.
+
+    Case and whitespace are folded, and digit runs (amounts, phone numbers,
+    reference ids) are masked when mask_numbers is set.
+    """
+    text = _WHITESPACE.sub(' ', message.lower()).strip()
+    if mask_numbers:
+        text = _DIGITS.sub('#', text)
+    return text
+
+
+def message_key(message, mask_numbers=True):
+    """Hash a normalized message into a compact cache key"""
+    text = normalize_message(message, mask_numbers)
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+
+
+class ResultCache:
+    """Thread-safe LRU cache with a size bound and per-entry TTL"""
+
+    def __init__(self, max_size=10000, ttl=300, mask_numbers=True):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.mask_numbers = mask_numbers
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self):
+        return self.max_size > 0
+
+    def key_for(self, message):
+        return message_key(message, self.mask_numbers)
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss or expiry"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if self.ttl and expires_at < now:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Store a value, evicting the least recently used entry when full"""
+        if not self.enabled:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Return size and hit/miss counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl,
+                'mask_numbers': self.mask_numbers,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0
+            }
@@ -0,0 +1,420 @@
+# rule_packs.py - Versioned scam pattern rule packs with a precompiled on-disk cache
+import argparse
+import hashlib
+import json
+import logging
+import os
+import pickle
+import re
+import sys
+import threading
+import time
+
+import analysis_result
+from analysis_result import Finding
+import pattern_matcher
+from pattern_matcher import PatternMatcher
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+logger = logging.getLogger(__name__)
+
+# Bump when RuleSet or PatternMatcher internals change, so old caches are ignored
+CACHE_VERSION = 2
+
+DEFAULT_RULES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rules')
+
+PACK_EXTENSIONS = ('.json', '.yaml', '.yml')
+
+SEVERITY_WEIGHTS = {'critical': 4, 'high': 3, 'medium': 2, 'low': 1}
+
+# Compiled caches kept per cache directory (one per rule/locale combination)
+MAX_CACHE_FILES = 8
+
+RULE_ID = re.compile(r'^[a-z][a-z0-9_]*$')
+
+# Patterns that may treat "500" and "5000" differently: digits (literals, ranges,
+# {n} counts, backreferences) or \d/\D. Over-cautious, never too lenient.
+DIGIT_SENSITIVE = re.compile(r'[0-9]|\\[dD]')
+
+
+class RuleError(ValueError):
+    """Invalid rule packs; errors holds one message per problem"""
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        super().__init__('; '.join(self.errors[:5]) + (' ...' if len(self.errors) > 5 else ''))
+
+
+def pack_files(path):
+    """The pack file itself, or every pack file in a directory in name order"""
+    if os.path.isfile(path):
+        return [path]
+    if not os.path.isdir(path):
+        raise RuleError([f"No rule packs at {path}"])
+    return sorted(
+        os.path.join(path, name) for name in os.listdir(path)
+        if name.endswith(PACK_EXTENSIONS) and not name.startswith('.')
+    )
+
+
+def read_pack(path):
+    with open(path, encoding='utf-8') as f:
+        if path.endswith('.json'):
+            return json.load(f)
+        if yaml is None:
+            raise RuleError([f"{os.path.basename(path)}: YAML rule packs need PyYAML (pip install pyyaml)"])
+        return yaml.safe_load(f)
+
+
+def locale_matches(rule_locales, locales):
+    """True if a rule tagged with rule_locales applies to the wanted locales.
+
+    Untagged rules apply everywhere; 'en' selects 'en-IN' rules too.
+    """
+    if not rule_locales or locales is None:
+        return True
+    return any(tag == wanted or tag.split('-')[0] == wanted for tag in rule_locales for wanted in locales)
+
+
+def validate_pack(pack, source):
+    """List of problems with one parsed pack (empty if it is valid)"""
+    if not isinstance(pack, dict):
+        return [f"{source}: a rule pack must be a mapping"]
+    errors = []
+    if not isinstance(pack.get('name'), str) or not pack['name']:
+        errors.append(f"{source}: missing pack name")
+    if not isinstance(pack.get('version'), int) or isinstance(pack.get('version'), bool):
+        errors.append(f"{source}: pack version must be an integer")
+    rules = pack.get('rules')
+    if not isinstance(rules, list) or not rules:
+        return errors + [f"{source}: pack has no rules"]
+
+    for position, rule in enumerate(rules):
+        where = f"{source}: rule {rule.get('id', position) if isinstance(rule, dict) else position}"
+        if not isinstance(rule, dict):
+            errors.append(f"{where}: must be a mapping")
+            continue
+        if not isinstance(rule.get('id'), str) or not RULE_ID.match(rule['id']):
+            errors.append(f"{where}: id must be lowercase snake_case")
+        patterns = rule.get('patterns')
+        if not isinstance(patterns, list) or not patterns:
+            errors.append(f"{where}: needs a non-empty list of patterns")
+        else:
+            for pattern in patterns:
+                if not isinstance(pattern, str) or not pattern:
+                    errors.append(f"{where}: patterns must be non-empty strings")
+                    continue
+                if pattern != pattern.lower():
+                    errors.append(f"{where}: pattern {pattern!r} must be lowercase (messages are lowercased)")
+                try:
+                    re.compile(pattern)
+                except re.error as e:
+                    errors.append(f"{where}: bad pattern {pattern!r}: {e}")
+        if not isinstance(rule.get('explanation'), str) or not rule['explanation']:
+            errors.append(f"{where}: missing explanation")
+        if rule.get('severity') not in SEVERITY_WEIGHTS:
+            errors.append(f"{where}: severity must be one of {list(SEVERITY_WEIGHTS)}")
+        if not isinstance(rule.get('category'), str) or not rule['category']:
+            errors.append(f"{where}: missing category")
+        weight = rule.get('weight', 1.0)
+        if isinstance(weight, bool) or not isinstance(weight, (int, float)) or not weight > 0:
+            errors.append(f"{where}: weight must be a positive number")
+        locales = rule.get('locales', [])
+        if not isinstance(locales, list) or not all(isinstance(tag, str) and tag for tag in locales):
+            errors.append(f"{where}: locales must be a list of tags like 'en' or 'en-IN'")
+        tests = rule.get('tests', {})
+        if not isinstance(tests, dict) or set(tests) - {'match', 'no_match'} or not all(
+                isinstance(v, list) and all(isinstance(m, str) for m in v) for v in tests.values()):
+            errors.append(f"{where}: tests must map 'match'/'no_match' to lists of messages")
+    return errors
+
+
+class RuleSet:
+    """The active rule table, compiled and immutable.
+
+    rules is the ordered {rule id: info} mapping the detector used to
+    hard-code, with each rule's weight added. Findings are built once per
+    (rule, pattern) and shared by every result. A reload builds a new
+    RuleSet and swaps it in as a whole, so a request never sees half of
+    an update.
+    """
+
+    def __init__(self, rules, packs, fingerprint=None, locales=None):
+        self.rules = rules
+        self.packs = packs
+        self.fingerprint = fingerprint
+        self.locales = locales
+        self.matcher = PatternMatcher(rules)
+        # Result caches keyed on digit-masked text are only safe without these
+        self.digit_sensitive = any(DIGIT_SENSITIVE.search(pattern)
+                                   for info in rules.values() for pattern in info['patterns'])
+        self.findings = {
+            (rule_id, pattern): Finding(rule_id.replace('_', ' ').title(), info['explanation'],
+                                        info['severity'], info['category'], pattern, info['weight'])
+            for rule_id, info in rules.items() for pattern in info['patterns']
+        }
+
+    @property
+    def version(self):
+        return '+'.join(f"{pack['name']}@{pack['version']}" for pack in self.packs)
+
+    def match(self, message):
+        """Shared findings for every rule that matches a message"""
+        findings = self.findings
+        return [findings[rule_id, pattern]
+                for rule_id, _, pattern in self.matcher.match(message.lower())]
+
+    def run_tests(self):
+        """Check every rule against its own example messages; returns failures"""
+        failures = []
+        for rule_id, info in self.rules.items():
+            tests = info.get('tests', {})
+            for message in tests.get('match', ()):
+                if not any(hit == rule_id for hit, _, _ in self.matcher.match(message.lower())):
+                    failures.append(f"{rule_id}: should match {message!r}")
+            for message in tests.get('no_match', ()):
+                if any(hit == rule_id for hit, _, _ in self.matcher.match(message.lower())):
+                    failures.append(f"{rule_id}: should not match {message!r}")
+        return failures
+
+    def describe(self):
+        return {
+            'version': self.version,
+            'fingerprint': self.fingerprint,
+            'locales': self.locales,
+            'rules': len(self.rules),
+            'patterns': len(self.findings),
+            'digit_sensitive': self.digit_sensitive,
+            'packs': self.packs,
+        }
+
+
+def rules_fingerprint(paths, locales=None):
+    """sha256 over the pack files, the locale filter and the compiler version.
+
+    The compiler version covers the source of every module whose classes
+    are pickled into the cache: RuleSet, PatternMatcher and Finding.
+    """
+    digest = hashlib.sha256(f"{CACHE_VERSION}:{sorted(locales) if locales else None}".encode())
+    for module_path in (analysis_result.__file__, pattern_matcher.__file__, __file__):
+        with open(module_path, 'rb') as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    for path in paths:
+        digest.update(os.path.basename(path).encode())
+        with open(path, 'rb') as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()
+
+
+def compile_rules(paths, locales=None, fingerprint=None):
+    """Read, validate, merge and test packs; raises RuleError on any problem"""
+    errors = []
+    rules = {}
+    packs = []
+    for path in paths:
+        source = os.path.basename(path)
+        try:
+            pack = read_pack(path)
+        except RuleError as e:
+            errors.extend(e.errors)
+            continue
+        except (OSError, ValueError) as e:
+            errors.append(f"{source}: {e}")
+            continue
+        problems = validate_pack(pack, source)
+        if problems:
+            errors.extend(problems)
+            continue
+
+        selected = 0
+        for rule in pack['rules']:
+            if rule['id'] in rules:
+                errors.append(f"{source}: rule {rule['id']} is already defined by another pack")
+                continue
+            if not locale_matches(rule.get('locales'), locales):
+                continue
+            rules[rule['id']] = {
+                'patterns': list(rule['patterns']),
+                'explanation': rule['explanation'],
+                'severity': rule['severity'],
+                'category': rule['category'],
+                'weight': float(rule.get('weight', 1.0)),
+                'locales': list(rule.get('locales', [])),
+                'tests': rule.get('tests', {}),
+                'pack': pack['name'],
+            }
+            selected += 1
+        packs.append({'name': pack['name'], 'version': pack['version'], 'file': source, 'rules': selected})
+
+    if not errors and not rules:
+        errors.append("No rules selected" + (f" for locales {locales}" if locales else ''))
+    if errors:
+        raise RuleError(errors)
+
+    ruleset = RuleSet(rules, packs, fingerprint, sorted(locales) if locales else None)
+    failures = ruleset.run_tests()
+    if failures:
+        raise RuleError(failures)
+    return ruleset
+
+
+def _write_cache(cache_dir, fingerprint, ruleset):
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f'{fingerprint}.pickle')
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        pickle.dump(ruleset, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+    cached = sorted((os.path.join(cache_dir, name) for name in os.listdir(cache_dir)
+                     if name.endswith('.pickle')), key=os.path.getmtime, reverse=True)
+    for old in cached[MAX_CACHE_FILES:]:
+        try:
+            os.remove(old)
+        except OSError:
+            pass
+
+
+def load_rules(path=DEFAULT_RULES_DIR, cache_dir=None, locales=None):
+    """Load rule packs as a compiled RuleSet, reusing the on-disk cache if it is current.
+
+    The cache is keyed by the fingerprint of the pack files, so a worker
+    only validates, tests and compiles a rule set the first time any
+    process sees it; the others load the pickled result. Caches are only
+    read from cache_dir, which must not be writable by untrusted users.
+    """
+    paths = pack_files(path)
+    fingerprint = rules_fingerprint(paths, locales)
+    if cache_dir is None:
+        cache_dir = os.path.join(path if os.path.isdir(path) else os.path.dirname(path), '.compiled')
+
+    cache_path = os.path.join(cache_dir, f'{fingerprint}.pickle')
+    try:
+        with open(cache_path, 'rb') as f:
+            ruleset = pickle.load(f)
+        if isinstance(ruleset, RuleSet) and ruleset.fingerprint == fingerprint:
+            return ruleset
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.warning("Ignoring unreadable rule cache %s: %s", cache_path, e)
+
+    ruleset = compile_rules(paths, locales, fingerprint)
+    try:
+        _write_cache(cache_dir, fingerprint, ruleset)
+    except OSError as e:
+        logger.warning("Could not write rule cache to %s: %s", cache_dir, e)
+    return ruleset
+
+
+class RuleWatcher:
+    """Polls the rule pack files and swaps new rules into the detector.
+
+    A cheap stat() signature is compared on every poll; only when a pack
+    file is added, removed or rewritten is the rule set loaded (from the
+    compiled cache when another worker already built it) and handed to
+    detector.set_rules(). Packs that fail validation or their own tests
+    are logged and the current rules stay active. Like the registry
+    watcher, the thread is started lazily once per worker process.
+    """
+
+    def __init__(self, detector, path=DEFAULT_RULES_DIR, cache_dir=None, locales=None, interval=5):
+        self.detector = detector
+        self.path = path
+        self.cache_dir = cache_dir
+        self.locales = locales
+        self.interval = interval
+        self.reloads = 0
+        self.last_error = None
+        self._signature = self._stat_signature()
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def _stat_signature(self):
+        try:
+            return tuple((p, os.stat(p).st_mtime_ns, os.stat(p).st_size) for p in pack_files(self.path))
+        except (OSError, RuleError):
+            return None
+
+    def ensure_started(self):
+        if self._pid == os.getpid() or not self.interval:
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                threading.Thread(target=self._run, name='rule-watcher', daemon=True).start()
+                self._pid = os.getpid()
+
+    def _run(self):
+        while True:
+            try:
+                self.poll()
+            except Exception as e:
+                self.last_error = str(e)
+                logger.warning("Rule pack poll failed: %s", e)
+            time.sleep(self.interval)
+
+    def poll(self):
+        """Reload if any pack file changed; returns True if new rules went live"""
+        signature = self._stat_signature()
+        if signature == self._signature:
+            return False
+        self._signature = signature
+        return self.reload()
+
+    def reload(self):
+        """Load the packs now; raises RuleError (and keeps the old rules) if invalid"""
+        with self._lock:
+            try:
+                ruleset = load_rules(self.path, self.cache_dir, self.locales)
+            except RuleError as e:
+                self.last_error = str(e)
+                logger.warning("Keeping current rules, new packs are invalid: %s", e)
+                raise
+            if ruleset.fingerprint == self.detector.rules.fingerprint:
+                return False
+            self.detector.set_rules(ruleset)
+            self.reloads += 1
+            self.last_error = None
+            logger.info("Switched to rules %s", ruleset.version)
+            return True
+
+    def stats(self):
+        return {
+            'path': self.path,
+            'reloads': self.reloads,
+            'poll_interval_seconds': self.interval,
+            'last_error': self.last_error,
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Validate, test and precompile scam rule packs")
+    parser.add_argument('path', nargs='?', default=DEFAULT_RULES_DIR, help="Pack file or directory")
+    parser.add_argument('--locales', help="Comma-separated locales to compile for (default: all rules)")
+    parser.add_argument('--cache-dir', help="Compiled cache directory (default: <rules>/.compiled)")
+    args = parser.parse_args(argv)
+
+    locales = args.locales.split(',') if args.locales else None
+    start = time.perf_counter()
+    try:
+        ruleset = load_rules(args.path, args.cache_dir, locales)
+    except RuleError as e:
+        print(f"❌ {len(e.errors)} problem(s):")
+        for error in e.errors:
+            print(f"   - {error}")
+        return 1
+    elapsed = time.perf_counter() - start
+    info = ruleset.describe()
+    print(f"✅ Rules {info['version']}: {info['rules']} rules, {info['patterns']} patterns "
+          f"({elapsed * 1000:.0f} ms, cache {ruleset.fingerprint[:12]})")
+    for pack in info['packs']:
+        print(f"   📦 {pack['file']}: {pack['name']} v{pack['version']}, {pack['rules']} rules")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
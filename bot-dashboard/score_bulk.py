@@ -0,0 +1,180 @@
+# score_bulk.py - Stream a message corpus through ScamDetector and write JSONL results
+import argparse
+import contextlib
+import csv
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from analysis_result import AnalysisResult
+from detect_scam import ScamDetector
+
+# Fields tried, in order, when a JSONL record doesn't say which one holds the text
+TEXT_FIELDS = ('text', 'message', 'body')
+ID_FIELDS = ('id', 'message_id', 'request_id')
+
+_worker_detector = None
+
+
+def detect_format(path):
+    """Guess the input format from the file extension"""
+    if path.endswith('.csv'):
+        return 'csv'
+    if path.endswith('.jsonl') or path.endswith('.json'):
+        return 'jsonl'
+    return 'text'
+
+
+def read_records(stream, fmt, text_field=None):
+    """Yield (record_id, text) pairs from a JSONL, CSV or plain-text stream
+
+    JSONL lines that aren't valid JSON objects or strings are reported
+    on stderr with their line number and skipped.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        field = text_field or 'text'
+        for line_no, row in enumerate(reader, 1):
+            yield row.get('id') or line_no, row.get(field, '')
+    elif fmt == 'jsonl':
+        for line_no, line in enumerate(stream, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                print(f"⚠️ Skipping line {line_no}: invalid JSON ({e})", file=sys.stderr)
+                continue
+            if isinstance(record, str):
+                yield line_no, record
+                continue
+            if not isinstance(record, dict):
+                print(f"⚠️ Skipping line {line_no}: expected an object or a string", file=sys.stderr)
+                continue
+            fields = (text_field,) if text_field else TEXT_FIELDS
+            text = next((record[f] for f in fields if f in record), '')
+            record_id = next((record[f] for f in ID_FIELDS if f in record), line_no)
+            yield record_id, text
+    else:
+        for line_no, line in enumerate(stream, 1):
+            line = line.rstrip('\n')
+            if line:
+                yield line_no, line
+
+
+def chunked(records, size):
+    """Group an iterator into lists of at most size items"""
+    records = iter(records)
+    while True:
+        chunk = list(islice(records, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _init_worker(model_path):
+    global _worker_detector
+    # Keep load messages off stdout, which may be carrying the JSONL output
+    with contextlib.redirect_stdout(sys.stderr):
+        # No result cache or campaign shortcuts: each verdict must depend only
+        # on its own message, not on --workers, chunk order or earlier messages
+        _worker_detector = ScamDetector(model_path=model_path, cache_size=0, campaigns=False)
+
+
+def _score_chunk(chunk):
+    ids = [record_id for record_id, _ in chunk]
+    results = _worker_detector.analyze_many([text for _, text in chunk])
+    return list(zip(ids, results))
+
+
+def score_stream(records, out, model_path, chunk_size=1000, workers=1, compact=False):
+    """Score records chunk by chunk and write one JSON line per message.
+
+    With workers > 1 chunks are spread over a process pool; at most two
+    chunks per worker are in flight so memory stays bounded regardless of
+    input size. Output order always matches input order. compact leaves
+    the static explanation text out of every record.
+    """
+    stats = Counter()
+    start = time.perf_counter()
+    chunks = chunked(records, chunk_size)
+
+    def write(scored):
+        for record_id, result in scored:
+            stats['messages'] += 1
+            stats[result.get('risk_level', 'error')] += 1
+            if isinstance(result, AnalysisResult):
+                result = result.to_dict(compact)
+            out.write(json.dumps({'id': record_id, **result}, ensure_ascii=False) + '\n')
+        elapsed = time.perf_counter() - start
+        print(f"📊 {stats['messages']} messages, {stats['messages'] / elapsed:.0f} msg/s",
+              file=sys.stderr)
+
+    if workers <= 1:
+        _init_worker(model_path)
+        for chunk in chunks:
+            write(_score_chunk(chunk))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(model_path,)) as pool:
+            in_flight = []
+            for chunk in chunks:
+                in_flight.append(pool.submit(_score_chunk, chunk))
+                if len(in_flight) >= workers * 2:
+                    write(in_flight.pop(0).result())
+            for future in in_flight:
+                write(future.result())
+
+    stats['elapsed_seconds'] = round(time.perf_counter() - start, 3)
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-score messages with ScamDetector")
+    parser.add_argument('input', help="JSONL, CSV or text file to score, or - for stdin")
+    parser.add_argument('-o', '--output', default='-', help="JSONL output file (default: stdout)")
+    parser.add_argument('-f', '--format', choices=['jsonl', 'csv', 'text'],
+                        help="Input format (default: guessed from extension, jsonl for stdin)")
+    parser.add_argument('--text-field', help="Field holding the message text")
+    parser.add_argument('--chunk-size', type=int, default=1000, help="Messages per chunk")
+    parser.add_argument('--workers', type=int, default=1, help="Worker processes, 0 for one per core (default: 1)")
+    parser.add_argument('--model', default='scam_detector_model.joblib', help="Model file to load")
+    parser.add_argument('--compact', action='store_true',
+                        help="Leave explanations, recommendations and summaries out of the output")
+    args = parser.parse_args(argv)
+
+    if args.input == '-':
+        source = sys.stdin
+        fmt = args.format or 'jsonl'
+    else:
+        source = open(args.input, encoding='utf-8', newline='')
+        fmt = args.format or detect_format(args.input)
+    out = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+
+    workers = args.workers if args.workers > 0 else os.cpu_count()
+    try:
+        stats = score_stream(read_records(source, fmt, args.text_field), out, args.model,
+                             chunk_size=args.chunk_size, workers=workers, compact=args.compact)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if out is not sys.stdout:
+            out.close()
+
+    rate = stats['messages'] / stats['elapsed_seconds'] if stats['elapsed_seconds'] else 0
+    print("\n" + "=" * 60, file=sys.stderr)
+    print(f"✅ Scored {stats['messages']} messages in {stats['elapsed_seconds']}s ({rate:.0f} msg/s)",
+          file=sys.stderr)
+    for level in ('critical', 'high', 'medium', 'low', 'error'):
+        if stats[level]:
+            print(f"   {level}: {stats[level]}", file=sys.stderr)
+    print("=" * 60, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# serve.py - Production server: pre-forked gunicorn workers sharing one loaded model
+import argparse
+import gc
+import os
+
+from gunicorn.app.base import BaseApplication
+
+
+class DashboardServer(BaseApplication):
+    """Runs the dashboard under gunicorn with the app preloaded in the master.
+
+    The master imports app.py (which loads the joblib model) once and then
+    forks the workers, so the model's memory pages are shared copy-on-write
+    instead of being unpickled again in every worker.
+    """
+
+    def __init__(self, options):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        from app import app
+        # Move everything loaded so far out of the GC's reach so collections
+        # in the workers don't touch (and un-share) the model's pages
+        gc.freeze()
+        return app
+
+
+def post_fork(server, worker):
+    # Threads don't survive fork: with SCAM_MODEL_LOAD=background each
+    # worker starts its own model load instead of waiting for a request
+    from app import detector
+    detector.ensure_loading()
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the scam detection dashboard")
+    parser.add_argument('--bind', default=os.environ.get('DASHBOARD_BIND', '0.0.0.0:5000'),
+                        help="Address to listen on (default: 0.0.0.0:5000)")
+    parser.add_argument('--workers', type=int, default=_env_int('DASHBOARD_WORKERS', os.cpu_count() or 1),
+                        help="Worker processes (default: one per core)")
+    parser.add_argument('--threads', type=int, default=_env_int('DASHBOARD_THREADS', 4),
+                        help="Threads per worker (default: 4)")
+    parser.add_argument('--timeout', type=int, default=_env_int('DASHBOARD_TIMEOUT', 30),
+                        help="Seconds before a stuck worker is restarted (default: 30)")
+    parser.add_argument('--graceful-timeout', type=int, default=_env_int('DASHBOARD_GRACEFUL_TIMEOUT', 30),
+                        help="Seconds to finish in-flight requests on shutdown (default: 30)")
+    args = parser.parse_args(argv)
+
+    options = {
+        'bind': args.bind,
+        'workers': args.workers,
+        'threads': args.threads,
+        'worker_class': 'gthread',
+        'preload_app': True,
+        'post_fork': post_fork,
+        'timeout': args.timeout,
+        'graceful_timeout': args.graceful_timeout,
+        'keepalive': 5
+    }
+
+    print("\n" + "=" * 60)
+    print("🚀 SCAM DETECTION DASHBOARD (production)")
+    print("=" * 60)
+    print(f"   Bind: {args.bind}")
+    print(f"   Workers: {args.workers} x {args.threads} threads")
+    print("   Readiness: /api/ready")
+    print("=" * 60 + "\n")
+
+    DashboardServer(options).run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+# shadow_scorer.py - Score live traffic with a candidate model without affecting responses
+import os
+import queue
+import random
+import threading
+import time
+from collections import Counter, deque
+
+
+class ShadowScorer:
+    """Compares a candidate model against the live one on real traffic.
+
+    observe() only samples messages into a bounded queue, so request
+    latency is unaffected; when the queue is full, messages are dropped
+    and counted. A background thread scores the queue in batches with the
+    candidate and records agreement with the live model's verdicts,
+    confidence drift and the candidate's own latency.
+    """
+
+    def __init__(self, detector, sample_rate=1.0, max_queue=10000, batch_size=256, max_examples=20):
+        self.detector = detector
+        self.sample_rate = sample_rate
+        self.batch_size = batch_size
+        self.max_queue = max_queue
+        self.max_examples = max_examples
+        self._queue = queue.Queue(max_queue)
+        self._lock = threading.Lock()
+        self._pid = None
+        self.version = None
+        self._scorer = None
+        self._reset()
+
+    def _reset(self):
+        self.outcomes = Counter()
+        self.dropped = 0
+        self.confidence_delta = 0.0
+        self.seconds = 0.0
+        self.disagreements = deque(maxlen=self.max_examples)
+
+    def set_candidate(self, version, model):
+        """Start shadow-scoring a loaded model; statistics start from zero"""
+        scorer = self.detector.build_scorer(model)
+        with self._lock:
+            self._scorer = scorer
+            self.version = version
+            self._reset()
+
+    def clear(self):
+        with self._lock:
+            self._scorer = None
+            self.version = None
+
+    def _ensure_started(self):
+        # Threads don't survive fork, so a preloaded app starts one per worker
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue(self.max_queue)
+                threading.Thread(target=self._run, name='shadow-scorer', daemon=True).start()
+                self._pid = os.getpid()
+
+    def observe(self, messages, results):
+        """Queue a sample of analyzed messages for the candidate"""
+        if self._scorer is None:
+            return
+        self._ensure_started()
+        for message, result in zip(messages, results):
+            prediction = result.get('ai_prediction')
+            if prediction is None or (self.sample_rate < 1 and random.random() >= self.sample_rate):
+                continue
+            try:
+                self._queue.put_nowait((self.version, message, prediction, result.get('ai_confidence', 0)))
+            except queue.Full:
+                self.dropped += 1
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            with self._lock:
+                scorer, version = self._scorer, self.version
+            # Skip anything queued for a candidate that has since been replaced
+            batch = [item for item in batch if item[0] == version]
+            if scorer is None or not batch:
+                continue
+
+            start = time.perf_counter()
+            try:
+                probabilities = scorer.predict_proba([message for _, message, _, _ in batch])
+            except Exception:
+                self.outcomes['errors'] += len(batch)
+                continue
+            elapsed = time.perf_counter() - start
+
+            classes = scorer.classes_
+            with self._lock:
+                if self.version != version:
+                    continue
+                self.seconds += elapsed
+                for (_, message, live, live_confidence), row in zip(batch, probabilities):
+                    best = row.argmax()
+                    shadow = str(classes[best])
+                    confidence = round(row[best] * 100, 1)
+                    self.confidence_delta += abs(confidence - live_confidence) if shadow == live else 0
+                    if shadow == live:
+                        self.outcomes['agree'] += 1
+                    else:
+                        self.outcomes['disagree'] += 1
+                        self.outcomes[f'{live}->{shadow}'] += 1
+                        self.disagreements.append({
+                            'message': message[:200],
+                            'live': live,
+                            'live_confidence': live_confidence,
+                            'candidate': shadow,
+                            'candidate_confidence': confidence
+                        })
+
+    def stats(self):
+        with self._lock:
+            outcomes = dict(self.outcomes)
+            scored = outcomes.get('agree', 0) + outcomes.get('disagree', 0)
+            return {
+                'candidate': self.version,
+                'sample_rate': self.sample_rate,
+                'scored': scored,
+                'agreement': round(outcomes.get('agree', 0) / scored, 4) if scored else None,
+                'mean_confidence_delta_when_agreeing': (
+                    round(self.confidence_delta / outcomes['agree'], 2) if outcomes.get('agree') else None),
+                'candidate_us_per_message': round(self.seconds / scored * 1e6, 1) if scored else None,
+                'outcomes': outcomes,
+                'dropped': self.dropped,
+                'queued': self._queue.qsize(),
+                'recent_disagreements': list(self.disagreements)
+            }
@@ -0,0 +1,23 @@
+# conftest.py - Shared fixtures: import the dashboard and bot/ modules, use the trained model from bot/
+import os
+import sys
+
+import pytest
+
+DASHBOARD_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BOT_DIR = os.path.join(DASHBOARD_DIR, '..', 'bot')
+sys.path.insert(0, DASHBOARD_DIR)
+sys.path.append(BOT_DIR)
+
+from detect_scam import ScamDetector  # noqa: E402
+
+MODEL_PATH = os.path.join(BOT_DIR, 'scam_detector_model.joblib')
+
+
+@pytest.fixture
+def make_detector():
+    """Build ScamDetectors on the trained model with the bundled rules"""
+    def make(**options):
+        options.setdefault('model_path', MODEL_PATH)
+        return ScamDetector(**options)
+    return make
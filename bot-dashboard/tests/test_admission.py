@@ -0,0 +1,87 @@
+# test_admission.py - Overload degrades to pattern-only verdicts; floods are rate limited
+import time
+
+from admission import ADMITTED, DEGRADED, RATE_LIMITED, AdmissionController
+from batch_queue import MicroBatcher
+
+MESSAGE = "URGENT: your bank account is blocked, share OTP to verify your KYC"
+
+
+def test_in_flight_limit_degrades_until_release():
+    admission = AdmissionController(max_in_flight=2)
+    assert [admission.admit('a')[0] for _ in range(3)] == [ADMITTED, ADMITTED, DEGRADED]
+    admission.release()
+    assert admission.admit('a') == (ADMITTED, 0)
+    assert admission.stats()['degraded'] == 1
+
+
+def test_expected_wait_past_deadline_degrades():
+    admission = AdmissionController(deadline_ms=100, expected_wait=lambda ahead, count: 0.06 * (ahead + count))
+    assert admission.admit('a')[0] == ADMITTED
+    assert admission.admit('a')[0] == DEGRADED
+    admission.release(timed_out=True)
+    assert admission.stats()['timeouts'] == 1
+
+
+def test_batches_count_every_message_in_flight():
+    admission = AdmissionController(max_in_flight=10)
+    assert admission.admit('a', cost=8)[0] == ADMITTED
+    assert admission.admit('a', cost=3)[0] == DEGRADED
+    assert admission.admit('a', cost=2)[0] == ADMITTED
+    admission.release(8)
+    assert admission.stats()['in_flight'] == 2
+
+    # With nothing in flight, an oversized batch is left to the wait estimate
+    admission = AdmissionController(max_in_flight=4, deadline_ms=100, expected_wait=lambda ahead, count: 0.01 * count)
+    assert admission.admit('a', cost=8)[0] == ADMITTED
+    admission.release(8)
+    assert admission.admit('a', cost=20)[0] == DEGRADED
+
+
+def test_rate_limit_charges_the_whole_batch():
+    admission = AdmissionController(client_rate=1, client_burst=2)
+    assert admission.admit('a', cost=6)[0] == ADMITTED
+    decision, retry_after = admission.admit('a')
+    assert decision == RATE_LIMITED and retry_after > 4
+
+
+def test_expected_wait_counts_messages():
+    batcher = MicroBatcher(lambda messages: messages, max_wait_ms=0)
+    batcher.seconds_per_message = 0.01
+    assert abs(batcher.expected_wait(0, count=10) - 0.1) < 1e-9
+    assert abs(batcher.expected_wait(5) - 0.06) < 1e-9
+
+
+def test_submit_many_withdraws_late_messages():
+    def slow(messages):
+        time.sleep(0.2)
+        return [message.upper() for message in messages]
+
+    batcher = MicroBatcher(slow, max_batch_size=2, max_wait_ms=0)
+    # c and d are being scored at the deadline; e and f are still queued and get dropped
+    assert batcher.submit_many(list('abcdef'), timeout=0.3) == ['A', 'B', None, None, None, None]
+    time.sleep(0.3)
+    assert batcher.stats()['expired'] == 2
+
+
+def test_client_rate_limit_is_per_client():
+    admission = AdmissionController(client_rate=1, client_burst=2)
+    assert admission.admit('a', cost=2)[0] == ADMITTED
+    decision, retry_after = admission.admit('a')
+    assert decision == RATE_LIMITED and 0 < retry_after <= 1
+    assert admission.admit('b')[0] == ADMITTED
+
+
+def test_degraded_results_are_pattern_only_and_not_cached(make_detector):
+    detector = make_detector()
+    result = detector.analyze_degraded([MESSAGE, None])
+    assert result[0]['degraded'] and result[0]['decided_by'] == 'degraded'
+    assert result[0]['ai_prediction'] is None and result[0]['scam_indicators']
+    assert 'error' in result[1]
+    assert detector.cache.stats()['size'] == 0
+
+    # A full result already in the cache is served as-is, without the degraded flag
+    full = detector.analyze(MESSAGE)
+    cached = detector.analyze_degraded([MESSAGE])[0]
+    assert 'degraded' not in cached
+    assert cached['ai_prediction'] == full['ai_prediction']
@@ -0,0 +1,63 @@
+# test_campaigns.py - Campaign votes and the confirmed-campaign shortcut
+from campaign_index import CampaignIndex
+from url_reputation import UrlReputation
+
+SCAM = "URGENT your bank account is blocked share OTP to verify KYC now call {} or lose your money"
+
+
+def test_repeated_message_votes_once():
+    index = CampaignIndex(auto_confirm_after=3)
+    result = {'ai_prediction': 'scam', 'risk_level': 'critical'}
+    for _ in range(5):
+        cluster = index.assign(SCAM.format(1))
+        index.record_verdict(cluster, result, voter='same')
+    assert cluster.scam_votes == 1
+    assert not cluster.confirmed_scam
+
+
+def test_safe_vote_withdraws_auto_confirmation():
+    index = CampaignIndex(auto_confirm_after=2)
+    scam = {'ai_prediction': 'scam', 'risk_level': 'critical'}
+    cluster = index.assign(SCAM.format(1))
+    for i in range(2):
+        index.record_verdict(cluster, scam, voter=i)
+    assert cluster.confirmed_scam
+    index.record_verdict(cluster, {'ai_prediction': 'not_scam', 'risk_level': 'low'}, voter='safe')
+    assert not cluster.confirmed_scam
+
+    # An analyst's decision stands against later votes
+    assert index.confirm_scam(cluster.id)
+    index.record_verdict(cluster, {'ai_prediction': 'not_scam', 'risk_level': 'low'}, voter='safe again')
+    assert cluster.confirmed_scam
+
+
+def test_votes_stop_once_voters_are_full():
+    index = CampaignIndex(max_keys_per_cluster=2, auto_confirm_after=3)
+    result = {'ai_prediction': 'scam', 'risk_level': 'critical'}
+    cluster = index.assign(SCAM.format(1))
+    for voter in ['a', 'b', 'c', 'c', 'c']:
+        index.record_verdict(cluster, result, voter=voter)
+    assert cluster.scam_votes == 2
+    assert not cluster.confirmed_scam
+
+
+def test_cache_hits_do_not_confirm_campaign(make_detector):
+    detector = make_detector()
+    for _ in range(detector.campaigns.auto_confirm_after + 2):
+        result = detector.analyze(SCAM.format(98765))
+    assert result['campaign']['size'] == detector.campaigns.auto_confirm_after + 2
+    assert not result['campaign']['confirmed_scam']
+
+
+def test_confirmed_shortcut_keeps_message_fields(make_detector):
+    detector = make_detector(cache_size=0, url_reputation=UrlReputation(blocklist={'evil-kyc.com'}))
+    detector.campaigns.auto_confirm_after = 2
+    detector.analyze_many([SCAM.format(1000 + i) + " at http://evil-kyc.com" for i in range(3)])
+
+    result = detector.analyze(SCAM.format(5555) + " at http://bank.example.com")
+    assert result['campaign']['shortcut']
+    assert result['decided_by'] == 'campaign'
+    assert result['ai_prediction'] == 'scam'
+    assert [u['domain'] for u in result['urls']] == ['bank.example.com']
+    assert 'Blocklisted Link' not in [f['type'] for f in result['scam_indicators']]
+    assert result['ai_top_terms'] == []
@@ -0,0 +1,30 @@
+# test_cascade.py - The cascade first tier: safe and scam shortcuts, everything else to the model
+OTP = "Your OTP for net banking login is 482913. Do not share it with anyone."
+PHISHING = ("URGENT: your bank account is blocked. Verify your OTP and PIN now at "
+            "http://sbi-kyc-update.xyz/login to avoid suspension")
+
+
+def test_short_plain_message_is_safe(make_detector):
+    result = make_detector(cascade=True).analyze("Hi, are we still on for lunch tomorrow?")
+    assert result['decided_by'] == 'prefilter_safe'
+    assert result['ai_prediction'] is None
+
+
+def test_critical_indicators_with_link_are_scam(make_detector):
+    result = make_detector(cascade=True).analyze(PHISHING)
+    assert result['decided_by'] == 'prefilter_scam'
+    assert result['risk_level'] == 'critical'
+
+
+def test_critical_indicators_without_link_go_to_model(make_detector):
+    detector = make_detector(cascade=True)
+    findings = detector.analyze_patterns(OTP)
+    assert sum(1 for f in findings if f['severity'] == 'critical') >= detector.cascade['scam_min_critical']
+    result = detector.analyze(OTP)
+    assert result['decided_by'] == 'model'
+    assert result['ai_prediction'] == 'not_scam'
+
+
+def test_cues_go_to_model(make_detector):
+    result = make_detector(cascade=True).analyze("Congratulations! You won a lottery prize of Rs 50000, claim now")
+    assert result['decided_by'] == 'model'
@@ -0,0 +1,37 @@
+# test_compress_model.py - The compression gate refuses exports that move predictions
+import json
+import os
+
+import joblib
+
+from compress_model import compress_model, load_labelled, verification_failures
+from conftest import BOT_DIR, MODEL_PATH
+
+REPORT = {'messages': 6, 'accuracy_delta': 0.0, 'flipped_predictions': 2, 'max_probability_delta': 0.2}
+
+
+def test_cancelling_flips_are_not_verified():
+    failures = verification_failures(REPORT, max_accuracy_drop=0.005, max_flipped=0.01,
+                                     max_probability_delta=0.25, min_messages=1)
+    assert failures == ["33.33% of predictions changed (max 1.00%)"]
+
+
+def test_small_evaluation_set_is_refused():
+    failures = verification_failures(dict(REPORT, flipped_predictions=0), max_accuracy_drop=0.005,
+                                     max_flipped=0.01, max_probability_delta=0.25, min_messages=200)
+    assert failures == ["only 6 evaluation messages (need 200)"]
+
+
+def test_only_verified_exports_are_installed(tmp_path):
+    pipeline = joblib.load(MODEL_PATH)
+    texts, labels = load_labelled([os.path.join(BOT_DIR, 'scam_data.csv')])
+    path = str(tmp_path / 'model.compact')
+
+    report = compress_model(pipeline, path, texts, labels, keep=0.3, weights='uint8', min_messages=20)
+    assert not report['verified'] and report['failures']
+    assert not os.path.exists(path)
+
+    report = compress_model(pipeline, path, texts, labels, weights='float16', min_messages=20)
+    assert report['verified'], report['failures']
+    with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+        assert json.load(f)['compression']['flipped_predictions'] == 0
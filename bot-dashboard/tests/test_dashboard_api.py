@@ -0,0 +1,78 @@
+# test_dashboard_api.py - Dashboard endpoints, with app.py imported on the trained model
+import importlib
+import sys
+import threading
+import time
+
+import pytest
+
+from conftest import MODEL_PATH
+from model_registry import ModelRegistry
+
+
+@pytest.fixture(scope='module')
+def dashboard(tmp_path_factory):
+    root = tmp_path_factory.mktemp('dashboard')
+    env = {
+        'SCAM_MODEL_PATH': MODEL_PATH,
+        'SCAM_MODEL_REGISTRY': str(root / 'registry'),
+        'HISTORY_DB': '',
+        'FEEDBACK_LOG': '',
+        'SCAM_RULES_POLL': '0',
+    }
+    with pytest.MonkeyPatch.context() as patch:
+        for name, value in env.items():
+            patch.setenv(name, value)
+        sys.modules.pop('app', None)
+        module = importlib.import_module('app')
+    yield module
+    sys.modules.pop('app', None)
+
+
+def test_promote_waits_for_a_feedback_publish(dashboard):
+    registry = ModelRegistry(dashboard.registry.root)
+    first = registry.publish(MODEL_PATH, benchmark=False)
+    second = registry.publish(MODEL_PATH, benchmark=False)
+    registry.promote(first)
+    client = dashboard.app.test_client()
+
+    responses = []
+    with registry.lock():
+        # A feedback publish holds the lock; the manual promote must wait for it
+        promote = threading.Thread(
+            target=lambda: responses.append(client.post(f'/api/models/{second}/promote')))
+        promote.start()
+        time.sleep(0.3)
+        assert registry.current() == first
+        assert not responses
+    promote.join(10)
+    assert responses[0].status_code == 200
+    assert registry.current() == second
+
+    with registry.lock():
+        shadow = threading.Thread(target=lambda: client.post(f'/api/models/{first}/shadow'))
+        shadow.start()
+        time.sleep(0.3)
+        assert registry.candidate() is None
+    shadow.join(10)
+    assert registry.candidate() == first
+
+
+def test_batch_degrades_when_the_model_is_too_slow(dashboard, monkeypatch):
+    client = dashboard.app.test_client()
+    messages = ["Hi, lunch at 3?", "URGENT: share your OTP to unblock your bank account"]
+
+    response = client.post('/api/analyze/batch', json={'messages': messages})
+    assert [r['decided_by'] for r in response.get_json()['results']] == ['model', 'model']
+    assert dashboard.admission.stats()['in_flight'] == 0
+
+    def slow(batch):
+        time.sleep(0.5)
+        return dashboard.detector.analyze_many(batch)
+
+    monkeypatch.setattr(dashboard.batcher, 'analyze_many', slow)
+    monkeypatch.setattr(dashboard.batcher, 'seconds_per_message', 0.0)
+    response = client.post('/api/analyze/batch', json={'messages': ["Are you free tomorrow?", "Call me back"]})
+    results = response.get_json()['results']
+    assert [r['decided_by'] for r in results] == ['degraded', 'degraded']
+    assert dashboard.admission.stats()['timeouts'] >= 1
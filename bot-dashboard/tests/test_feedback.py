@@ -0,0 +1,57 @@
+# test_feedback.py - Feedback updates reach every worker and survive restarts
+import time
+
+from conftest import MODEL_PATH
+from feedback_updater import FeedbackUpdater
+from model_registry import ModelRegistry, RegistryWatcher
+
+MESSAGE = "Your electricity will be disconnected tonight pay bill now"
+BATCH = [(MESSAGE, 'scam')] * 4
+
+
+def wait_for(condition, timeout=30):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return condition()
+
+
+def test_workers_replay_the_shared_log(make_detector, tmp_path):
+    log = str(tmp_path / 'feedback.jsonl')
+    workers = [make_detector() for _ in range(2)]
+    updaters = [FeedbackUpdater(d, batch_size=4, interval=0.1, log_path=log) for d in workers]
+    before = workers[1].analyze(MESSAGE)['ai_confidence']
+
+    for message, label in BATCH:
+        updaters[0].record(message, label)
+    updaters[1].ensure_started()
+    assert wait_for(lambda: all(u.applied == 4 for u in updaters))
+    assert workers[1].analyze(MESSAGE)['ai_confidence'] > before
+
+    # A restarted worker replays the log onto its freshly loaded model
+    restarted = make_detector()
+    FeedbackUpdater(restarted, batch_size=4, interval=0.1, log_path=log).ensure_started()
+    assert wait_for(lambda: restarted.model_version == 2)
+    assert restarted.analyze(MESSAGE)['ai_confidence'] == workers[1].analyze(MESSAGE)['ai_confidence']
+
+
+def test_registry_updates_are_published_as_versions(make_detector, tmp_path):
+    registry = ModelRegistry(str(tmp_path / 'registry'))
+    base = registry.publish(MODEL_PATH, benchmark=False)
+    registry.promote(base)
+    detector = make_detector(model_path=registry.artifact_path(base))
+    watcher = RegistryWatcher(registry, detector, interval=0, active=base)
+    updater = FeedbackUpdater(detector, log_path=None, registry=registry, watcher=watcher)
+    before = detector.analyze(MESSAGE)['ai_confidence']
+
+    updater.apply(BATCH)
+    version = registry.current()
+    assert version != base
+    assert registry.manifest(version)['params'] == {'feedback_base': base, 'feedback_labels': 4}
+    assert watcher.active == version
+    assert detector.analyze(MESSAGE)['ai_confidence'] > before
+
+    # Another worker still on the old version catches up through its watcher
+    other = make_detector(model_path=registry.artifact_path(base))
+    RegistryWatcher(registry, other, interval=0, active=base).poll()
+    assert other.analyze(MESSAGE)['ai_confidence'] == detector.analyze(MESSAGE)['ai_confidence']
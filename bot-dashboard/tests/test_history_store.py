@@ -0,0 +1,24 @@
+# test_history_store.py - Analysis history keeps a hash and masked preview unless full text is asked for
+from history_store import HistoryStore, message_hash
+
+MESSAGE = "Your OTP is 482913, reply to alerts@bank-secure.com with your account number 00123456789 now"
+RESULT = {'ai_prediction': 'scam', 'ai_confidence': 0.9, 'risk_score': 90, 'risk_level': 'critical',
+          'decided_by': 'model', 'scam_indicators': []}
+
+
+def test_default_keeps_only_hash_and_masked_preview(tmp_path):
+    store = HistoryStore(str(tmp_path / 'history.db'), flush_interval=0.01)
+    store.record([MESSAGE], [RESULT], ['9199'])
+    assert store.flush()
+    item = store.query(message=MESSAGE)['items'][0]
+    assert item['message_hash'] == message_hash(MESSAGE).hex()
+    assert item['message'].startswith("Your OTP is ######, reply to [email] ")
+    assert item['message'].endswith('…') and len(item['message']) <= 41
+    assert not any(c.isdigit() for c in item['message'])
+
+
+def test_full_text_is_opt_in(tmp_path):
+    store = HistoryStore(str(tmp_path / 'history.db'), flush_interval=0.01, store_messages=True)
+    store.record([MESSAGE], [RESULT])
+    assert store.flush()
+    assert store.query()['items'][0]['message'] == MESSAGE
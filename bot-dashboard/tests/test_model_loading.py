@@ -0,0 +1,28 @@
+# test_model_loading.py - Load modes, readiness and what gets cached without a model
+import time
+
+
+def test_lazy_detector_is_ready_before_first_prediction(make_detector):
+    detector = make_detector(load_mode='lazy')
+    assert detector.model_state == 'not_loaded'
+    assert detector.ready
+    detector.analyze("Hi, are we still meeting for lunch tomorrow?")
+    assert detector.model_state == 'ready'
+
+
+def test_background_load_starts_in_serving_process(make_detector):
+    detector = make_detector(load_mode='background')
+    assert not detector.ready
+    detector.ensure_loading()
+    deadline = time.monotonic() + 30
+    while not detector.ready and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert detector.ready
+
+
+def test_pattern_only_results_are_not_cached(make_detector, tmp_path):
+    detector = make_detector(model_path=str(tmp_path / 'missing.joblib'))
+    assert detector.model_state == 'failed'
+    detector.analyze("URGENT: your bank account is blocked, share OTP")
+    detector.analyze("URGENT: your bank account is blocked, share OTP")
+    assert detector.cache.hits == 0
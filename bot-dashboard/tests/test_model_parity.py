@@ -0,0 +1,59 @@
+# test_model_parity.py - The NumPy engine and compact exports score like the sklearn pipeline
+import joblib
+import numpy as np
+import pytest
+
+from conftest import MODEL_PATH
+import compact_model
+import export_compact
+from detect_scam import ENGINE_CHECK_MESSAGES, NaiveBayesEngine
+from export_compact import export_compact_model
+
+MESSAGES = ENGINE_CHECK_MESSAGES + [
+    "Dear customer your KYC is pending, update your PAN card at http://kyc-update.xyz",
+    "Can you send me the slides from today's meeting?",
+    "",
+    "🎉🎉 WIN WIN WIN 🎉🎉",
+]
+
+
+@pytest.fixture(scope='module')
+def pipeline():
+    return joblib.load(MODEL_PATH)
+
+
+def test_exporter_writes_the_format_the_reader_expects():
+    # The exporter in bot/ keeps its own copy of the format constants
+    assert export_compact.FORMAT_NAME == compact_model.FORMAT_NAME
+    assert export_compact.FORMAT_VERSION == compact_model.FORMAT_VERSION
+    assert export_compact.FORMAT_VERSION in compact_model.SUPPORTED_VERSIONS
+
+
+def test_engine_matches_pipeline(pipeline):
+    engine = NaiveBayesEngine.from_pipeline(pipeline)
+    np.testing.assert_allclose(engine.predict_proba(MESSAGES), pipeline.predict_proba(MESSAGES), atol=1e-9)
+    # One message at a time takes the small-batch path
+    single = np.vstack([engine.predict_proba([m]) for m in MESSAGES])
+    np.testing.assert_allclose(single, pipeline.predict_proba(MESSAGES), atol=1e-9)
+
+
+@pytest.mark.parametrize('weights, tolerance', [('float64', 1e-9), ('float32', 1e-5), ('float16', 0.01)])
+def test_compact_export_matches_pipeline(pipeline, tmp_path, weights, tolerance):
+    path = str(tmp_path / 'model.compact')
+    export_compact_model(pipeline, path, weights=weights)
+    engine = NaiveBayesEngine.from_compact(path)
+    np.testing.assert_allclose(engine.predict_proba(MESSAGES), pipeline.predict_proba(MESSAGES), atol=tolerance)
+
+
+def test_detector_verdicts_match_across_model_formats(make_detector, tmp_path):
+    path = str(tmp_path / 'model.compact')
+    export_compact_model(joblib.load(MODEL_PATH), path)
+    served = make_detector(cache_size=0, campaigns=False)
+    assert served.engine is not None
+    unaccelerated = make_detector(cache_size=0, campaigns=False)
+    unaccelerated.engine = None
+    compact = make_detector(model_path=path, cache_size=0, campaigns=False)
+
+    results = [d.analyze_many(MESSAGES[:-2]) for d in (served, unaccelerated, compact)]
+    for key in ('ai_prediction', 'ai_confidence', 'ai_top_terms', 'risk_score'):
+        assert [r[key] for r in results[0]] == [r[key] for r in results[1]] == [r[key] for r in results[2]]
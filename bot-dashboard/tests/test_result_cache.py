@@ -0,0 +1,67 @@
+# test_result_cache.py - Cache keys and results reused for messages that share one
+import json
+
+from result_cache import ResultCache, message_key
+from url_reputation import UrlReputation
+
+BLOCKED = UrlReputation(blocklist={'pay-1.com'})
+
+
+def test_key_folds_case_whitespace_and_digits():
+    assert message_key("Pay Rs 500  now") == message_key("pay rs 20 now")
+    assert message_key("Pay Rs 500 now", mask_numbers=False) != message_key("pay rs 20 now", mask_numbers=False)
+    assert message_key("pay now") != message_key("pay later")
+
+
+def test_cache_respects_size_bound():
+    cache = ResultCache(max_size=2)
+    for i, text in enumerate(['a', 'b', 'c']):
+        cache.put(message_key(text), i)
+    assert cache.get(message_key('a')) is None
+    assert cache.get(message_key('c')) == 2
+
+
+def test_blocklisted_link_not_hidden_by_cached_copy(make_detector):
+    detector = make_detector(url_reputation=BLOCKED, campaigns=False)
+    safe = detector.analyze("Your order is ready, track it at http://pay-2.com")
+    blocked = detector.analyze("Your order is ready, track it at http://pay-1.com")
+
+    assert detector.cache.hits == 1
+    assert [u['verdict'] for u in blocked['urls']] == ['blocked']
+    assert 'Blocklisted Link' in [f['type'] for f in blocked['scam_indicators']]
+    assert 'Blocklisted Link' not in [f['type'] for f in safe['scam_indicators']]
+    assert blocked['risk_score'] > safe['risk_score']
+
+
+def test_cached_blocklist_finding_not_copied_to_other_link(make_detector):
+    detector = make_detector(url_reputation=BLOCKED, campaigns=False)
+    blocked = detector.analyze("Your order is ready, track it at http://pay-1.com")
+    other = detector.analyze("Your order is ready, track it at http://pay-2.com")
+
+    assert detector.cache.hits == 1
+    assert [u['url'] for u in other['urls']] == ['http://pay-2.com']
+    assert [u['verdict'] for u in other['urls']] == ['unknown']
+    assert 'Blocklisted Link' not in [f['type'] for f in other['scam_indicators']]
+    assert other['risk_score'] < blocked['risk_score']
+
+
+def test_digit_rules_turn_off_digit_masking(make_detector, tmp_path):
+    pack = {'name': 'amounts', 'version': 1, 'rules': [{
+        'id': 'large_amount',
+        'patterns': [r'pay \d{4,}'],
+        'explanation': 'Asks for a large payment',
+        'severity': 'high',
+        'category': 'financial',
+    }]}
+    (tmp_path / 'amounts.json').write_text(json.dumps(pack), encoding='utf-8')
+    detector = make_detector(rules=str(tmp_path), rule_cache=str(tmp_path / 'cache'), campaigns=False)
+    assert not detector.cache.mask_numbers
+
+    small = detector.analyze("Please pay 500 today")
+    large = detector.analyze("Please pay 5000 today")
+    assert small['scam_indicators'] == []
+    assert [f['type'] for f in large['scam_indicators']] == ['Large Amount']
+    assert detector.cache.hits == 0
+
+    # The bundled rules don't look at digits, so copies that differ only in them share an entry
+    assert make_detector().cache.mask_numbers
@@ -0,0 +1,78 @@
+# test_rule_packs.py - Rule pack validation, self-tests, locales and the compiled cache
+import json
+
+import pytest
+
+import analysis_result
+from rule_packs import DEFAULT_RULES_DIR, RuleError, load_rules, rules_fingerprint, validate_pack
+
+RULE = {
+    'id': 'gift_card',
+    'patterns': ['gift card'],
+    'explanation': 'Asking for payment in gift cards',
+    'severity': 'high',
+    'category': 'financial',
+    'tests': {'match': ['Pay with a Google Play gift card'], 'no_match': ['Thanks for the gift!']},
+}
+
+
+def write_pack(directory, name='extra', **rule):
+    pack = {'name': name, 'version': 1, 'rules': [dict(RULE, **rule)]}
+    path = directory / f'{name}.json'
+    path.write_text(json.dumps(pack), encoding='utf-8')
+    return path
+
+
+def test_bundled_rules_load_and_pass_their_tests(tmp_path):
+    rules = load_rules(DEFAULT_RULES_DIR, cache_dir=str(tmp_path))
+    assert rules.rules
+    assert rules.run_tests() == []
+
+
+def test_validation_reports_every_problem():
+    pack = {'name': 'bad', 'version': '1', 'rules': [
+        dict(RULE, id='Bad-Id', patterns=['Gift (card'], severity='urgent', weight=0),
+    ]}
+    errors = validate_pack(pack, 'bad.json')
+    assert any('version must be an integer' in e for e in errors)
+    assert any('snake_case' in e for e in errors)
+    assert any('must be lowercase' in e for e in errors)
+    assert any('bad pattern' in e for e in errors)
+    assert any('severity must be one of' in e for e in errors)
+    assert any('weight must be a positive number' in e for e in errors)
+
+
+def test_failing_rule_self_test_is_rejected(tmp_path):
+    write_pack(tmp_path, tests={'match': ['Pay with an iTunes voucher']})
+    with pytest.raises(RuleError) as error:
+        load_rules(str(tmp_path), cache_dir=str(tmp_path / 'cache'))
+    assert error.value.errors == ["gift_card: should match 'Pay with an iTunes voucher'"]
+
+
+def test_duplicate_rule_ids_across_packs_are_rejected(tmp_path):
+    write_pack(tmp_path, name='a')
+    write_pack(tmp_path, name='b')
+    with pytest.raises(RuleError, match='already defined'):
+        load_rules(str(tmp_path), cache_dir=str(tmp_path / 'cache'))
+
+
+def test_locale_filter_and_cache(tmp_path):
+    write_pack(tmp_path, locales=['en-IN'])
+    cache = str(tmp_path / 'cache')
+    assert 'gift_card' in load_rules(str(tmp_path), cache_dir=cache, locales=['en']).rules
+    with pytest.raises(RuleError, match='No rules selected'):
+        load_rules(str(tmp_path), cache_dir=cache, locales=['fr'])
+    # The second load of the same packs comes from the compiled cache
+    first = load_rules(str(tmp_path), cache_dir=cache)
+    assert load_rules(str(tmp_path), cache_dir=cache).fingerprint == first.fingerprint
+    assert list((tmp_path / 'cache').glob('*.pickle'))
+
+
+def test_fingerprint_covers_pickled_finding_class(tmp_path, monkeypatch):
+    paths = [str(write_pack(tmp_path))]
+    before = rules_fingerprint(paths)
+    edited = tmp_path / 'analysis_result.py'
+    with open(analysis_result.__file__, encoding='utf-8') as f:
+        edited.write_text(f.read() + '\n# changed\n', encoding='utf-8')
+    monkeypatch.setattr(analysis_result, '__file__', str(edited))
+    assert rules_fingerprint(paths) != before
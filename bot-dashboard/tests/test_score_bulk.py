@@ -0,0 +1,34 @@
+# test_score_bulk.py - Bulk scoring is deterministic and survives bad input lines
+import io
+import json
+
+import pytest
+
+from conftest import MODEL_PATH
+from score_bulk import read_records, score_stream
+
+SCAM = "URGENT your bank account is blocked share OTP to verify KYC now call {} or lose your money"
+
+
+def test_malformed_jsonl_lines_are_skipped(capsys):
+    stream = io.StringIO('{"id": "a", "text": "hello there"}\n{not json\n[1, 2]\n"just text"\n')
+    assert list(read_records(stream, 'jsonl')) == [('a', 'hello there'), (4, 'just text')]
+    errors = capsys.readouterr().err
+    assert 'line 2' in errors and 'line 3' in errors
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7])
+def test_results_do_not_depend_on_chunking(chunk_size):
+    records = [(i, SCAM.format(1000 + i % 3)) for i in range(12)]
+
+    def score(size):
+        out = io.StringIO()
+        score_stream(records, out, MODEL_PATH, chunk_size=size)
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        for row in rows:
+            row.pop('timestamp')
+        return rows
+
+    single = score(len(records))
+    assert score(chunk_size) == single
+    assert all(row['decided_by'] == 'model' and 'campaign' not in row for row in single)
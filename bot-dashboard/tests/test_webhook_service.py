@@ -0,0 +1,66 @@
+# test_webhook_service.py - Duplicate handling and per-channel replies of the webhook receiver
+import time
+
+from messaging_client import SendError
+from webhook_service import MessageLedger, WebhookService
+
+
+class RecordingClient:
+    def __init__(self, failures=0):
+        self.sent = []
+        self.failures = failures
+
+    def send(self, to, text, reply_to):
+        if self.failures:
+            self.failures -= 1
+            raise SendError("HTTP 503: unavailable", retryable=True)
+        self.sent.append((to, reply_to))
+
+    def stats(self):
+        return {'sent': len(self.sent)}
+
+
+def test_failed_reply_can_be_claimed_again():
+    ledger = MessageLedger()
+    assert ledger.claim('m1')
+    assert not ledger.claim('m1')
+    ledger.mark('m1', 'failed')
+    assert ledger.claim('m1')
+    assert ledger.state('m1') == 'queued'
+    ledger.mark('m1', 'replied')
+    assert not ledger.claim('m1')
+
+
+def wait_for(condition, timeout=30):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return condition()
+
+
+def test_provider_redelivery_retries_a_failed_reply(make_detector):
+    client = RecordingClient(failures=1)
+    service = WebhookService(make_detector(), client, max_wait_ms=1, sender_threads=1)
+    assert service.accept('whatsapp', 'wamid.1', '9199', "Hi, lunch at 3?") == 'queued'
+    assert wait_for(lambda: service.ledger.state('wamid.1') == 'failed')
+    assert client.sent == []
+
+    assert service.accept('whatsapp', 'wamid.1', '9199', "Hi, lunch at 3?") == 'queued'
+    assert wait_for(lambda: service.ledger.state('wamid.1') == 'replied')
+    assert client.sent == [('9199', 'wamid.1')]
+    assert service.stats()['reply_failures'] == 1
+
+
+def test_replies_go_through_the_channel_client(make_detector):
+    whatsapp, sms = RecordingClient(), RecordingClient()
+    service = WebhookService(make_detector(), whatsapp, max_wait_ms=1, sender_threads=2, sms_client=sms)
+    assert service.accept('whatsapp', 'wamid.1', '9199', "Hi, lunch at 3?") == 'queued'
+    assert service.accept('sms', 'SM1', '+1555', "Your parcel is held at customs, pay now") == 'queued'
+    assert service.accept('sms', 'SM1', '+1555', "Your parcel is held at customs, pay now") == 'duplicate'
+
+    deadline = time.monotonic() + 30
+    while service.stats().get('replied', 0) < 2 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert whatsapp.sent == [('9199', 'wamid.1')]
+    assert sms.sent == [('+1555', 'SM1')]
+    assert service.stats()['duplicates'] == 1
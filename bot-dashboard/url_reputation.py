@@ -0,0 +1,303 @@
+# url_reputation.py - URL extraction and domain blocklist/allowlist lookups
+import argparse
+import hashlib
+import ipaddress
+import json
+import math
+import os
+import re
+from urllib.parse import urlsplit
+
+import numpy as np
+
+FORMAT_NAME = 'scam-detector-domains'
+FORMAT_VERSION = 1
+
+# Target false-positive rate of the Bloom filter in front of the exact check
+BLOOM_ERROR_RATE = 0.001
+
+# Bare domains (no scheme, no www.) only count as links with one of these TLDs,
+# so "Mr.Smith" or "file.txt" are not mistaken for URLs
+KNOWN_TLDS = frozenset('''
+    com net org info biz edu gov mil int co io me ly gl gd to cc tv ws su ru cn in uk us de fr it
+    es nl pl br au ca jp kr id pk bd lk np ae sa ng ke za tk ml ga cf gq top xyz online site club
+    live app shop store link click loan win bid work vip icu buzz fun monster cam rest support
+    help today life world space website tech digital email
+'''.split())
+
+SHORTENERS = frozenset('''
+    bit.ly tinyurl.com t.co goo.gl ow.ly is.gd buff.ly rb.gy cutt.ly shorturl.at tiny.cc
+    rebrand.ly t.ly s.id v.gd bl.ink lnkd.in
+'''.split())
+
+URL_PATTERN = re.compile(r'''
+    (?:\b(?:https?|hxxps?)://|\bwww\.)[^\s<>"']+
+    |
+    (?<![@\w.-])[a-z0-9][a-z0-9.-]*\.(?P<tld>[a-z]{2,24}|xn--[a-z0-9-]+)\b(?:/[^\s<>"']*)?
+''', re.IGNORECASE | re.VERBOSE)
+
+TRAILING_PUNCTUATION = '.,;:!?)]}\'"'
+
+
+def normalize_domain(domain):
+    """Lowercase, IDNA-encode and strip wildcards/dots from a domain name"""
+    domain = domain.strip().lower().rstrip('.')
+    if domain.startswith('*.'):
+        domain = domain[2:]
+    domain = domain.lstrip('.')
+    if domain.startswith('www.'):
+        domain = domain[4:]
+    try:
+        return domain.encode('idna').decode('ascii')
+    except UnicodeError:
+        return domain
+
+
+def extract_urls(message):
+    """Return [(url, domain)] for every distinct link in a message"""
+    found = {}
+    # URLs never contain whitespace, so only dotted tokens need the regex
+    matches = (match for token in message.split() if '.' in token or '://' in token
+               for match in URL_PATTERN.finditer(token))
+    for match in matches:
+        tld = match.group('tld')
+        if tld is not None and tld.lower() not in KNOWN_TLDS and not tld.lower().startswith('xn--'):
+            continue
+        url = match.group(0).rstrip(TRAILING_PUNCTUATION)
+        if url in found:
+            continue
+        target = url if '://' in url else 'http://' + url
+        target = re.sub(r'^hxxp', 'http', target, flags=re.IGNORECASE)
+        try:
+            host = urlsplit(target).hostname
+        except ValueError:
+            host = None
+        if host:
+            found[url] = normalize_domain(host)
+    return list(found.items())
+
+
+def _digest(domain):
+    """Two 64-bit hashes of a normalized domain: h1 is also its index key"""
+    raw = hashlib.blake2b(domain.encode('utf-8'), digest_size=16).digest()
+    return int.from_bytes(raw[:8], 'little'), int.from_bytes(raw[8:], 'little') | 1
+
+
+class DomainIndex:
+    """Compact, memory-mappable set of domain names.
+
+    A Bloom filter rejects almost every unknown domain after k bit probes.
+    Possible hits are confirmed against the exact names: 64-bit digests
+    sorted in one array (binary search), with the names themselves stored
+    back to back in digest order. Lookup cost does not grow with the
+    list in any way that matters: k probes plus about log2(n) comparisons
+    for the rare candidates.
+    """
+
+    def __init__(self, bloom, hashes, digests, offsets, names):
+        self.bloom = bloom
+        self.hashes = hashes
+        self.bits = len(bloom) * 8
+        self.digests = digests
+        self.offsets = offsets
+        self.names = names
+
+    def __len__(self):
+        return len(self.digests)
+
+    @classmethod
+    def from_domains(cls, domains):
+        names = sorted({normalize_domain(d) for d in domains if d and d.strip()} - {''})
+        pairs = [_digest(name) for name in names]
+        h1 = np.array([p[0] for p in pairs], dtype=np.uint64)
+        h2 = np.array([p[1] for p in pairs], dtype=np.uint64)
+
+        count = max(len(names), 1)
+        bits = max(64, int(-count * math.log(BLOOM_ERROR_RATE) / math.log(2) ** 2))
+        bits = (bits + 7) // 8 * 8
+        hashes = max(1, round(bits / count * math.log(2)))
+        bloom = np.zeros(bits // 8, dtype=np.uint8)
+        with np.errstate(over='ignore'):
+            for i in range(hashes):
+                positions = (h1 + np.uint64(i) * h2) % np.uint64(bits)
+                np.bitwise_or.at(bloom, positions >> np.uint64(3),
+                                 (1 << (positions & np.uint64(7))).astype(np.uint8))
+
+        order = np.argsort(h1, kind='stable')
+        encoded = [names[i].encode('utf-8') for i in order]
+        ends = np.cumsum([len(e) for e in encoded], dtype=np.uint64)
+        width = np.uint32 if not len(ends) or ends[-1] < 2 ** 32 else np.uint64
+        offsets = np.zeros(len(encoded) + 1, dtype=width)
+        offsets[1:] = ends
+        return cls(bloom, hashes, h1[order], offsets, b''.join(encoded))
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """Load a built index directory, or build one from a plain-text list"""
+        if not os.path.isdir(path):
+            return cls.from_domains(read_domain_list(path))
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('format') != FORMAT_NAME or meta.get('version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported domain index format in {path}")
+        mode = 'r' if mmap else None
+        arrays = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mode)
+                  for name in ('bloom', 'digests', 'offsets')}
+        names = np.memmap(os.path.join(path, 'names.bin'), dtype=np.uint8, mode='r') \
+            if meta['count'] else np.zeros(0, dtype=np.uint8)
+        return cls(arrays['bloom'], meta['hashes'], arrays['digests'], arrays['offsets'], names)
+
+    def save(self, path, source=None):
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, 'bloom.npy'), self.bloom)
+        np.save(os.path.join(path, 'digests.npy'), self.digests)
+        np.save(os.path.join(path, 'offsets.npy'), self.offsets)
+        with open(os.path.join(path, 'names.bin'), 'wb') as f:
+            f.write(bytes(self.names))
+        meta = {
+            'format': FORMAT_NAME,
+            'version': FORMAT_VERSION,
+            'count': len(self),
+            'bloom_bits': self.bits,
+            'hashes': self.hashes,
+            'source': source,
+        }
+        with open(os.path.join(path, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=2)
+        return meta
+
+    def _name_at(self, position):
+        start, end = int(self.offsets[position]), int(self.offsets[position + 1])
+        return bytes(self.names[start:end]).decode('utf-8')
+
+    def __contains__(self, domain):
+        if not len(self.digests):
+            return False
+        h1, h2 = _digest(domain)
+        bloom, bits = self.bloom, self.bits
+        for i in range(self.hashes):
+            # Same uint64 wrap-around as the vectorized build
+            position = ((h1 + i * h2) & 0xFFFFFFFFFFFFFFFF) % bits
+            if not bloom[position >> 3] & (1 << (position & 7)):
+                return False
+
+        position = int(np.searchsorted(self.digests, np.uint64(h1)))
+        while position < len(self.digests) and int(self.digests[position]) == h1:
+            if self._name_at(position) == domain:
+                return True
+            position += 1
+        return False
+
+
+def read_domain_list(path):
+    """Domains from a text list: one per line, '#' comments, hosts-file lines allowed"""
+    with open(path, encoding='utf-8', errors='replace') as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            parts = line.split()
+            # hosts-file format: "0.0.0.0 evil.example"
+            yield parts[1] if len(parts) > 1 else parts[0]
+
+
+class UrlReputation:
+    """Per-URL verdicts for a message from local block and allow lists.
+
+    Each host is checked from most to least specific (login.evil.com,
+    then evil.com), so listing a domain covers its subdomains. The most
+    specific listed name decides; if it is on both lists the allowlist
+    wins, so it can be used to correct false positives.
+    """
+
+    def __init__(self, blocklist=None, allowlist=None):
+        self.blocklist = blocklist
+        self.allowlist = allowlist
+
+    @classmethod
+    def from_paths(cls, blocklist_path=None, allowlist_path=None):
+        return cls(
+            DomainIndex.load(blocklist_path) if blocklist_path else None,
+            DomainIndex.load(allowlist_path) if allowlist_path else None
+        )
+
+    def domain_verdict(self, domain):
+        """Return (verdict, matched name) for one normalized domain"""
+        try:
+            ipaddress.ip_address(domain.strip('[]'))
+            candidates = [domain]
+        except ValueError:
+            labels = domain.split('.')
+            candidates = ['.'.join(labels[i:]) for i in range(max(len(labels) - 1, 1))]
+
+        for name in candidates:
+            if self.allowlist is not None and name in self.allowlist:
+                return 'allowed', name
+            if self.blocklist is not None and name in self.blocklist:
+                return 'blocked', name
+        return 'unknown', None
+
+    def check(self, message):
+        """Verdict dicts for every URL in a message, in order of appearance"""
+        results = []
+        for url, domain in extract_urls(message):
+            verdict, matched = self.domain_verdict(domain)
+            flags = []
+            if domain in SHORTENERS:
+                flags.append('shortener')
+            if any(label.startswith('xn--') for label in domain.split('.')):
+                flags.append('punycode')
+            try:
+                ipaddress.ip_address(domain.strip('[]'))
+                flags.append('ip_address')
+            except ValueError:
+                pass
+            results.append({
+                'url': url,
+                'domain': domain,
+                'verdict': verdict,
+                'matched': matched,
+                'flags': flags
+            })
+        return results
+
+    def stats(self):
+        return {
+            'blocklist_domains': len(self.blocklist) if self.blocklist is not None else 0,
+            'allowlist_domains': len(self.allowlist) if self.allowlist is not None else 0,
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or query a compact domain index")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build = commands.add_parser('build', help="Index a plain-text domain list")
+    build.add_argument('source', help="Text file, one domain per line (hosts format allowed)")
+    build.add_argument('-o', '--output', help="Index directory (default: <source>.index)")
+
+    check = commands.add_parser('check', help="Look up domains or URLs in an index")
+    check.add_argument('index')
+    check.add_argument('items', nargs='+')
+
+    args = parser.parse_args(argv)
+    if args.command == 'build':
+        target = args.output or os.path.splitext(args.source)[0] + '.index'
+        print(f"📥 Reading {args.source}...")
+        index = DomainIndex.from_domains(read_domain_list(args.source))
+        meta = index.save(target, source=os.path.basename(args.source))
+        size = sum(os.path.getsize(os.path.join(target, n)) for n in os.listdir(target))
+        print(f"✅ Indexed {meta['count']} domains into {target} "
+              f"({size / 1024 / 1024:.1f} MiB, {meta['hashes']} Bloom hashes)")
+    else:
+        reputation = UrlReputation(blocklist=DomainIndex.load(args.index))
+        for item in args.items:
+            urls = extract_urls(item) or [(item, normalize_domain(item))]
+            for url, domain in urls:
+                verdict, matched = reputation.domain_verdict(domain)
+                icon = '🚫' if verdict == 'blocked' else '❔'
+                print(f"{icon} {url} -> {domain}: {verdict}" + (f" ({matched})" if matched else ''))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+# compress_model.py - Shrink a trained model for serving: prune features, narrow the weights, check the accuracy cost
+import argparse
+import json
+import os
+import shutil
+import sys
+
+import joblib
+import numpy as np
+from sklearn.model_selection import train_test_split
+
+from export_compact import WEIGHT_DTYPES, export_compact_model, find_steps
+from train_model import load_and_clean_data
+
+# The inference engine lives with the dashboard
+DASHBOARD_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'bot-dashboard')
+
+# Fewer held-out messages than this can't show a small accuracy cost
+MIN_EVAL_MESSAGES = 200
+
+
+def feature_scores(pipeline):
+    """How far each feature can move a verdict: its class log-probability spread times its IDF.
+
+    A term whose log-probability is about the same under every class adds
+    about the same to every class score, so dropping it barely changes
+    the prediction (only the TF-IDF normalization of the other terms).
+    """
+    vectorizer, classifier = find_steps(pipeline)
+    flp = classifier.feature_log_prob_
+    spread = flp.max(axis=0) - flp.min(axis=0)
+    return spread * vectorizer.idf_ if vectorizer.use_idf else spread
+
+
+def select_features(pipeline, keep=1.0, min_score=0.0):
+    """Sorted vocabulary columns scoring at least min_score, capped at the best keep share of them all"""
+    scores = feature_scores(pipeline)
+    columns = np.flatnonzero(scores >= min_score)
+    limit = int(round(len(scores) * keep))
+    if len(columns) > limit:
+        columns = columns[np.argsort(-scores[columns], kind='stable')[:limit]]
+    return np.sort(columns)
+
+
+def pipeline_bytes(pipeline):
+    """Approximate memory held by the vocabulary-sized parts of a fitted pipeline"""
+    vectorizer, classifier = find_steps(pipeline)
+    vocabulary = vectorizer.vocabulary_
+    total = sys.getsizeof(vocabulary) + sum(sys.getsizeof(t) + sys.getsizeof(c) for t, c in vocabulary.items())
+    # Terms cut by max_features/min_df; only kept for introspection, never used to predict
+    stop_words = getattr(vectorizer, 'stop_words_', None) or ()
+    total += sys.getsizeof(stop_words) + sum(sys.getsizeof(t) for t in stop_words)
+    total += vectorizer.idf_.nbytes if vectorizer.use_idf else 0
+    total += sum(value.nbytes for value in vars(classifier).values() if isinstance(value, np.ndarray))
+    return total
+
+
+def compact_bytes(engine):
+    """Memory held by a compact engine's arrays"""
+    return sum(array.nbytes for array in (engine.vocabulary, engine.idf, engine.feature_log_prob,
+                                          engine.class_log_prior) if array is not None)
+
+
+def accuracy_report(pipeline, engine, texts, labels):
+    """Compare the compressed engine with the original pipeline on labelled messages"""
+    if [str(c) for c in pipeline.classes_] != [str(c) for c in engine.classes_]:
+        raise ValueError("The compressed model has different classes")
+    before = pipeline.predict_proba(texts)
+    after = engine.predict_proba(texts)
+    labels = np.asarray(labels).astype(str)
+    predicted_before = before.argmax(axis=1)
+    predicted_after = after.argmax(axis=1)
+    accuracy_before = float(np.mean(engine.classes_[predicted_before] == labels))
+    accuracy_after = float(np.mean(engine.classes_[predicted_after] == labels))
+    delta = np.abs(after - before)
+    return {
+        'messages': len(labels),
+        'accuracy_before': round(accuracy_before, 4),
+        'accuracy_after': round(accuracy_after, 4),
+        'accuracy_delta': round(accuracy_after - accuracy_before, 4),
+        'flipped_predictions': int(np.sum(predicted_before != predicted_after)),
+        'max_probability_delta': round(float(delta.max()), 4),
+        'mean_probability_delta': round(float(delta.mean()), 6),
+    }
+
+
+def verification_failures(report, max_accuracy_drop, max_flipped, max_probability_delta, min_messages):
+    """Reasons an accuracy report doesn't pass the compression gate (empty if it does)"""
+    failures = []
+    if report['messages'] < min_messages:
+        failures.append(f"only {report['messages']} evaluation messages (need {min_messages})")
+    if -report['accuracy_delta'] > max_accuracy_drop:
+        failures.append(f"accuracy dropped by {-report['accuracy_delta']:.2%} (max {max_accuracy_drop:.2%})")
+    # Flips in both directions cancel out in the accuracy, so bound them separately
+    flipped = report['flipped_predictions'] / report['messages'] if report['messages'] else 0.0
+    if flipped > max_flipped:
+        failures.append(f"{flipped:.2%} of predictions changed (max {max_flipped:.2%})")
+    if report['max_probability_delta'] > max_probability_delta:
+        failures.append(f"a probability moved by {report['max_probability_delta']:.4f} "
+                        f"(max {max_probability_delta:.4f})")
+    return failures
+
+
+def compress_model(pipeline, path, texts, labels, keep=1.0, min_score=0.0, weights='float16',
+                   max_accuracy_drop=0.005, max_flipped=0.01, max_probability_delta=0.25,
+                   min_messages=MIN_EVAL_MESSAGES):
+    """Export a pruned, reduced-precision compact model to path, if it stays close enough.
+
+    The export is written to a temporary directory and scored against the
+    original pipeline on texts/labels. It is moved into place (replacing
+    any previous export), with the report stored in meta.json under
+    'compression', only if there were at least min_messages to score, and
+    accuracy dropped by at most max_accuracy_drop, at most a max_flipped
+    share of predictions changed and no probability moved by more than
+    max_probability_delta. Returns the report; report['verified'] tells
+    whether it was installed and report['failures'] why not.
+    """
+    sys.path.insert(0, os.path.abspath(DASHBOARD_DIR))
+    from detect_scam import NaiveBayesEngine
+
+    vectorizer, _ = find_steps(pipeline)
+    columns = select_features(pipeline, keep=keep, min_score=min_score)
+    staging = f'{path}.tmp-{os.getpid()}'
+    shutil.rmtree(staging, ignore_errors=True)
+    meta = export_compact_model(pipeline, staging, features=columns, weights=weights)
+    engine = NaiveBayesEngine.from_compact(staging, mmap=False)
+
+    report = {
+        'features_before': len(vectorizer.vocabulary_),
+        'features_after': len(columns),
+        'weights': weights,
+        'memory_bytes_before': pipeline_bytes(pipeline),
+        'memory_bytes_after': compact_bytes(engine),
+        **accuracy_report(pipeline, engine, texts, labels),
+        'max_accuracy_drop': max_accuracy_drop,
+        'max_flipped': max_flipped,
+        'max_probability_delta_allowed': max_probability_delta,
+    }
+    report['failures'] = verification_failures(report, max_accuracy_drop, max_flipped,
+                                               max_probability_delta, min_messages)
+    report['verified'] = not report['failures']
+    if not report['verified']:
+        shutil.rmtree(staging)
+        return report
+
+    meta['compression'] = report
+    with open(os.path.join(staging, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+    previous = f'{path}.old-{os.getpid()}'
+    if os.path.exists(path):
+        os.replace(path, previous)
+    os.replace(staging, path)
+    shutil.rmtree(previous, ignore_errors=True)
+    return report
+
+
+def load_labelled(paths):
+    """(texts, labels) from training CSVs with text and label columns"""
+    df = load_and_clean_data(paths)
+    if df is None:
+        raise ValueError("Could not load evaluation data")
+    return df['text'].values, df['label'].values
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compress a trained model into a smaller compact export")
+    parser.add_argument('model', nargs='?', default='scam_detector_model.joblib')
+    parser.add_argument('--out', default='scam_detector_model.compact', help="Compact export directory to write")
+    parser.add_argument('--data', nargs='+', default=['scam_data.csv'], help="Labelled CSVs to evaluate on")
+    parser.add_argument('--all-data', action='store_true',
+                        help="Evaluate on every row instead of train_model.py's held-out 20%%")
+    parser.add_argument('--keep', type=float, default=1.0, help="Largest share of features to keep (default: 1.0)")
+    parser.add_argument('--min-score', type=float, default=0.01,
+                        help="Drop features whose class spread x IDF is below this (default: 0.01)")
+    parser.add_argument('--weights', choices=WEIGHT_DTYPES, default='float16', help="Weight storage type")
+    parser.add_argument('--max-accuracy-drop', type=float, default=0.005,
+                        help="Refuse the export if accuracy falls by more than this (default: 0.005)")
+    parser.add_argument('--max-flipped', type=float, default=0.01,
+                        help="Refuse it if more than this share of predictions change (default: 0.01)")
+    parser.add_argument('--max-probability-delta', type=float, default=0.25,
+                        help="Refuse it if any class probability moves by more than this (default: 0.25)")
+    parser.add_argument('--min-messages', type=int, default=MIN_EVAL_MESSAGES,
+                        help=f"Refuse to judge on fewer evaluation messages (default: {MIN_EVAL_MESSAGES})")
+    args = parser.parse_args(argv)
+
+    print(f"📦 Compressing {args.model} -> {args.out}")
+    pipeline = joblib.load(args.model)
+    texts, labels = load_labelled(args.data)
+    if not args.all_data:
+        # Same split as train_model.py, so the report is on messages the model never saw
+        _, texts, _, labels = train_test_split(texts, labels, test_size=0.2, random_state=42, stratify=labels)
+
+    report = compress_model(pipeline, args.out, texts, labels, keep=args.keep, min_score=args.min_score,
+                            weights=args.weights, max_accuracy_drop=args.max_accuracy_drop,
+                            max_flipped=args.max_flipped, max_probability_delta=args.max_probability_delta,
+                            min_messages=args.min_messages)
+    print(f"   Features: {report['features_before']} -> {report['features_after']}")
+    print(f"   Model memory: {report['memory_bytes_before'] / 1024:.0f} KB -> "
+          f"{report['memory_bytes_after'] / 1024:.0f} KB ({report['weights']} weights)")
+    print(f"   Accuracy on {report['messages']} messages: {report['accuracy_before']:.2%} -> "
+          f"{report['accuracy_after']:.2%} ({report['flipped_predictions']} predictions changed, "
+          f"max probability change {report['max_probability_delta']:.4f})")
+    if not report['verified']:
+        print(f"❌ Not verified ({'; '.join(report['failures'])}); {args.out} left unchanged")
+        return 1
+    print(f"✅ Compressed model saved as '{args.out}/'")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+# export_compact.py - Export a trained TF-IDF + Naive Bayes pipeline to the compact NumPy format
+import json
+import os
+import sys
+
+import joblib
+import numpy as np
+
+# Must match bot-dashboard/compact_model.py (checked by bot-dashboard/tests/test_model_parity.py)
+FORMAT_NAME = 'scam-detector-compact'
+FORMAT_VERSION = 2
+
+# Storage types for feature_log_prob; uint8 is quantized per class with a scale and offset
+WEIGHT_DTYPES = ('float64', 'float32', 'float16', 'uint8')
+
+
+def find_steps(pipeline):
+    """Return the (vectorizer, classifier) pair from a fitted pipeline"""
+    vectorizer = next((step for _, step in pipeline.steps if hasattr(step, 'vocabulary_')), None)
+    classifier = pipeline.steps[-1][1]
+    if vectorizer is None or not hasattr(classifier, 'feature_log_prob_'):
+        raise ValueError("Pipeline must be a fitted TfidfVectorizer followed by MultinomialNB")
+    return vectorizer, classifier
+
+
+def quantize(values):
+    """uint8 codes per row with the (scale, offset) that map them back: value ~ code * scale + offset"""
+    low = values.min(axis=1)
+    scale = (values.max(axis=1) - low) / 255
+    scale[scale == 0] = 1.0
+    codes = np.rint((values - low[:, None]) / scale[:, None]).astype(np.uint8)
+    return codes, scale, low
+
+
+def export_compact_model(pipeline, path, features=None, weights='float64'):
+    """Write the pipeline's vocabulary and weights as memory-mappable .npy files.
+
+    The vocabulary is stored as a sorted table of UTF-8 strings and every
+    weight column is reordered to match, so the dashboard can look terms
+    up with np.searchsorted instead of rebuilding a Python dict.
+
+    features optionally lists the vocabulary columns to keep (see
+    compress_model.py); the rest are dropped. weights is the storage type
+    of feature_log_prob, one of WEIGHT_DTYPES; below float64 the IDF
+    weights are stored as float32.
+    """
+    if weights not in WEIGHT_DTYPES:
+        raise ValueError(f"weights must be one of {WEIGHT_DTYPES}")
+    vectorizer, classifier = find_steps(pipeline)
+    if vectorizer.analyzer != 'word' or vectorizer.tokenizer or vectorizer.preprocessor \
+            or vectorizer.strip_accents:
+        raise ValueError("Only the default word analyzer can be exported")
+
+    terms = sorted(vectorizer.vocabulary_, key=vectorizer.vocabulary_.get)
+    columns = np.arange(len(terms)) if features is None else np.asarray(features)
+    # UTF-8 byte order is code point order, so this is also sorted as text
+    encoded = np.array([terms[col].encode('utf-8') for col in columns])
+    order = columns[np.argsort(encoded, kind='stable')]
+    vocabulary = np.sort(encoded, kind='stable')
+
+    idf = vectorizer.idf_[order] if vectorizer.use_idf else np.ones(len(order))
+    feature_log_prob = classifier.feature_log_prob_[:, order]
+    weight_info = {'dtype': weights}
+    if weights == 'uint8':
+        feature_log_prob, scale, offset = quantize(feature_log_prob)
+        weight_info.update(scale=scale.tolist(), offset=offset.tolist())
+    else:
+        feature_log_prob = feature_log_prob.astype(weights)
+    if weights != 'float64':
+        idf = idf.astype(np.float32)
+
+    stop_words = vectorizer.get_stop_words()
+    meta = {
+        'format': FORMAT_NAME,
+        'version': FORMAT_VERSION,
+        'classes': [str(c) for c in classifier.classes_],
+        'n_features': len(vocabulary),
+        'lowercase': vectorizer.lowercase,
+        'token_pattern': vectorizer.token_pattern,
+        'ngram_range': list(vectorizer.ngram_range),
+        'stop_words': sorted(stop_words) if stop_words else None,
+        'norm': vectorizer.norm,
+        'use_idf': vectorizer.use_idf,
+        'sublinear_tf': vectorizer.sublinear_tf,
+        'binary': vectorizer.binary,
+        'weights': weight_info,
+    }
+
+    os.makedirs(path, exist_ok=True)
+    np.save(os.path.join(path, 'vocabulary.npy'), vocabulary)
+    np.save(os.path.join(path, 'idf.npy'), np.ascontiguousarray(idf))
+    np.save(os.path.join(path, 'feature_log_prob.npy'), np.ascontiguousarray(feature_log_prob))
+    np.save(os.path.join(path, 'class_log_prior.npy'), classifier.class_log_prior_)
+    with open(os.path.join(path, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+if __name__ == "__main__":
+    source = sys.argv[1] if len(sys.argv) > 1 else 'scam_detector_model.joblib'
+    target = sys.argv[2] if len(sys.argv) > 2 else os.path.splitext(source)[0] + '.compact'
+
+    print(f"📦 Exporting {source} -> {target}")
+    meta = export_compact_model(joblib.load(source), target)
+    print(f"✅ Exported {meta['n_features']} features for classes {meta['classes']}")
@@ -0,0 +1,160 @@
+# messaging_client.py - Pooled, rate-limited clients for sending WhatsApp and SMS replies
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Status codes worth retrying: rate limiting and server-side failures
+RETRY_STATUSES = frozenset((408, 429, 500, 502, 503, 504))
+
+
+class TokenBucket:
+    """Thread-safe token bucket: rate tokens per second, bursts up to capacity"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class SendError(Exception):
+    """A reply could not be delivered; retryable tells whether trying again may help"""
+
+    def __init__(self, message, retryable):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class MessagingClient:
+    """Sends replies through a WhatsApp Cloud API compatible endpoint.
+
+    One requests.Session with a bounded connection pool is shared by all
+    sender threads, so connections are kept alive and reused instead of
+    opening one per message. A token bucket caps the outbound rate below
+    the provider's limit. Transient failures (timeouts, 429, 5xx) are
+    retried with exponential backoff and jitter, honouring Retry-After.
+    Every attempt for one reply carries the same idempotency key, derived
+    from the inbound message id, so a retry after a lost response cannot
+    produce a second reply at an API that deduplicates on it.
+    """
+
+    idempotency_header = 'Idempotency-Key'
+
+    def __init__(self, base_url, phone_number_id, token=None, rate_per_second=50, burst=None,
+                 pool_size=16, timeout=10, max_retries=4, backoff=0.5):
+        self.url = self._endpoint(base_url.rstrip('/'), phone_number_id)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.bucket = TokenBucket(rate_per_second, burst)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        if token:
+            self.session.headers['Authorization'] = f'Bearer {token}'
+        self._stats_lock = threading.Lock()
+        self.sent = 0
+        self.retries = 0
+        self.failed = 0
+
+    def _endpoint(self, base_url, account):
+        return f"{base_url}/{account}/messages"
+
+    def _request(self, to, text, reply_to):
+        """Keyword arguments for session.post() carrying one reply"""
+        payload = {
+            'messaging_product': 'whatsapp',
+            'recipient_type': 'individual',
+            'to': to,
+            'type': 'text',
+            'text': {'body': text}
+        }
+        if reply_to:
+            payload['context'] = {'message_id': reply_to}
+        return {'json': payload}
+
+    def _post(self, request, idempotency_key):
+        self.bucket.acquire()
+        try:
+            response = self.session.post(self.url, timeout=self.timeout,
+                                         headers={self.idempotency_header: idempotency_key}, **request)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            raise SendError(str(e), retryable=True) from None
+        if response.status_code < 300:
+            return response.json() if response.content else {}
+        error = SendError(f"HTTP {response.status_code}: {response.text[:200]}",
+                          retryable=response.status_code in RETRY_STATUSES)
+        error.retry_after = response.headers.get('Retry-After')
+        raise error
+
+    def send(self, to, text, reply_to):
+        """Send one reply to the sender of message reply_to; raises SendError when it gives up"""
+        request = self._request(to, text, reply_to)
+        key = f'reply-{reply_to}'
+        for attempt in range(self.max_retries + 1):
+            try:
+                result = self._post(request, key)
+                self._count('sent')
+                return result
+            except SendError as e:
+                if not e.retryable or attempt == self.max_retries:
+                    self._count('failed')
+                    raise
+                self._count('retries')
+                delay = self.backoff * 2 ** attempt * (0.5 + random.random())
+                retry_after = getattr(e, 'retry_after', None)
+                if retry_after and retry_after.isdigit():
+                    delay = max(delay, int(retry_after))
+                time.sleep(delay)
+
+    def _count(self, name):
+        # Every sender thread shares this client
+        with self._stats_lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def stats(self):
+        with self._stats_lock:
+            return {'sent': self.sent, 'retries': self.retries, 'failed': self.failed,
+                    'rate_per_second': self.bucket.rate}
+
+
+class SmsClient(MessagingClient):
+    """Sends SMS replies through a Twilio compatible Messages API.
+
+    Same pooling, rate limiting and retries as MessagingClient, but each
+    reply is a form post of To/From/Body to the account's Messages.json,
+    authenticated with the account SID and auth token, and carrying
+    Twilio's idempotency header.
+    """
+
+    idempotency_header = 'I-Twilio-Idempotency-Token'
+
+    def __init__(self, base_url, account_sid, from_number, auth_token=None, **options):
+        super().__init__(base_url, account_sid, **options)
+        self.from_number = from_number
+        if auth_token:
+            self.session.auth = (account_sid, auth_token)
+
+    def _endpoint(self, base_url, account):
+        return f"{base_url}/2010-04-01/Accounts/{account}/Messages.json"
+
+    def _request(self, to, text, reply_to):
+        return {'data': {'To': to, 'From': self.from_number, 'Body': text}}
@@ -0,0 +1,106 @@
+# mock_messaging_api.py - Local stand-in for the WhatsApp Cloud API and Twilio SMS send endpoints
+import argparse
+import random
+import threading
+import time
+import uuid
+
+from flask import Flask, jsonify, request
+
+
+def create_app(failure_rate=0.0, throttle_rate=0.0, latency_ms=0.0, seed=None):
+    """Records every sent message; can inject latency, 5xx errors and 429s.
+
+    Requests with an idempotency key seen before get the original response
+    back and are not recorded twice, so tests can check that retries never
+    produce duplicate replies.
+    """
+    app = Flask(__name__)
+    rng = random.Random(seed)
+    lock = threading.Lock()
+    state = {'messages': [], 'responses': {}, 'requests': 0, 'injected_errors': 0, 'throttled': 0}
+
+    def deliver(key, check, record, response):
+        """Shared flow of both send endpoints: replay, injected faults, validation, record"""
+        if latency_ms:
+            time.sleep(latency_ms / 1000.0)
+        with lock:
+            state['requests'] += 1
+            if key in state['responses']:
+                return jsonify(state['responses'][key])
+            roll = rng.random()
+            if roll < throttle_rate:
+                state['throttled'] += 1
+                return jsonify({'error': {'message': 'Rate limit hit', 'code': 130429}}), 429, {'Retry-After': '0'}
+            if roll < throttle_rate + failure_rate:
+                state['injected_errors'] += 1
+                return jsonify({'error': {'message': 'Temporary failure', 'code': 2}}), 503
+
+            error = check()
+            if error:
+                return jsonify({'error': {'message': error, 'code': 100}}), 400
+            state['messages'].append({'key': key, **record})
+            if key:
+                state['responses'][key] = response
+            return jsonify(response)
+
+    @app.route('/<phone_number_id>/messages', methods=['POST'])
+    def send_message(phone_number_id):
+        payload = request.get_json(silent=True) or {}
+        return deliver(
+            request.headers.get('Idempotency-Key'),
+            lambda: None if payload.get('to') and (payload.get('text') or {}).get('body')
+            else 'to and text.body are required',
+            {'phone_number_id': phone_number_id, **payload},
+            {'messaging_product': payload.get('messaging_product'),
+             'messages': [{'id': f'wamid.{uuid.uuid4().hex}'}]}
+        )
+
+    @app.route('/2010-04-01/Accounts/<account_sid>/Messages.json', methods=['POST'])
+    def send_sms(account_sid):
+        """Twilio Messages API: form post of To, From and Body"""
+        form = request.form.to_dict()
+        sid = f'SM{uuid.uuid4().hex}'
+        return deliver(
+            request.headers.get('I-Twilio-Idempotency-Token'),
+            lambda: None if form.get('To') and form.get('From') and form.get('Body')
+            else 'To, From and Body are required',
+            {'account_sid': account_sid, 'messaging_product': 'sms', **form},
+            {'sid': sid, 'to': form.get('To'), 'from': form.get('From'), 'status': 'queued'}
+        )
+
+    @app.route('/sent')
+    def sent():
+        with lock:
+            return jsonify({
+                'count': len(state['messages']),
+                'requests': state['requests'],
+                'injected_errors': state['injected_errors'],
+                'throttled': state['throttled'],
+                'messages': state['messages'][-request.args.get('limit', 50, type=int):]
+            })
+
+    @app.route('/sent', methods=['DELETE'])
+    def reset():
+        with lock:
+            state.update(messages=[], responses={}, requests=0, injected_errors=0, throttled=0)
+        return jsonify({'cleared': True})
+
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local mock of the WhatsApp and SMS send endpoints")
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="Share of requests answered with 503")
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help="Share of requests answered with 429")
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="Added delay per request")
+    args = parser.parse_args(argv)
+
+    app = create_app(args.failure_rate, args.throttle_rate, args.latency_ms)
+    print(f"🧪 Mock messaging API on http://127.0.0.1:{args.port} (GET /sent to inspect)")
+    app.run(host='127.0.0.1', port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+# stream_loader.py - Out-of-core loader for sharded CSV/JSONL training data
+import csv
+import glob
+import gzip
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import numpy as np
+
+DATA_EXTENSIONS = ('.csv', '.jsonl', '.csv.gz', '.jsonl.gz')
+DEDUP_MODES = ('normalized', 'exact', None)
+
+WHITESPACE = re.compile(r'\s+')
+
+_worker_features = None
+
+
+def expand_shards(paths):
+    """Resolve files, directories and glob patterns into a sorted list of shards"""
+    shards = []
+    for path in paths:
+        if os.path.isdir(path):
+            shards.extend(os.path.join(path, name) for name in sorted(os.listdir(path))
+                          if name.endswith(DATA_EXTENSIONS))
+        elif glob.has_magic(path):
+            shards.extend(sorted(glob.glob(path)))
+        else:
+            shards.append(path)
+    return shards
+
+
+def open_shard(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, encoding='utf-8', newline='')
+
+
+def read_raw_chunks(path, chunk_size):
+    """Yield raw chunks from one shard without parsing more than needed.
+
+    CSV rows are split by the csv module (quoted fields may span lines);
+    JSONL chunks are left as unparsed lines for the workers to decode.
+    """
+    fmt = 'jsonl' if '.jsonl' in os.path.basename(path) else 'csv'
+    with open_shard(path) as f:
+        rows = csv.DictReader(f) if fmt == 'csv' else f
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                return
+            yield fmt, chunk
+
+
+def normalize_text(text):
+    """Key used for normalized dedup: case and whitespace are ignored"""
+    return WHITESPACE.sub(' ', text.lower()).strip()
+
+
+def text_key(text, dedup):
+    """64-bit digest of a message for the duplicate filter"""
+    if dedup == 'normalized':
+        text = normalize_text(text)
+    digest = hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+
+def clean_chunk(fmt, chunk, text_field='text', label_field='label', labels=None, dedup='normalized'):
+    """Parse and clean one raw chunk.
+
+    Same rules as train_model.load_and_clean_data: rows with a missing or
+    blank text or label are dropped, and labels are stripped and
+    lowercased. Returns (texts, labels, keys, dropped).
+    """
+    texts, out_labels, keys = [], [], []
+    dropped = 0
+    for row in chunk:
+        if fmt == 'jsonl':
+            row = row.strip()
+            if not row:
+                continue
+            try:
+                row = json.loads(row)
+            except ValueError:
+                dropped += 1
+                continue
+        text = row.get(text_field)
+        label = row.get(label_field)
+        if not isinstance(text, str) or not text.strip() or label is None:
+            dropped += 1
+            continue
+        label = str(label).strip().lower()
+        if not label or (labels and label not in labels):
+            dropped += 1
+            continue
+        texts.append(text.strip())
+        out_labels.append(label)
+        if dedup:
+            keys.append(text_key(texts[-1], dedup))
+    return texts, out_labels, np.array(keys, dtype=np.uint64), dropped
+
+
+def _init_worker(features):
+    global _worker_features
+    _worker_features = features
+
+
+def _process_chunk(fmt, chunk, options):
+    texts, labels, keys, dropped = clean_chunk(fmt, chunk, **options)
+    matrix = _worker_features.transform(texts) if _worker_features is not None and texts else None
+    return texts, labels, keys, dropped, matrix
+
+
+class DigestSet:
+    """Set of 64-bit message digests kept as a few sorted NumPy runs.
+
+    Each entry costs 8 bytes, against roughly 70 for an int in a Python
+    set. New digests form a run; runs of similar size are merged, so there
+    are only O(log n) runs to binary-search per lookup.
+    """
+
+    def __init__(self):
+        self._runs = []
+
+    def __len__(self):
+        return sum(len(run) for run in self._runs)
+
+    @property
+    def nbytes(self):
+        return sum(run.nbytes for run in self._runs)
+
+    def __contains__(self, key):
+        return bool(self._seen(np.array([key], dtype=np.uint64))[0])
+
+    def _seen(self, keys):
+        seen = np.zeros(len(keys), dtype=bool)
+        for run in self._runs:
+            positions = np.searchsorted(run, keys)
+            positions[positions == len(run)] = 0
+            seen |= run[positions] == keys
+        return seen
+
+    def add_new(self, keys):
+        """Add keys and return a mask of the ones not seen before.
+
+        Repeats within keys count as duplicates too; only the first
+        occurrence is marked new.
+        """
+        keys = np.asarray(keys, dtype=np.uint64)
+        mask = np.zeros(len(keys), dtype=bool)
+        if not len(keys):
+            return mask
+
+        unique, first = np.unique(keys, return_index=True)
+        new = ~self._seen(unique)
+        mask[first[new]] = True
+
+        run = unique[new]
+        while self._runs and len(self._runs[-1]) <= 2 * len(run):
+            run = np.union1d(self._runs.pop(), run)
+        if len(run):
+            self._runs.append(run)
+        return mask
+
+
+class StreamLoader:
+    """Stream cleaned, deduplicated (texts, labels, features) mini-batches from shards.
+
+    Shards are read chunk by chunk in this process; JSON decoding,
+    cleaning, hashing for the duplicate filter and - if features is given
+    - vectorizing happen in worker processes. features must be a picklable
+    object with a stateless transform() (a HashingVectorizer, or a fitted
+    hashing + TF-IDF pipeline); it is sent to each worker once. At most two
+    chunks per worker are in flight and output order matches input order.
+
+    Every iteration starts a fresh duplicate filter, so repeated passes
+    over the same shards yield the same rows. Counts from the last pass
+    are kept in stats.
+    """
+
+    def __init__(self, paths, chunk_size=10000, workers=1, dedup='normalized', features=None,
+                 text_field='text', label_field='label', labels=None):
+        if dedup not in DEDUP_MODES:
+            raise ValueError(f"dedup must be one of {DEDUP_MODES}")
+        self.shards = expand_shards(paths)
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.dedup = dedup
+        self.features = features
+        self.options = {
+            'text_field': text_field,
+            'label_field': label_field,
+            'labels': set(labels) if labels is not None else None,
+            'dedup': dedup,
+        }
+        self.stats = {}
+
+    def _raw_chunks(self):
+        for path in self.shards:
+            yield from read_raw_chunks(path, self.chunk_size)
+
+    def _processed(self):
+        if self.workers <= 1:
+            _init_worker(self.features)
+            for fmt, chunk in self._raw_chunks():
+                yield _process_chunk(fmt, chunk, self.options)
+            return
+
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                 initargs=(self.features,)) as pool:
+            in_flight = []
+            for fmt, chunk in self._raw_chunks():
+                in_flight.append(pool.submit(_process_chunk, fmt, chunk, self.options))
+                if len(in_flight) >= self.workers * 2:
+                    yield in_flight.pop(0).result()
+            for future in in_flight:
+                yield future.result()
+
+    def __iter__(self):
+        digests = DigestSet()
+        stats = self.stats = {'shards': len(self.shards), 'rows': 0, 'dropped': 0,
+                              'duplicates': 0, 'kept': 0}
+
+        for texts, labels, keys, dropped, matrix in self._processed():
+            stats['rows'] += len(texts) + dropped
+            stats['dropped'] += dropped
+            if self.dedup and len(texts):
+                mask = digests.add_new(keys)
+                if not mask.all():
+                    stats['duplicates'] += int((~mask).sum())
+                    texts = [t for t, keep in zip(texts, mask) if keep]
+                    labels = [l for l, keep in zip(labels, mask) if keep]
+                    if matrix is not None:
+                        matrix = matrix[mask]
+            if not texts:
+                continue
+            stats['kept'] += len(texts)
+            yield texts, labels, matrix
+
+        stats['digest_bytes'] = digests.nbytes
@@ -5,6 +5,7 @@ from sklearn.naive_bayes import MultinomialNB
 from sklearn.pipeline import Pipeline
 import joblib
 import os
+from export_compact import export_compact_model
 
 print("=" * 60)
 print("🚀 FINAL VERSION - Scam Detection Model Training")
@@ -89,11 +90,15 @@ vectorizer = model.named_steps['tfidf']
 joblib.dump(vectorizer, 'vectorizer.joblib')
 print("✅ Vectorizer saved as 'vectorizer.joblib'")
 
+# Step 9: Compact NumPy export for fast dashboard startup
+export_compact_model(model, 'scam_detector_model.compact')
+print("✅ Compact model saved as 'scam_detector_model.compact/'")
+
 print("\n" + "=" * 60)
 print("🎉 SUCCESS! Model is ready to use!")
 print("=" * 60)
 
-# Step 9: Quick test with your own message
+# Step 10: Quick test with your own message
 print("\n📝 Quick Test:")
 test_msg = input("Enter a message to test (or press Enter to skip): ")
 if test_msg:
@@ -0,0 +1,166 @@
+# train_hashing.py - Out-of-core training with feature hashing and a streaming IDF
+import argparse
+import hashlib
+import os
+import sys
+
+import joblib
+import numpy as np
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfTransformer
+from sklearn.naive_bayes import MultinomialNB
+from sklearn.pipeline import Pipeline
+
+from stream_loader import StreamLoader, expand_shards
+
+CLASSES = np.array(['not_scam', 'scam'])
+
+
+def is_holdout(text, test_percent):
+    """Deterministic train/test split by message hash, so it works on a stream"""
+    digest = hashlib.blake2b(text.encode('utf-8'), digest_size=2).digest()
+    return int.from_bytes(digest, 'little') % 100 < test_percent
+
+
+def make_hasher(n_features, ngram_range):
+    # Raw counts without sign flipping, so TF-IDF and Naive Bayes see non-negative values
+    return HashingVectorizer(
+        n_features=n_features,
+        lowercase=True,
+        stop_words='english',
+        ngram_range=ngram_range,
+        alternate_sign=False,
+        norm=None
+    )
+
+
+def estimate_idf(batches, n_features, max_docs=None):
+    """Compute smoothed IDF weights from document frequencies, one batch at a time.
+
+    batches yields (texts, labels, counts) with hashed term counts. Only a
+    dense df counter of n_features integers is kept in memory. With
+    max_docs set, the estimate stops after that many documents.
+    """
+    df = np.zeros(n_features, dtype=np.int64)
+    n_docs = 0
+    for _, _, counts in batches:
+        df += np.bincount(counts.indices, minlength=n_features)
+        n_docs += counts.shape[0]
+        if max_docs and n_docs >= max_docs:
+            break
+    # Same smoothing as TfidfVectorizer(smooth_idf=True)
+    idf = np.log((1 + n_docs) / (1 + df)) + 1
+    return idf, n_docs
+
+
+def make_tfidf(idf):
+    """A TfidfTransformer using precomputed IDF weights"""
+    transformer = TfidfTransformer(norm='l2', use_idf=True, smooth_idf=True)
+    transformer.idf_ = idf
+    transformer.n_features_in_ = len(idf)
+    return transformer
+
+
+def train(paths, n_features=2 ** 20, ngram_range=(1, 2), chunk_size=10000, alpha=1.0,
+          idf_sample=None, test_percent=10, workers=1, dedup='normalized'):
+    """Stream the data three times: estimate IDF, partial_fit Naive Bayes, evaluate.
+
+    Memory use depends on n_features and chunk_size, not on corpus size.
+    Cleaning, dedup hashing and vectorizing run in the loader's workers.
+    """
+    hasher = make_hasher(n_features, ngram_range)
+
+    def stream(features):
+        return StreamLoader(paths, chunk_size=chunk_size, workers=workers, dedup=dedup,
+                            features=features, labels=CLASSES)
+
+    print("\n📊 Pass 1: estimating IDF...")
+    loader = stream(hasher)
+    idf, idf_docs = estimate_idf(loader, n_features, idf_sample)
+    print(f"✅ IDF from {idf_docs} documents")
+    if not idf_sample:
+        print(f"   {loader.stats['duplicates']} duplicates and {loader.stats['dropped']} "
+              f"invalid rows skipped")
+
+    tfidf = make_tfidf(idf)
+    classifier = MultinomialNB(alpha=alpha)
+    features = Pipeline([('hashing', hasher), ('tfidf', tfidf)])
+
+    print("\n🎓 Pass 2: training...")
+    trained = 0
+    for texts, labels, matrix in stream(features):
+        keep = [i for i, t in enumerate(texts) if not is_holdout(t, test_percent)]
+        if keep:
+            classifier.partial_fit(matrix[keep], [labels[i] for i in keep], classes=CLASSES)
+            trained += len(keep)
+            print(f"   {trained} training examples so far")
+
+    if not trained:
+        raise ValueError("No usable training examples found")
+
+    model = Pipeline([
+        ('hashing', hasher),
+        ('tfidf', tfidf),
+        ('classifier', classifier)
+    ])
+
+    print("\n📈 Pass 3: evaluating on held-out examples...")
+    correct = tested = 0
+    for texts, labels, matrix in stream(features):
+        held = [i for i, t in enumerate(texts) if is_holdout(t, test_percent)]
+        if held:
+            predicted = classifier.predict(matrix[held])
+            correct += int((predicted == np.array([labels[i] for i in held])).sum())
+            tested += len(held)
+
+    accuracy = correct / tested if tested else None
+    return model, {'trained': trained, 'tested': tested, 'accuracy': accuracy, 'idf_docs': idf_docs}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the scam model with feature hashing")
+    parser.add_argument('inputs', nargs='*', default=['scam_data.csv'],
+                        help="CSV/JSONL shards, directories or glob patterns")
+    parser.add_argument('-o', '--output', default='scam_detector_model_hashing.joblib')
+    parser.add_argument('--n-features', type=int, default=2 ** 20, help="Hash buckets (default: 2^20)")
+    parser.add_argument('--ngram-max', type=int, default=2, help="Largest n-gram size (default: 2)")
+    parser.add_argument('--chunk-size', type=int, default=10000, help="Rows per mini-batch")
+    parser.add_argument('--alpha', type=float, default=1.0, help="Naive Bayes smoothing")
+    parser.add_argument('--idf-sample', type=int, default=None,
+                        help="Estimate IDF from only the first N documents")
+    parser.add_argument('--test-percent', type=int, default=10, help="Held-out share for evaluation")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Loader worker processes, 0 for one per core (default: 1)")
+    parser.add_argument('--dedup', choices=['normalized', 'exact', 'none'], default='normalized',
+                        help="Drop repeated messages (default: ignoring case and whitespace)")
+    args = parser.parse_args(argv)
+
+    print("=" * 50)
+    print("🚀 Scam Detection Model Training (feature hashing)")
+    print("=" * 50)
+
+    shards = expand_shards(args.inputs)
+    missing = [p for p in shards if not os.path.exists(p)]
+    if not shards or missing:
+        print(f"❌ ERROR: input not found: {', '.join(missing or args.inputs)}")
+        return False
+    print(f"📂 {len(shards)} input shard(s)")
+
+    workers = args.workers if args.workers > 0 else os.cpu_count()
+    dedup = None if args.dedup == 'none' else args.dedup
+    model, report = train(shards, args.n_features, (1, args.ngram_max), args.chunk_size,
+                          args.alpha, args.idf_sample, args.test_percent, workers, dedup)
+
+    if report['accuracy'] is not None:
+        print(f"\n🎯 Held-out accuracy: {report['accuracy']:.2%} on {report['tested']} examples")
+    else:
+        print("\n⚠️  Not enough data for a held-out evaluation")
+
+    joblib.dump(model, args.output)
+    print(f"\n💾 Model saved as '{args.output}'")
+    print("   Load it with ScamDetector(model_path=...) - same interface as the TF-IDF model")
+    return True
+
+
+if __name__ == "__main__":
+    if not main():
+        sys.exit(1)
@@ -8,6 +8,8 @@ from sklearn.metrics import accuracy_score, classification_report
 import joblib
 import os
 import sys
+from export_compact import export_compact_model
+from stream_loader import StreamLoader
 
 def check_data_file():
     """Check if data file exists and has content"""
@@ -23,24 +25,21 @@ def check_data_file():
     
     return True
 
-def load_and_clean_data():
+def load_and_clean_data(paths=('scam_data.csv',), workers=1):
     """Load and clean the training data"""
     try:
-        # Load data with explicit encoding
-        df = pd.read_csv('scam_data.csv', encoding='utf-8')
+        # Stream the shards in chunks; duplicates (ignoring case/whitespace) are skipped
+        loader = StreamLoader(list(paths), workers=workers)
+        texts, labels = [], []
+        for chunk_texts, chunk_labels, _ in loader:
+            texts.extend(chunk_texts)
+            labels.extend(chunk_labels)
+        df = pd.DataFrame({'text': texts, 'label': labels})
         
-        # Remove any rows with NaN values
-        initial_rows = len(df)
-        df = df.dropna()
-        
-        if len(df) < initial_rows:
-            print(f"⚠️  Removed {initial_rows - len(df)} rows with missing values")
-        
-        # Remove any empty strings
-        df = df[df['text'].str.strip() != '']
-        
-        # Convert labels to strings and strip whitespace
-        df['label'] = df['label'].str.strip().str.lower()
+        if loader.stats['dropped']:
+            print(f"⚠️  Removed {loader.stats['dropped']} rows with missing values")
+        if loader.stats['duplicates']:
+            print(f"⚠️  Removed {loader.stats['duplicates']} duplicate messages")
         
         # Verify we have both classes
         unique_labels = df['label'].unique()
@@ -148,6 +147,11 @@ def train_model():
     joblib.dump(vectorizer, 'vectorizer.joblib')
     print("✅ Vectorizer saved as 'vectorizer.joblib'")
     
+    # Compact NumPy export for fast dashboard startup (no unpickling)
+    export_compact_model(model_pipeline, 'scam_detector_model.compact')
+    print("✅ Compact model saved as 'scam_detector_model.compact/'")
+    print("💡 For a smaller serving model run: python compress_model.py (prunes features, narrows weights)")
+    
     print("\n" + "=" * 50)
     print("🎉 Training complete! Your AI model is ready.")
     print("=" * 50)
@@ -0,0 +1,243 @@
+# tune_model.py - Parallel cross-validated hyperparameter search for the scam model
+import argparse
+import itertools
+import json
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import joblib
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics import accuracy_score, f1_score
+from sklearn.model_selection import StratifiedKFold
+from sklearn.naive_bayes import MultinomialNB
+from sklearn.pipeline import Pipeline
+
+from export_compact import export_compact_model
+from train_model import check_data_file, load_and_clean_data
+
+# Vectorizer settings: every combination is tokenized once per fold
+VECTORIZER_GRID = {
+    'max_features': [1000, 5000, None],
+    'ngram_range': [(1, 1), (1, 2)],
+    'sublinear_tf': [False, True],
+}
+
+# Classifier settings: all of these reuse the cached fold matrices
+CLASSIFIER_GRID = {
+    'alpha': [0.1, 0.5, 1.0],
+    'fit_prior': [True, False],
+}
+
+LATENCY_SAMPLES = 200
+
+# Candidates timed for the latency tie-break, after the search and one at a time
+LATENCY_CANDIDATES = 5
+
+# The inference engine the dashboard serves with lives there
+DASHBOARD_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'bot-dashboard')
+
+
+def expand(grid):
+    """All combinations of a parameter grid as a list of dicts"""
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def make_vectorizer(params):
+    return TfidfVectorizer(lowercase=True, stop_words='english', **params)
+
+
+def _vectorize_fold(vec_params, X, train_idx, test_idx):
+    """Fit the vectorizer on one training fold and transform both sides"""
+    vectorizer = make_vectorizer(vec_params)
+    X_train = vectorizer.fit_transform(X[train_idx])
+    X_test = vectorizer.transform(X[test_idx])
+    return vectorizer, X_train, X_test
+
+
+def _single_message_latency(pipeline, messages):
+    """Median seconds per single-message predict_proba call, on what the dashboard would serve.
+
+    That is the NumPy NaiveBayesEngine built from the pipeline, or the
+    pipeline itself for settings the engine doesn't cover.
+    """
+    if os.path.abspath(DASHBOARD_DIR) not in sys.path:
+        sys.path.insert(0, os.path.abspath(DASHBOARD_DIR))
+    from detect_scam import NaiveBayesEngine
+
+    try:
+        model = NaiveBayesEngine.from_pipeline(pipeline)
+    except Exception:
+        model = pipeline
+    model.predict_proba(messages[:1])
+    timings = []
+    for message in messages:
+        start = time.perf_counter()
+        model.predict_proba([message])
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def evaluate_vectorizer(vec_index, vec_params, clf_grid, X, y, folds, cache_dir=None):
+    """Score every classifier setting for one vectorizer setting across all folds.
+
+    The vectorizer is fitted once per fold (optionally cached on disk with
+    joblib.Memory), and every classifier variant reuses those matrices.
+    """
+    vectorize = _vectorize_fold
+    if cache_dir:
+        vectorize = joblib.Memory(cache_dir, verbose=0).cache(_vectorize_fold)
+
+    rows = []
+    for fold, (train_idx, test_idx) in enumerate(folds):
+        vectorizer, X_train, X_test = vectorize(vec_params, X, train_idx, test_idx)
+        for clf_index, clf_params in enumerate(clf_grid):
+            classifier = MultinomialNB(**clf_params).fit(X_train, y[train_idx])
+            predicted = classifier.predict(X_test)
+            rows.append({
+                'candidate': f'v{vec_index}-c{clf_index}',
+                'fold': fold,
+                'accuracy': accuracy_score(y[test_idx], predicted),
+                'f1_scam': f1_score(y[test_idx], predicted, pos_label='scam', zero_division=0),
+                'n_features': len(vectorizer.vocabulary_),
+            })
+    return vec_index, rows
+
+
+def build_leaderboard(rows, vec_grid, clf_grid):
+    """Average fold results per candidate and rank by accuracy (latency is filled in later)"""
+    by_candidate = {}
+    for row in rows:
+        by_candidate.setdefault(row['candidate'], []).append(row)
+
+    leaderboard = []
+    for candidate, fold_rows in by_candidate.items():
+        vec_index, clf_index = (int(part[1:]) for part in candidate.split('-'))
+        accuracies = [r['accuracy'] for r in fold_rows]
+        leaderboard.append({
+            'candidate': candidate,
+            'vectorizer': vec_grid[vec_index],
+            'classifier': clf_grid[clf_index],
+            'accuracy_mean': round(statistics.mean(accuracies), 4),
+            'accuracy_std': round(statistics.pstdev(accuracies), 4),
+            'f1_scam_mean': round(statistics.mean(r['f1_scam'] for r in fold_rows), 4),
+            'latency_us_p50': None,
+            'n_features': int(statistics.mean(r['n_features'] for r in fold_rows)),
+        })
+    rank_leaderboard(leaderboard)
+    return leaderboard
+
+
+def rank_leaderboard(leaderboard):
+    """Sort by accuracy, breaking ties by measured latency (untimed candidates last)"""
+    leaderboard.sort(key=lambda e: (-e['accuracy_mean'], e['latency_us_p50'] is None, e['latency_us_p50'] or 0))
+    for rank, entry in enumerate(leaderboard, 1):
+        entry['rank'] = rank
+
+
+def time_top_candidates(leaderboard, X, y, count=LATENCY_CANDIDATES):
+    """Refit the top count candidates on all data and time them one at a time.
+
+    Timing inside the search workers would measure CPU contention between
+    them, so this runs after the pool has finished. Fills in latency_us_p50,
+    re-ranks, and returns the refit pipelines by candidate.
+    """
+    sample = list(X[:LATENCY_SAMPLES])
+    pipelines = {}
+    for entry in leaderboard[:count]:
+        pipeline = Pipeline([
+            ('vectorizer', make_vectorizer(entry['vectorizer'])),
+            ('classifier', MultinomialNB(**entry['classifier']))
+        ]).fit(X, y)
+        entry['latency_us_p50'] = round(_single_message_latency(pipeline, sample) * 1e6, 1)
+        pipelines[entry['candidate']] = pipeline
+    rank_leaderboard(leaderboard)
+    return pipelines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cross-validated grid search for the scam model")
+    parser.add_argument('--folds', type=int, default=5, help="Stratified folds (default: 5)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Worker processes")
+    parser.add_argument('--cache-dir', default=None,
+                        help="Cache fold matrices on disk so re-runs skip tokenization")
+    parser.add_argument('--top', type=int, default=10, help="Rows of the leaderboard to print")
+    parser.add_argument('--latency-top', type=int, default=LATENCY_CANDIDATES,
+                        help=f"Best candidates to time for the latency tie-break (default: {LATENCY_CANDIDATES})")
+    parser.add_argument('-o', '--output', default='tuning_leaderboard.json')
+    parser.add_argument('--save-best', action='store_true',
+                        help="Refit the winner on all data and save it as the model")
+    args = parser.parse_args(argv)
+
+    print("=" * 60)
+    print("🔬 Scam Detection Model Tuning")
+    print("=" * 60)
+
+    if not check_data_file():
+        return False
+    df = load_and_clean_data()
+    if df is None:
+        return False
+
+    X = df['text'].values
+    y = df['label'].values
+    folds = list(StratifiedKFold(n_splits=args.folds, shuffle=True, random_state=42).split(X, y))
+
+    vec_grid = expand(VECTORIZER_GRID)
+    clf_grid = expand(CLASSIFIER_GRID)
+    print(f"\n📊 {len(X)} examples, {args.folds} folds")
+    print(f"🧮 {len(vec_grid)} vectorizer x {len(clf_grid)} classifier settings "
+          f"= {len(vec_grid) * len(clf_grid)} candidates on {args.workers} workers")
+
+    start = time.perf_counter()
+    rows = []
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = [
+            pool.submit(evaluate_vectorizer, i, params, clf_grid, X, y, folds, args.cache_dir)
+            for i, params in enumerate(vec_grid)
+        ]
+        for done, future in enumerate(as_completed(futures), 1):
+            vec_index, vec_rows = future.result()
+            rows.extend(vec_rows)
+            print(f"   ✅ vectorizer {done}/{len(vec_grid)} done")
+    elapsed = time.perf_counter() - start
+
+    leaderboard = build_leaderboard(rows, vec_grid, clf_grid)
+    print(f"\n⏱️  Timing the top {min(args.latency_top, len(leaderboard))} candidates...")
+    pipelines = time_top_candidates(leaderboard, X, y, args.latency_top)
+
+    print(f"\n🏆 Leaderboard (search took {elapsed:.1f}s):")
+    print(f"{'rank':>4}  {'accuracy':>14}  {'f1 scam':>7}  {'latency':>10}  {'features':>8}  settings")
+    for entry in leaderboard[:args.top]:
+        settings = {**entry['vectorizer'], **entry['classifier']}
+        latency = '-' if entry['latency_us_p50'] is None else f"{entry['latency_us_p50']:.0f}us"
+        print(f"{entry['rank']:>4}  {entry['accuracy_mean']:>7.2%} ±{entry['accuracy_std']:<6.2%}"
+              f"{entry['f1_scam_mean']:>7.3f}  {latency:>10}  "
+              f"{entry['n_features']:>8}  {settings}")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({'folds': args.folds, 'examples': len(X), 'elapsed_seconds': round(elapsed, 2),
+                   'leaderboard': leaderboard}, f, indent=2, default=list)
+    print(f"\n💾 Leaderboard saved to '{args.output}'")
+
+    if args.save_best:
+        best = leaderboard[0]
+        model = pipelines.get(best['candidate'])
+        if model is None:
+            model = Pipeline([
+                ('vectorizer', make_vectorizer(best['vectorizer'])),
+                ('classifier', MultinomialNB(**best['classifier']))
+            ]).fit(X, y)
+        joblib.dump(model, 'scam_detector_model.joblib')
+        export_compact_model(model, 'scam_detector_model.compact')
+        print(f"✅ Best candidate {best['candidate']} saved as 'scam_detector_model.joblib'")
+
+    return True
+
+
+if __name__ == "__main__":
+    if not main():
+        sys.exit(1)
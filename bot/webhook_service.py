@@ -0,0 +1,335 @@
+# webhook_service.py - WhatsApp/SMS webhook ingestion: ack now, score in batches, reply in the background
+import argparse
+import hashlib
+import hmac
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from flask import Flask, abort, jsonify, request
+
+from messaging_client import MessagingClient, SendError, SmsClient
+
+# The detector lives with the dashboard
+DASHBOARD_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'bot-dashboard')
+
+logger = logging.getLogger(__name__)
+
+RISK_ICONS = {'critical': '🚨', 'high': '⚠️', 'medium': '⚠️', 'low': '✅'}
+
+
+def parse_whatsapp(payload):
+    """(message id, sender, text) for each text message in a WhatsApp Cloud API webhook"""
+    for entry in payload.get('entry') or ():
+        for change in entry.get('changes') or ():
+            for message in (change.get('value') or {}).get('messages') or ():
+                body = (message.get('text') or {}).get('body')
+                if message.get('type') == 'text' and message.get('id') and body:
+                    yield message['id'], message.get('from'), body
+
+
+def format_reply(result):
+    """Short verdict text for a chat reply"""
+    if 'error' in result:
+        return "Sorry, we couldn't analyze that message."
+    lines = [f"{RISK_ICONS.get(result['risk_level'], '')} Risk: {result['risk_level'].upper()} "
+             f"({result['risk_score']}%)", result['summary']]
+    for finding in result['scam_indicators'][:3]:
+        lines.append(f"• {finding['type']}: {finding['explanation']}")
+    return '\n'.join(lines)
+
+
+class MessageLedger:
+    """Bounded, TTL'd record of message ids and how far each one got.
+
+    Providers redeliver webhooks they think failed, so the same message id
+    can arrive several times; only the first claim is processed. A claim
+    is released again if the message could not be queued, and an id whose
+    reply failed can be claimed again, so the provider's redelivery gets
+    another try.
+    """
+
+    def __init__(self, max_size=200000, ttl=86400):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def claim(self, message_id):
+        """True if this id is new or its reply failed (and now claimed), False for a duplicate"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(message_id)
+            if entry is not None and now - entry[1] < self.ttl and entry[0] != 'failed':
+                return False
+            self._entries[message_id] = ['queued', now]
+            self._entries.move_to_end(message_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            return True
+
+    def release(self, message_id):
+        with self._lock:
+            self._entries.pop(message_id, None)
+
+    def mark(self, message_id, state):
+        with self._lock:
+            entry = self._entries.get(message_id)
+            if entry is not None:
+                entry[0] = state
+
+    def state(self, message_id):
+        with self._lock:
+            entry = self._entries.get(message_id)
+            return entry[0] if entry else None
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class WebhookService:
+    """Webhook receiver with batched scoring and pooled outbound replies.
+
+    The webhook handler only parses the payload, drops duplicate message
+    ids and puts new messages on a bounded queue before returning 200, so
+    the provider never waits on the model or on our replies. When the
+    queue is full it answers 503 and the provider retries later.
+
+    One scoring thread takes up to batch_size queued messages (waiting at
+    most max_wait_ms) and runs them through ScamDetector.analyze_many()
+    in a single call. Replies go to a second queue drained by
+    sender_threads threads that share one client per channel: client for
+    WhatsApp and sms_client (an SmsClient) for SMS. Like the dashboard's
+    background threads, they start lazily per process.
+
+    The clients retry transient failures with backoff; a reply that still
+    fails is marked 'failed' in the ledger and counted in reply_failures,
+    but not retried here, since the webhook was already acknowledged. The
+    only later retry is the provider redelivering the message, which the
+    ledger then accepts again.
+    """
+
+    def __init__(self, detector, client, batch_size=64, max_wait_ms=20, max_queue=10000,
+                 sender_threads=8, ledger=None, sms_client=None):
+        self.detector = detector
+        self.client = client
+        self.sms_client = sms_client
+        self.clients = {'whatsapp': client, 'sms': sms_client}
+        self.batch_size = batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_queue = max_queue
+        self.sender_threads = sender_threads
+        self.ledger = ledger or MessageLedger()
+        self._inbound = queue.Queue(max_queue)
+        self._outbound = queue.Queue()
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._pid = None
+        self.counts = Counter()
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def ensure_started(self):
+        # Threads don't survive fork, so a preloaded app starts them per worker
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._inbound = queue.Queue(self.max_queue)
+                self._outbound = queue.Queue()
+                threading.Thread(target=self._score_loop, name='webhook-scorer', daemon=True).start()
+                for i in range(self.sender_threads):
+                    threading.Thread(target=self._send_loop, name=f'webhook-sender-{i}', daemon=True).start()
+                self._pid = os.getpid()
+
+    def accept(self, channel, message_id, sender, text):
+        """Queue one inbound message; returns 'queued', 'duplicate' or 'busy'"""
+        if self.clients.get(channel) is None:
+            raise ValueError(f"No client configured for {channel} replies")
+        self.ensure_started()
+        if not self.ledger.claim(message_id):
+            self._count('duplicates')
+            return 'duplicate'
+        try:
+            self._inbound.put_nowait((time.monotonic(), channel, message_id, sender, text))
+        except queue.Full:
+            self.ledger.release(message_id)
+            self._count('busy')
+            return 'busy'
+        self._count('received')
+        return 'queued'
+
+    def _count(self, name, n=1):
+        # Request threads, the scorer and the senders all update the counts
+        with self._stats_lock:
+            self.counts[name] += n
+
+    def _collect(self):
+        batch = [self._inbound.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._inbound.get(timeout=remaining) if remaining > 0 else self._inbound.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _score_loop(self):
+        while True:
+            batch = self._collect()
+            try:
+                results = self.detector.analyze_many([item[4] for item in batch])
+            except Exception as e:
+                logger.warning("Scoring %d webhook messages failed: %s", len(batch), e)
+                results = [{'error': str(e)}] * len(batch)
+            self._count('batches')
+            self._count('scored', len(batch))
+            for item, result in zip(batch, results):
+                self.ledger.mark(item[2], 'scored')
+                self._outbound.put((item, result))
+
+    def _send_loop(self):
+        while True:
+            (received, channel, message_id, sender, _), result = self._outbound.get()
+            try:
+                self.clients[channel].send(sender, format_reply(result), reply_to=message_id)
+            except SendError as e:
+                self.ledger.mark(message_id, 'failed')
+                self._count('reply_failures')
+                logger.warning("Reply to %s failed: %s", message_id, e)
+                continue
+            self.ledger.mark(message_id, 'replied')
+            elapsed = time.monotonic() - received
+            with self._stats_lock:
+                self.counts['replied'] += 1
+                self.latency_total += elapsed
+                self.latency_max = max(self.latency_max, elapsed)
+
+    def stats(self):
+        with self._stats_lock:
+            counts = dict(self.counts)
+            latency_total, latency_max = self.latency_total, self.latency_max
+        replied = counts.get('replied', 0)
+        return {
+            **counts,
+            'inbound_queue': self._inbound.qsize(),
+            'outbound_queue': self._outbound.qsize(),
+            'tracked_ids': len(self.ledger),
+            'mean_seconds_to_reply': round(latency_total / replied, 3) if replied else None,
+            'max_seconds_to_reply': round(latency_max, 3),
+            'client': self.client.stats(),
+            'sms_client': self.sms_client.stats() if self.sms_client is not None else None
+        }
+
+
+def create_app(service, verify_token=None, app_secret=None):
+    """Flask app exposing the webhook endpoints for a WebhookService"""
+    app = Flask(__name__)
+
+    def check_signature():
+        if not app_secret:
+            return
+        expected = 'sha256=' + hmac.new(app_secret.encode(), request.get_data(), hashlib.sha256).hexdigest()
+        if not hmac.compare_digest(expected, request.headers.get('X-Hub-Signature-256', '')):
+            abort(403)
+
+    @app.route('/webhook/whatsapp', methods=['GET'])
+    def verify_subscription():
+        """Meta's subscription handshake: echo hub.challenge if the token matches"""
+        if request.args.get('hub.mode') == 'subscribe' and verify_token and \
+                hmac.compare_digest(request.args.get('hub.verify_token', ''), verify_token):
+            return request.args.get('hub.challenge', '')
+        return 'Forbidden', 403
+
+    @app.route('/webhook/whatsapp', methods=['POST'])
+    def whatsapp_webhook():
+        check_signature()
+        payload = request.get_json(silent=True) or {}
+        statuses = Counter(service.accept('whatsapp', message_id, sender, text)
+                           for message_id, sender, text in parse_whatsapp(payload))
+        if statuses['busy']:
+            # Non-2xx makes the provider redeliver; already-queued ids are deduplicated then
+            return jsonify(statuses), 503
+        return jsonify(statuses)
+
+    @app.route('/webhook/sms', methods=['POST'])
+    def sms_webhook():
+        """Twilio-style form post: MessageSid, From, Body"""
+        if service.sms_client is None:
+            return jsonify({'error': 'SMS replies are not configured'}), 404
+        form = request.form
+        if not form.get('MessageSid') or not form.get('Body'):
+            return jsonify({'error': 'MessageSid and Body are required'}), 400
+        status = service.accept('sms', form['MessageSid'], form.get('From'), form['Body'])
+        return jsonify({'status': status}), 503 if status == 'busy' else 200
+
+    @app.route('/stats')
+    def stats():
+        return jsonify(service.stats())
+
+    return app
+
+
+def build_service(args):
+    sys.path.insert(0, os.path.abspath(args.dashboard_dir))
+    from detect_scam import ScamDetector
+
+    detector = ScamDetector(model_path=args.model)
+    client = MessagingClient(
+        args.api_url, args.phone_number_id, token=os.environ.get('WHATSAPP_TOKEN'),
+        rate_per_second=args.rate, pool_size=args.sender_threads
+    )
+    sms_client = None
+    if args.sms_account_sid and args.sms_from:
+        sms_client = SmsClient(
+            args.sms_api_url, args.sms_account_sid, args.sms_from, auth_token=os.environ.get('TWILIO_AUTH_TOKEN'),
+            rate_per_second=args.sms_rate, pool_size=args.sender_threads
+        )
+    return WebhookService(detector, client, batch_size=args.batch_size, max_wait_ms=args.max_wait_ms,
+                          max_queue=args.max_queue, sender_threads=args.sender_threads, sms_client=sms_client)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="WhatsApp/SMS webhook receiver for the scam detector")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=int(os.environ.get('WEBHOOK_PORT', 8080)))
+    parser.add_argument('--dashboard-dir', default=DASHBOARD_DIR, help="Directory with detect_scam.py")
+    parser.add_argument('--model', default=os.path.join(DASHBOARD_DIR, 'scam_detector_model.joblib'))
+    parser.add_argument('--api-url', default=os.environ.get('WHATSAPP_API_URL', 'https://graph.facebook.com/v19.0'),
+                        help="Messaging API base URL (point it at mock_messaging_api.py for local tests)")
+    parser.add_argument('--phone-number-id', default=os.environ.get('WHATSAPP_PHONE_NUMBER_ID', 'local'))
+    parser.add_argument('--rate', type=float, default=50, help="Outbound messages per second (default: 50)")
+    parser.add_argument('--sms-api-url', default=os.environ.get('SMS_API_URL', 'https://api.twilio.com'),
+                        help="Twilio compatible Messages API base URL for SMS replies")
+    parser.add_argument('--sms-account-sid', default=os.environ.get('TWILIO_ACCOUNT_SID'),
+                        help="Account SID for SMS replies (SMS is disabled without it)")
+    parser.add_argument('--sms-from', default=os.environ.get('SMS_FROM_NUMBER'), help="Number SMS replies come from")
+    parser.add_argument('--sms-rate', type=float, default=10, help="Outbound SMS per second (default: 10)")
+    parser.add_argument('--batch-size', type=int, default=64, help="Messages per scoring batch")
+    parser.add_argument('--max-wait-ms', type=float, default=20, help="Longest wait to fill a batch")
+    parser.add_argument('--max-queue', type=int, default=10000, help="Inbound queue bound before 503s")
+    parser.add_argument('--sender-threads', type=int, default=8, help="Concurrent outbound requests")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    service = build_service(args)
+    app = create_app(service, verify_token=os.environ.get('WHATSAPP_VERIFY_TOKEN'),
+                     app_secret=os.environ.get('WHATSAPP_APP_SECRET'))
+    print(f"📨 Webhook receiver on http://{args.host}:{args.port}/webhook/whatsapp"
+          + (" (and /webhook/sms)" if service.sms_client else ""))
+    print(f"📤 Replies via {service.client.url} at up to {args.rate:g}/s")
+    if service.sms_client:
+        print(f"📤 SMS replies via {service.sms_client.url} at up to {args.sms_rate:g}/s")
+    else:
+        print("💡 Set TWILIO_ACCOUNT_SID and SMS_FROM_NUMBER to answer SMS too")
+    # One process: the duplicate ledger and queues live in memory
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()